@@ -3,15 +3,30 @@ from datetime import datetime
 import time
 from typing import Tuple
 import json
+import threading
+import uuid
+from collections import deque, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
+from typing import Iterable
 
 from StockMarketController import StockMarketController
-from log_streamer import LogStreamer
+from http_client import HttpClient
+from favourites_store import FavouritesStore
+from run_history import RunHistory
+from log_streamer import LogStreamer, DEBUG, WARNING, ERROR
 from config_manager import ConfigManager
+from metrics import MetricsRegistry, timed, timed_step, STEP_SECONDS, STEP_ERRORS
+from ratings import MalformedJSONError, RatingValidator
+from rolling_state import RollingCloses
 from filters import *
+from run_context import *
 
 
 class DataController:
-    def __init__(self, stock_market: StockMarketController, logger: LogStreamer, config_manager: ConfigManager):
+    def __init__(self, stock_market: StockMarketController, logger: LogStreamer, config_manager: ConfigManager,
+                 http_client: HttpClient = None, favourites: FavouritesStore = None, history: RunHistory = None,
+                 metrics: MetricsRegistry = None, rolling: RollingCloses = None):
         """
         Initializes the DataController with paths to data files.
         Stock data is stored in 'data' folder as a stock_data.json file in the following format:
@@ -19,7 +34,8 @@ class DataController:
                 {"name": str, "date": timestamp, "rating": int}, 
                 ...
             ].
-        Favourite stocks are stored in 'data' folder as a favourite_stocks.txt file in the following format:
+        Favourite stocks are stored in 'data' folder in a SQLite database (see `FavouritesStore`).
+        The legacy favourite_stocks.txt file in the following format is imported on the first start:
             name,ticker\n
             ...
         """
@@ -27,165 +43,422 @@ class DataController:
         self.RATING_THRESHOLD = config_manager.RATING_THRESHOLD  # user-defined rating threshold for selling stocks
         self.RATING_MIN =  config_manager.RATING_MIN # minimum rating value
         self.RATING_MAX = config_manager.RATING_MAX  # maximum rating value
+        self.rating_validator = RatingValidator(self.RATING_MIN, self.RATING_MAX, self.RATING_THRESHOLD)
 
         # endpoints of module "News"
         self.news_url = config_manager.NEWS_URL
+        self.news_timeout = config_manager.NEWS_TIMEOUT  # seconds to wait for the ratings callback
         self.liststock_endpoint = self.news_url + config_manager.LISTSTOCK_ENDPOINT
         self.salestock_endpoint = self.news_url + config_manager.SALESTOCK_ENDPOINT
+        # the stocks are sent to `/liststock` in chunks, several chunks in parallel
+        self.liststock_chunk_size = max(1, int(config_manager.LISTSTOCK_CHUNK_SIZE))
+        self.liststock_concurrency = max(1, int(config_manager.LISTSTOCK_CONCURRENCY))
+        # the recommendations are sent to `/salestock` per received chunk or once for the whole run
+        if config_manager.SALESTOCK_MODE not in (self.SALESTOCK_INCREMENTAL, self.SALESTOCK_FINAL):
+            raise ValueError(f"Invalid salestock mode: {config_manager.SALESTOCK_MODE}")
+        self.salestock_mode = config_manager.SALESTOCK_MODE
 
         # paths to data files
         # self.stock_data_path = config_manager.STOCK_DATA_PATH
         self.favourite_stocks_path = config_manager.FAVOURITE_STOCKS_PATH
+        # store of the favourite stocks
+        if favourites is None:
+            favourites = FavouritesStore(config_manager.FAVOURITES_DB_PATH, legacy_path=self.favourite_stocks_path)
+        self.favourites = favourites
 
         # initialize filters
         self.filters = [
             Filter3Days(),
             Filter5Days(),
         ]
+        # maximum number of parallel price requests to the stock market API
+        self.fetch_concurrency = max(1, int(config_manager.FETCH_CONCURRENCY))
+        # optional rolling state of the last closes, the prices are fetched only once a day per stock
+        self.rolling = rolling
+
         # initialize stock market controller
         self.stock_market = stock_market
         self.logger = logger
-
-        self.stocks = None
-
-
-    def start_market(self, mode="by scheduler"):
+        # shared pooled HTTP client used for the requests to module "News"
+        self.http_client = http_client if http_client is not None else HttpClient()
+
+        # optional persistent history of the runs
+        self.history = history
+
+        # contexts of the last pipeline runs, every run keeps its own state
+        self._runs_lock = threading.Lock()
+        self.runs = OrderedDict()  # run ID -> RunContext
+        self.news_latencies = deque(maxlen=100)  # (run ID, seconds from `/liststock` to `/rating`) of the last runs
+
+        # callable(run_id, stage) notified about the progress of the runs
+        self.stage_listener = None
+
+        # timings and errors of the pipeline steps, exposed on `/metrics`
+        self.metrics = metrics if metrics is not None else MetricsRegistry()
+        self.step_seconds = self.metrics.histogram(*STEP_SECONDS)
+        self.step_errors = self.metrics.counter(*STEP_ERRORS)
+        self.news_request_seconds = self.metrics.histogram(
+            "news_request_seconds", "Duration of the requests to module News in seconds.", ("endpoint",)
+        )
+        self.news_request_errors = self.metrics.counter(
+            "news_request_errors_total", "Failed requests to module News.", ("endpoint",)
+        )
+        self.invalid_ratings = self.metrics.counter(
+            "ratings_invalid_total", "Invalid stocks received from module News."
+        )
+        self.runs_total = self.metrics.counter("pipeline_runs_total", "Completed pipeline runs by final stage.", ("stage",))
+
+
+    RUN_HISTORY = 100  # number of run contexts kept, late `/rating` callbacks of these runs are still processed
+    SALESTOCK_INCREMENTAL = "incremental"  # send the recommendations of every `/rating` callback right away
+    SALESTOCK_FINAL = "final"  # send all recommendations once the ratings of all chunks are in
+
+    def start_market(self, mode="by scheduler", run_id: str = None) -> RunContext:
         """
         Function to start our market - update stock data. This function will be called by the scheduler or manually from UI.
         The function will trigger the pipeline:
         1. Get favourite stocks from the user file.
         2. Filter the stocks by the defined filters based on price from API.
         3. Send filtered stocks to module "News" to get ratings for requested companies stocks based on their latest news.
+           The stocks are sent in chunks (see `send_stock_chunks`), module "News" answers every chunk with a `/rating` callback.
+        The state of the run is kept in its own `RunContext`, the run ID is sent to module "News" with every stock.
+        The progress of the run is reported to `self.stage_listener`.
+
+        @param mode: `str` who started the market
+        @param run_id: `str` ID of the run, a new one is generated if not provided
+
+        @return: `RunContext` of the run
         """
-        self.stocks = None  # reset stocks data
+        run = self._create_run(run_id if run_id is not None else uuid.uuid4().hex, mode)
+        run_id = run.run_id
         try:
-            self.logger.log(f"Market started {mode}")
+            self.logger.log(f"Market started {mode}", run_id=run_id)
 
+            self._report_stage(run, STAGE_FAVOURITES)
             favourite_stocks = self.get_favourite_stocks()
-            self.logger.log(f"Received {len(favourite_stocks)} favourite stocks", optional_data=favourite_stocks)
+            self.logger.log(f"Received {len(favourite_stocks)} favourite stocks", optional_data=favourite_stocks, run_id=run_id)
 
-            filtered_stocks = self.filter_stocks(favourite_stocks)
-            self.logger.log(f"Filtered stocks: {len(filtered_stocks)}", optional_data=filtered_stocks)
+            self._report_stage(run, STAGE_FILTERING)
+            filtered_stocks = self.filter_stocks(favourite_stocks, run_id=run_id)
+            self.logger.log(f"Filtered stocks: {len(filtered_stocks)}", optional_data=filtered_stocks, run_id=run_id)
 
             if len(filtered_stocks) == 0:
-                self.logger.log(f"No stocks to process")
-                return
-
-            json_data = self.pack_stock_data(filtered_stocks)  # pack stock data to json
-
+                self.logger.log(f"No stocks to process", run_id=run_id)
+                self._report_stage(run, STAGE_NO_STOCKS)
+                return run
+
+            run.tickers = filtered_stocks
+            self._record_history(run, "record_filtered", run_id, filtered_stocks)
+            self._report_stage(run, STAGE_LISTSTOCK)
+            json_data = self.pack_stock_data(filtered_stocks, run_id=run_id)  # pack stock data to json
+
+            # mark the run as waiting before sending, the callback can arrive (and finish the run) before we start waiting
+            self._report_stage(run, STAGE_WAITING)
+            run.news_sent_at = time.monotonic()
             # self.logger.log(f"Sending stocks to News: {self.liststock_endpoint}", optional_data=json_data)
-            self.send_to_news_module(self.liststock_endpoint, json_data)
-            
-            self.wait_for_news_response()  # wait for the response from News module
+            self.send_stock_chunks(run, json_data)
+
+            # wait for the response from News module
+            if not self.wait_for_news_response(run_id):
+                self._report_stage(run, STAGE_TIMED_OUT)
         except Exception as e:
-            self.logger.log(f"Market failed")
-            self.logger.log(f"Error: {e}")
+            self.logger.log(f"Market failed", level=ERROR, run_id=run_id)
+            self.logger.log(f"Error: {e}", level=ERROR, run_id=run_id)
+            self._report_stage(run, STAGE_FAILED)
+        return run
 
-    def second_step_market(self, data: dict):
+    def second_step_market(self, data: Iterable[dict], run_id: str = None) -> bool:
         """
         Second part of the market pipeline where 3 final steps are completed:
         4. Validate received data from News module
         5. Based on the ratings, add a recommendation to the user favourite stocks either to sell, or keep them.
         6. Send the updated stock data to the module "News" in order to sell it or buy.
+        Steps 4 and 5 are done in one pass, so the stocks can be streamed in (see `ratings.iter_ratings`).
+        The ratings are matched to their run (see `find_run`). Every callback answers one chunk of the run,
+        the ratings of the callbacks are merged and the waiting run is woken up once all chunks are in.
+        The recommendations are sent per callback or once for the whole run (see `self.salestock_mode`).
 
-        @param data: dict, stocks data received from the News module
+        @param data: `list` or iterable of the stocks data received from the News module
+        @param run_id: `str` ID of the run the ratings belong to, taken from the stocks data if not provided
 
+        @return: `True` if the ratings were matched to a run, `False` if the run is unknown
+
+        @raises: `MalformedJSONError` if the streamed stocks aren't valid JSON, the callback is ignored.
         """
+        if run_id is None and not isinstance(data, list):
+            # take the run ID from the first stock and put it back in front of the stream
+            data = iter(data)
+            first = next(data, None)
+            run = self.find_run([first], run_id)
+            data = chain([first], data) if first is not None else iter(())
+        else:
+            run = self.find_run(data, run_id)
+        if run is None:
+            self.logger.log(f"Received ratings of an unknown run: {run_id}", level=WARNING)
+            return False
+        run_id = run.run_id
+
         try:
-            valid_data = self.validate_stocks(data)
-            self.logger.log(f"After validation stocks: {valid_data}")
+            if not self._report_stage(run, STAGE_VALIDATING):
+                # e.g. a callback arriving after the run timed out, nothing is sent for a dead run
+                self.logger.log(f"Ignored ratings of a completed run ({run.stage})", level=WARNING, run_id=run_id)
+                return True
+            rated = set()
+            try:
+                stocks = self.process_ratings(self._collect_names(data, rated), run_id=run_id)
+            except MalformedJSONError:
+                raise
+            except ValueError as e:
+                # a chunk without valid ratings doesn't fail the other chunks of the run
+                self.logger.log(f"No valid ratings in the callback: {e}", level=WARNING, run_id=run_id)
+                stocks = []
+            complete = run.add_ratings(stocks, rated)
+            self.logger.log(
+                f"Validated stocks with recommendations: {len(stocks)} (callback {run.callbacks} of {max(run.chunks, 1)})",
+                optional_data=stocks, run_id=run_id,
+            )
+            self._record_history(run, "record_ratings", run_id, stocks)
+
+            if self.salestock_mode == self.SALESTOCK_INCREMENTAL and stocks and self._report_stage(run, STAGE_SALESTOCK):
+                self.send_to_news_module(self.salestock_endpoint, stocks)
+            if complete:
+                self._complete_run(run)
+        except MalformedJSONError as e:
+            # the whole callback is rejected, none of its stocks counts as rated and module "News" can send it again
+            self.logger.log(f"Rejected malformed ratings: {e}", level=WARNING, run_id=run_id)
+            self._report_stage(run, STAGE_WAITING)
+            raise
+        except Exception as e:
+            self.logger.log(f"Market failed", level=ERROR, run_id=run_id)
+            self.logger.log(f"Error: {e}", level=ERROR, run_id=run_id)
+            self.notify_news_response(run_id)  # don't keep `start_market` waiting for a failed run
+            self._report_stage(run, STAGE_FAILED)
+        return True
+
+    def _complete_run(self, run: RunContext):
+        """
+        Completes the run once the ratings of all its chunks are in (see `RunContext.add_ratings` and `RunContext.chunk_failed`):
+        wakes up the waiting run, sends the recommendations of the whole run in the final mode and reports the run as finished.
+        Nothing is sent if the run meanwhile reached a final stage (e.g. timed out).
+
+        @param run: `RunContext` of the run
+
+        @raises: `ValueError` if the run has no valid ratings.
+        """
+        self.notify_news_response(run.run_id)
+        if not run.stocks:
+            raise ValueError("The response JSON is empty after the validation.")
+        if self.salestock_mode == self.SALESTOCK_FINAL:
+            if not self._report_stage(run, STAGE_SALESTOCK):
+                return
+            # self.logger.log(f"Sending stocks to News: {self.salestock_endpoint}", optional_data=run.stocks)
+            self.send_to_news_module(self.salestock_endpoint, run.stocks)
+
+        if self._report_stage(run, STAGE_FINISHED):
+            self.logger.log(f"Market finished successfully", run_id=run.run_id)
+
+    @staticmethod
+    def _collect_names(stocks: Iterable[dict], names: set) -> Iterable[dict]:
+        """
+        Passes the stocks through and collects their names into `names`.
+        """
+        for stock in stocks:
+            if isinstance(stock, dict) and "name" in stock:
+                names.add(stock["name"])
+            yield stock
+
+    def _create_run(self, run_id: str, mode: str) -> RunContext:
+        """
+        Creates the context of a new run. The contexts of the oldest runs are forgotten.
+
+        @param run_id: `str` ID of the run
+        @param mode: `str` who started the run
+
+        @return: `RunContext` of the run
+        """
+        run = RunContext(run_id, mode)
+        with self._runs_lock:
+            self.runs[run_id] = run
+            while len(self.runs) > self.RUN_HISTORY:
+                self.runs.popitem(last=False)
+        return run
+
+    def get_run(self, run_id: str) -> RunContext | None:
+        """
+        Returns the context of the run, or `None` if the run is unknown.
+        """
+        with self._runs_lock:
+            return self.runs.get(run_id)
+
+    def find_run(self, data: list[dict], run_id: str = None) -> RunContext | None:
+        """
+        Finds the run the received ratings belong to.
+        The run ID is given explicitly or taken from the `run_id` attribute of the stocks.
+        Ratings without any run ID belong to the latest run waiting for the ratings.
+
+        @param data: `list` of stocks data received from the News module
+        @param run_id: `str` ID of the run, if known
+
+        @return: `RunContext` of the run, or `None` if no run matches
+        """
+        if run_id is None and isinstance(data, list):
+            run_id = next((stock["run_id"] for stock in data if isinstance(stock, dict) and "run_id" in stock), None)
+        with self._runs_lock:
+            if run_id is not None:
+                return self.runs.get(run_id)
+            return next((run for run in reversed(self.runs.values()) if run.waiting_for_news), None)
+
+    def _report_stage(self, run: RunContext, stage: str) -> bool:
+        """
+        Moves the run to the stage and reports the progress to the stage listener.
+        A completed run keeps its final stage, so it is counted and recorded in the history only once.
+        A failing listener never breaks the pipeline.
 
-            # save the received valid data to DataController
-            self.stocks = valid_data
-            self.logger.log(f"Adding recommendations to stocks", optional_data=self.stocks)
-            self.add_recommendations()
+        @param run: `RunContext` of the run
+        @param stage: `str` the stage the run entered
 
-            # self.logger.log(f"Sending stocks to News: {self.salestock_endpoint}", optional_data=self.stocks)
-            self.send_to_news_module(self.salestock_endpoint, self.stocks)
+        @return: `True` if the run entered the stage, `False` if the run is already complete
+        """
+        if not run.enter_stage(stage):
+            return False
+        if stage in FINAL_STAGES:
+            self.runs_total.inc(stage=stage)
+            self._record_history(run, "record_run", run)
+        if self.stage_listener is not None:
+            try:
+                self.stage_listener(run.run_id, stage)
+            except Exception as e:
+                self.logger.log(f"Stage listener failed: {e}", level=WARNING, run_id=run.run_id)
+        return True
+
+    def _record_history(self, run: RunContext, method: str, *args):
+        """
+        Stores the data of the run in the run history, if it is enabled.
+        A failing history never breaks the pipeline.
 
-            self.logger.log(f"Market finished successfully")
+        @param run: `RunContext` of the run
+        @param method: `str` name of the `RunHistory` method
+        @param args: arguments of the method
+        """
+        if self.history is None:
+            return
+        try:
+            getattr(self.history, method)(*args)
         except Exception as e:
-            self.logger.log(f"Market failed")
-            self.logger.log(f"Error: {e}")
+            self.logger.log(f"Failed to record the run history: {e}", level=WARNING, run_id=run.run_id)
 
 
 
-    def update_favourite_stocks(self, new_stock: Tuple[str, str]):
+    def update_favourite_stocks(self, new_stock: Tuple[str, str]) -> bool:
         """
         Triggers when the user adds a new stock to the favourite stocks.
-        The function will add the new stock to the file.
+        The function will add the new stock to the store if it isn't there yet.
 
         @param new_stock: tuple (name, ticker)
+
+        @return: `True` if the stock was added
         """
-        # check if the file exists, if not create it
         try:
-            with open(self.favourite_stocks_path, "a") as file:
-                file.write(f"{new_stock[0]},{new_stock[1]}\n")
-        except FileNotFoundError:
-            # create the file if it doesn't exist
-            with open(self.favourite_stocks_path, "w") as file:
-                file.write(f"{new_stock[0]},{new_stock[1]}\n")     
+            return self.favourites.add(new_stock[0], new_stock[1])
         except Exception as e:
-            self.logger.log(f"Error updating favourite stocks: {e}")
+            self.logger.log(f"Error updating favourite stocks: {e}", level=ERROR)
+            return False
 
-    def remove_favourite_stocks(self, stock: str):
+    def remove_favourite_stocks(self, stock: str) -> bool:
         """
         Triggers when the user removes a stock from the favourite stocks.
-        The function will remove the stock from the file.
+        The function will remove the stock from the store.
+
+        @param stock: str ticker of the stock
+
+        @return: `True` if the stock was removed
+        """
+        return self.favourites.remove(stock)
+
+    def is_favourite_stock(self, ticker: str) -> bool:
+        """
+        Checks whether the stock is one of the favourite stocks.
 
-        @param stock: str name of the stock
+        @param ticker: str ticker of the stock
         """
-        with open(self.favourite_stocks_path, "r") as file:
-            lines = file.readlines()
-        with open(self.favourite_stocks_path, "w") as file:
-            for line in lines:
-                if line.strip("\n").split(',')[1] != stock:
-                    file.write(line)
+        return self.favourites.contains(ticker)
 
+    @timed_step("get_favourite_stocks")
     def get_favourite_stocks(self) -> list[Tuple[str, str]]:
         """
-        Reads the favourite stocks from the file and returns them as a list of tuples.
+        Returns the favourite stocks as a list of tuples.
         Each tuple contains the name and ticker of the stock.
 
         @return: `list` of tuples (name, ticker)
         """
-        stocks = []
-        with open(self.favourite_stocks_path, "r") as file:
-            for line in file:
-                line = line.rstrip().split(",")
-                stocks.append((line[0], line[1]))
-        return stocks
+        return self.favourites.list()
+
+    def favourites_version(self) -> int:
+        """
+        Returns the version of the favourite stocks, it changes whenever they are added or removed.
+        Views rendered from the favourites are cached by this version.
+        """
+        return self.favourites.current_version()
     
-    def filter_stocks(self, stocks: list[Tuple[str, str]]) -> list[str]:
+    @timed_step("filter_stocks")
+    def filter_stocks(self, stocks: list[Tuple[str, str]], run_id: str = None) -> list[str]:
         """
         Filters the stocks based on the defined filters.
+        Prices of all stocks are fetched at once first (concurrently, at most `self.fetch_concurrency`
+        requests in parallel), then all filters are evaluated over all stocks in one vectorized pass.
+        With the rolling state (see `self.rolling`) only the stocks not synced today are fetched, only their
+        new closes are appended to the state and the filters are evaluated over the precomputed declines.
+        Stocks whose prices couldn't be fetched are logged and skipped.
 
         @param stocks: list of tuples (name, ticker)
+        @param run_id: `str` ID of the run, used in the logs
 
-        @return: list of filtered stock tickers
+        @return: list of filtered stock tickers in the order of `stocks`
         """
-        filtered_stocks = []
-
-        # per favourite stock
-        for stock in stocks:
-            ticker = stock[1]  # get the ticker
-            prices = self.stock_market.get_recent_prices(ticker)  # get the last 5 prices
-
-            self.logger.log(f"Filtering stock: {ticker}", optional_data=prices)
-            self.logger.log(f"Applied filters: {[ filter.__class__.__name__ for filter in self.filters]}")
-            # apply filters
-            # if all filter was satisfied, add the stock to the filtered list
-            if all(filter.apply(prices) for filter in self.filters):
-                filtered_stocks.append(ticker)
-        return filtered_stocks
+        tickers = [stock[1] for stock in stocks]  # get the tickers
+        today = datetime.now().date()
+        # get the last prices of every stock
+        all_prices = self.stock_market.get_recent_prices_bulk(
+            self.rolling.stale(tickers, today) if self.rolling is not None else tickers,
+            max_workers=self.fetch_concurrency,
+            on_error=lambda ticker, e: self.logger.log(
+                f"Failed to get prices for stock: {ticker}. Error: {e}", level=WARNING, run_id=run_id
+            ),
+        )
+        if self.rolling is not None:
+            for ticker, closes in all_prices.items():
+                self.rolling.update(ticker, closes, today)
+            if all_prices:
+                self.rolling.save()
+            # skip the stocks without prices, the error was already logged
+            missing = set(self.rolling.stale(tickers, today))
+            tickers = [ticker for ticker in tickers if ticker not in missing]
+        else:
+            tickers = [ticker for ticker in tickers if ticker in all_prices]
+        if not tickers:
+            return []
+
+        if self.logger.is_enabled_for(DEBUG):
+            self.logger.log(f"Filtering stocks: {len(tickers)}", optional_data=all_prices, level=DEBUG, run_id=run_id)
+            self.logger.log(f"Applied filters: {[ filter.__class__.__name__ for filter in self.filters]}", level=DEBUG, run_id=run_id)
+        # apply filters
+        # if all filter was satisfied, add the stock to the filtered list
+        if self.rolling is not None:
+            mask = AndFilter(*self.filters).apply_rolling(self.rolling, self.rolling.rows(tickers))
+        else:
+            closes = to_matrix([all_prices[ticker] for ticker in tickers])
+            mask = AndFilter(*self.filters).apply_batch(closes)
+        return [ticker for ticker, passed in zip(tickers, mask) if passed]
     
-    def pack_stock_data(self, stocks: list[str]) -> list[dict]:
+    def pack_stock_data(self, stocks: list[str], run_id: str = None) -> list[dict]:
         """
         Packs the stock data into a JSON object.
-        The JSON object contains the stock name, date.
+        The JSON object contains the stock name, date and the ID of the run requesting the ratings.
         """
         date = int(datetime.now().timestamp())
-        return [{"name": stock, "date": date, "rating": 0, "sale": 0} for stock in stocks]
+        if run_id is None:
+            return [{"name": stock, "date": date, "rating": 0, "sale": 0} for stock in stocks]
+        return [{"name": stock, "date": date, "rating": 0, "sale": 0, "run_id": run_id} for stock in stocks]
     
     def send_to_news_module(self, endpoint: str, json_data: list[dict] = None):
         """
@@ -200,7 +473,8 @@ class DataController:
         self.logger.log(f"Sending data to the News module: {endpoint}", optional_data=json_data)
         try:
             headers = {'Content-Type': 'application/json'}
-            response = requests.post(endpoint, json=json.dumps(json_data), headers=headers)
+            with timed(self.news_request_seconds, self.news_request_errors, endpoint=endpoint):
+                response = self.http_client.post(endpoint, json=json.dumps(json_data), headers=headers)
             # check if the response is successful
             # if response.status_code != 200:
             #     raise ConnectionError(f"Failed to send data to the News module. Status code: {response.status_code}. Response: {response.text}")
@@ -209,84 +483,105 @@ class DataController:
             raise ConnectionError(f"An error occurred while sending data to the News module: {e}")
         
 
-    def wait_for_news_response(self):
+    def send_stock_chunks(self, run: RunContext, json_data: list[dict]):
+        """
+        Sends the stocks to `/liststock` in chunks of `self.liststock_chunk_size`,
+        at most `self.liststock_concurrency` chunks at the same time.
+        A chunk that can't be sent is logged and no callback is expected for it,
+        if the callbacks of the other chunks are already in, the run is completed here (see `_complete_run`).
+
+        @param run: `RunContext` of the run
+        @param json_data: `list` of packed stocks data
+
+        @raises: `ConnectionError` if none of the chunks could be sent, `ValueError` if the completed run has no valid ratings.
+        """
+        size = self.liststock_chunk_size
+        chunks = [json_data[i:i + size] for i in range(0, len(json_data), size)]
+        run.chunks = len(chunks)  # set before sending, the callbacks can arrive before all chunks are sent
+
+        def send(chunk: list[dict]) -> Exception | None:
+            try:
+                self.send_to_news_module(self.liststock_endpoint, chunk)
+            except Exception as e:
+                return e
+            return None
+
+        if len(chunks) == 1:
+            errors = [send(chunks[0])]
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.liststock_concurrency, len(chunks))) as executor:
+                errors = list(executor.map(send, chunks))
+
+        failed = [e for e in errors if e is not None]
+        if len(failed) == len(chunks):
+            raise failed[0]
+        for e in failed:
+            self.logger.log(f"Failed to send a chunk of stocks to News: {e}", level=WARNING, run_id=run.run_id)
+            if run.chunk_failed():
+                # the callbacks of the other chunks are already in, nobody else completes the run
+                self._complete_run(run)
+
+    def notify_news_response(self, run_id: str) -> float | None:
+        """
+        Wakes up the run waiting for the ratings and records the latency from `/liststock` to `/rating`.
+
+        @param run_id: `str` ID of the run the ratings belong to
+
+        @return: latency in seconds, or `None` if the run doesn't wait for the ratings
+        """
+        run = self.get_run(run_id)
+        if run is None or not run.waiting_for_news:
+            return None
+        run.news_latency = time.monotonic() - run.news_sent_at
+        self.news_latencies.append((run_id, run.news_latency))
+        self.logger.log(f"News response latency: {run.news_latency:.3f} s", run_id=run_id)
+        run.news_received.set()
+        return run.news_latency
+
+    @timed_step("wait_for_news_response")
+    def wait_for_news_response(self, run_id: str, timeout: float = None) -> bool:
         """
         Waits for the response from the News module.
-        The function will wait for 5 seconds before checking the response.
-
-        @raises: `TimeoutError` if the response is not received within the timeout period.
-        """
-        timeout = 60  # seconds
-        interval = 5
-        elapsed = 0
-        # wait for ratings callback (e.g., max 10 seconds, check every 0.5 sec)
-        while elapsed < timeout:
-            self.logger.log(f"Waiting for News response... stocks: {self.stocks}")
-            # if the self.stocks was updated by the News module, break the loop
-            if self.stocks is not None:
-                self.logger.log(f"Received stocks rating from News", optional_data=self.stocks)
-                return
-            # else wait for the next check
-            time.sleep(interval)
-            elapsed += interval
+        The waiting run is woken up as soon as the ratings callback arrives.
+
+        @param run_id: `str` ID of the run waiting for the ratings
+        @param timeout: `float` seconds to wait, defaults to `self.news_timeout`
+
+        @return: `True` if the ratings were received in time, `False` otherwise
+
+        @raises: `KeyError` if the run is unknown.
+        """
+        timeout = self.news_timeout if timeout is None else timeout
+        run = self.get_run(run_id)
+        if run is None:
+            raise KeyError(f"Unknown run {run_id}.")
+
+        self.logger.log(f"Waiting for News response...", run_id=run_id)
+        if run.news_received.wait(timeout):
+            self.logger.log(f"Received stocks rating from News", run_id=run_id)
+            return True
 
-        self.logger.log("Didn't receive the response from the News module in one minute.")
+        self.logger.log(f"Didn't receive the response from the News module in {timeout} seconds.", level=WARNING, run_id=run_id)
         # raise TimeoutError("Timeout waiting for the News module response.")
+        return False
         
 
-    def validate_stocks(self, stock_data: list[dict]) -> list[dict]:
-        """
-        Validates the stocks data received from the News module.
-        It checks if the response JSON isn't empty and if the stocks have valid attributes.
-        If some of the stocks have invalid attributes, skip it.
-            @param stock_data: `dict` stocks data received from the News module
-
-            @return: `list` of valid stocks
-
-            @raises: `ValueError` if the response JSON is empty.
-            @raises: `TypeError` if the stock data is not a list.
-            @raises: `KeyError` if the stock data doesn't contain the required attributes.
-            @raises: `ValueError` if the rating value is invalid.
-            @raises: `ValueError` if the response JSON is empty after the validation.
-        """
-        valid_stocks = []
-        # validation:
-        # 1. check if response json isn't empty
-        if not stock_data:
-            raise ValueError("The response JSON is empty.")
-        # 2. validate response json: if some of the stocks have invalid attributes, skip it
-        for stock in stock_data:
-            self.logger.log(f"Validating stock: {stock} and type: {type(stock)}")
-            # check if the stock is a dictionary
-            if not isinstance(stock, dict):
-                raise TypeError("The stock data is not a dictionary.")
-            # check if the stock has the required attributes
-            if all(attr in stock for attr in ["name", "date", "rating"]):
-                # check if the stock has a valid rating
-                if isinstance(stock["rating"], int) and self.RATING_MIN <= stock["rating"] <= self.RATING_MAX:
-                    valid_stocks.append(stock)
-        
-        # 3. check if the response JSON is empty after the validation
-        if len(valid_stocks) == 0:
-            raise ValueError("The response JSON is empty after the validation.")
+    @timed_step("process_ratings")
+    def process_ratings(self, stocks: Iterable[dict], run_id: str = None) -> list[dict]:
+        """
+        Validates the stocks received from the News module and adds the recommendations in one pass.
+        Invalid stocks are skipped and only counted.
 
-        return valid_stocks
+        @param stocks: `list` or iterable of the stocks data received from the News module
+        @param run_id: `str` ID of the run, used in the logs
 
-    def add_recommendations(self) -> dict:
-        """
-        Adds recommendations to the stocks data based on the ratings.
-        If rating > self.RATING_THRESHOLD, add recommendation to sell.
-        
-        @raises: `ValueError` if the rating value is invalid.
-        @raises: `KeyError` if the stock data doesn't contain the required attributes.
+        @return: `list` of the valid stocks with recommendations
+
+        @raises: `ValueError` if there are no stocks or none of them is valid.
+        @raises: `TypeError` if a stock is not a dictionary.
         """
-        try:
-            for stock in self.stocks:
-                if self.RATING_MAX >= stock["rating"] > self.RATING_THRESHOLD:
-                    stock["sale"] = 1
-                elif self.RATING_MIN <= stock["rating"] <= self.RATING_THRESHOLD:
-                    stock["sale"] = 0
-                else:
-                    raise ValueError("Invalid rating value.")
-        except KeyError as e:
-            raise KeyError(f"Missing required attribute `rating` in stock data: {e}")
\ No newline at end of file
+        valid_stocks, invalid = self.rating_validator.process(stocks)
+        if invalid:
+            self.invalid_ratings.inc(invalid)
+            self.logger.log(f"Skipped invalid stocks: {invalid}", level=WARNING, run_id=run_id)
+        return valid_stocks
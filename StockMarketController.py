@@ -1,6 +1,14 @@
-import requests
+import time
 from datetime import datetime, timedelta
-from typing import Tuple
+from typing import Callable, Tuple
+from concurrent.futures import ThreadPoolExecutor
+
+from http_client import HttpClient
+from rate_limiter import RateLimiter, RateLimitError, PRIORITY_PIPELINE, PRIORITY_SEARCH, parse_retry_after
+from metrics import MetricsRegistry, timed_step, STEP_SECONDS, STEP_ERRORS
+from price_cache import PriceCache
+from ttl_cache import TTLCache
+from ticker_index import TickerIndex
 
 
 class StockMarketController:
@@ -9,14 +17,31 @@ class StockMarketController:
 
     This class provides methods to:
     - Search for stock tickers by query.
-    - Retrieve the closing prices of a stock for the last 5 trading days.
+    - Retrieve the closing prices of a stock for the last 6 trading days.
+    - Retrieve the closing prices of many stocks at once.
     """
 
-    def __init__(self, api_key: str = ""):
+    PRICE_WINDOW = 6  # number of last trading days returned by `get_recent_prices`
+
+    def __init__(self, api_key: str = "", http_client: HttpClient = None, price_cache: PriceCache = None,
+                 base_url: str = "https://api.tiingo.com", search_cache: TTLCache = None,
+                 metrics: MetricsRegistry = None, rate_limiter: RateLimiter = None, rate_limit_wait: float = 60.0,
+                 ticker_index: TickerIndex = None):
         """
         Initializes the StockMarketController with an API key from 'key_tiingo.txt'
         and sets up the necessary Tiingo API endpoints.
 
+        Args:
+            api_key (str): The Tiingo API key.
+            http_client (HttpClient): Shared pooled HTTP client. A private one is created if not provided.
+            price_cache (PriceCache): Optional on-disk cache of daily closes. Prices are always fetched if not provided.
+            base_url (str): Root URL of the Tiingo API.
+            search_cache (TTLCache): Optional in-process cache of search results keyed by the normalized query.
+            metrics (MetricsRegistry): Registry of the timings of the price requests. A private one is created if not provided.
+            rate_limiter (RateLimiter): Optional limiter of the requests shared by the worker processes.
+            rate_limit_wait (float): Maximum seconds a pipeline request waits for the rate limit, searches never wait.
+            ticker_index (TickerIndex): Optional local index of the symbol universe, searched before the API.
+
         Raises:
             Exception: If the API key is missing or invalid.
         """
@@ -24,13 +49,26 @@ class StockMarketController:
             raise ValueError("API key is required. Please provide a valid Tiingo API key.")
         
         self.api_key = api_key
-        self.base_price_url = "https://api.tiingo.com/tiingo/daily/"
-        self.base_search_url = "https://api.tiingo.com/tiingo/utilities/search?query="
+        self.base_price_url = f"{base_url}/tiingo/daily/"
+        self.base_search_url = f"{base_url}/tiingo/utilities/search?query="
         self.headers = {'Content-Type': 'application/json'}
+        self.http_client = http_client if http_client is not None else HttpClient()
+        self.price_cache = price_cache
+        self.search_cache = search_cache
+        self.metrics = metrics if metrics is not None else MetricsRegistry()
+        self.step_seconds = self.metrics.histogram(*STEP_SECONDS)
+        self.step_errors = self.metrics.counter(*STEP_ERRORS)
+        self.rate_limiter = rate_limiter
+        self.rate_limit_wait = rate_limit_wait
+        self.ticker_index = ticker_index
 
     def search_ticker(self, query: str) -> list[Tuple[str, str]]:
         """
         Searches for stock tickers matching a given query.
+        If the ticker index is enabled, the query is answered from it and the API is requested
+        only when the index has no match.
+        If the search cache is enabled, results of the normalized query are served from it
+        and concurrent identical queries share one API request.
 
         Args:
             query (str): The search term for the stock (e.g., "Tesla").
@@ -41,36 +79,151 @@ class StockMarketController:
         Raises:
             Exception: If the API request fails or returns an empty response.
         """
-        query = query.strip().lower()
+        query = " ".join(query.split()).lower()  # normalize the query
+        if self.ticker_index is not None:
+            results = self.ticker_index.search(query)
+            if results:
+                return results
+        if self.search_cache is not None:
+            results = self.search_cache.get_or_load(query, lambda: self._request_search(query))
+        else:
+            results = self._request_search(query)
+
+        if not results:
+            raise Exception("No tickers found for the given query.")
+
+        return list(results)
+
+    def _request_search(self, query: str) -> list[Tuple[str, str]]:
+        """
+        Requests the tickers matching the query from the Tiingo API.
+
+        Args:
+            query (str): The normalized search term.
+
+        Returns:
+            list: A list of tuples of stock names and tickers, empty if nothing matches.
+
+        Raises:
+            Exception: If the API request fails.
+        """
         request_url = f"{self.base_search_url}{query}&token={self.api_key}"
-        response = requests.get(request_url, headers=self.headers)
+        response = self._get(request_url, priority=PRIORITY_SEARCH)
 
         if response.status_code != 200:
             raise Exception(f"Tiingo API request failed: {response.text}")
 
-        results = response.json()
-        if not results:
-            raise Exception("No tickers found for the given query.")
-
-        return [(company["name"], company["ticker"]) for company in results]
+        return [(company["name"], company["ticker"]) for company in response.json()]
 
+    @timed_step("get_recent_prices")
     def get_recent_prices(self, ticker: str) -> list[float]:
         """
-        Retrieves the closing prices of a stock for the last 5 trading days.
+        Retrieves the closing prices of a stock for the last 6 trading days.
+        If the price cache is enabled, only the days after the last cached close are requested
+        and the API isn't called at all when the cache is current for the trading day.
 
         Args:
             ticker (str): The stock ticker.
 
         Returns:
-            list[tuple[datetime, float]]: A list of tuples, where each tuple contains:
-                - A `datetime` object representing the date.
-                - A `float` representing the closing price.
+            list[float]: The closing prices ordered from the oldest to the newest.
 
         Raises:
             Exception: If the API request fails or returns an empty response.
         """
         today = datetime.now().date()
         start_date = today - timedelta(days=14)  # Ensures we fetch at least 6 trading days
+        incremental = False
+
+        if self.price_cache is not None:
+            if self.price_cache.is_current(ticker, today):
+                closes = self.price_cache.get_closes(ticker, self.PRICE_WINDOW)
+                if closes:
+                    self.price_cache.record_hit()
+                    return closes
+            last_date = self.price_cache.last_date(ticker)
+            if last_date is not None and last_date >= start_date:
+                # request only the days after the last cached close
+                start_date = last_date + timedelta(days=1)
+                incremental = True
+            self.price_cache.record_miss(incremental=incremental)
+
+        price_data = self._request_prices(ticker, start_date)
+
+        if self.price_cache is not None:
+            self.price_cache.store(
+                ticker,
+                [(entry["date"][:10], float(entry["close"])) for entry in price_data],
+                checked_on=today,
+            )
+            closes = self.price_cache.get_closes(ticker, self.PRICE_WINDOW)
+        else:
+            closes = [ float(entry["close"]) for entry in price_data[-self.PRICE_WINDOW:] ]  # Extract last 6 trading days
+
+        if not closes:
+            raise Exception("No price data found for the given ticker.")
+        return closes
+
+    def get_recent_prices_bulk(self, tickers: list[str], max_workers: int = 8,
+                               on_error: Callable[[str, Exception], None] = None) -> dict[str, list[float]]:
+        """
+        Retrieves the closing prices of many stocks for the last 6 trading days with as few API requests as possible.
+
+        Tiingo's end-of-day endpoint accepts a single symbol per request, so the requests are grouped on our side:
+        - Duplicate tickers are requested only once.
+        - All tickers whose cached prices are current are read from the price cache in one lookup.
+        - The remaining tickers fall back to `get_recent_prices` (incremental if cached), sent concurrently.
+
+        A failed ticker doesn't abort the others - it is left out of the result and reported to `on_error`.
+
+        Args:
+            tickers (list[str]): The stock tickers.
+            max_workers (int): Maximum number of parallel API requests.
+            on_error (Callable[[str, Exception], None]): Called with the ticker and the error of each failed ticker.
+
+        Returns:
+            dict[str, list[float]]: Closing prices per ticker, in the order of `tickers`.
+        """
+        unique_tickers = list(dict.fromkeys(tickers))
+        prices = {}
+
+        if self.price_cache is not None and unique_tickers:
+            today = datetime.now().date()
+            prices = self.price_cache.get_current_many(unique_tickers, today, self.PRICE_WINDOW)
+            self.price_cache.record_hit(len(prices))
+
+        def fetch(ticker: str) -> list[float] | None:
+            try:
+                return self.get_recent_prices(ticker)
+            except Exception as e:
+                if on_error is not None:
+                    on_error(ticker, e)
+                return None
+
+        missing = [ticker for ticker in unique_tickers if ticker not in prices]
+        if missing:
+            with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(missing)))) as executor:
+                for ticker, closes in zip(missing, executor.map(fetch, missing)):
+                    if closes is not None:
+                        prices[ticker] = closes
+
+        return {ticker: prices[ticker] for ticker in unique_tickers if ticker in prices}
+
+    def _request_prices(self, ticker: str, start_date) -> list[dict]:
+        """
+        Requests the daily prices of a stock since the given date from the Tiingo API.
+
+        Args:
+            ticker (str): The stock ticker.
+            start_date (date): The first requested day.
+
+        Returns:
+            list[dict]: The price entries with `date` and `close` keys.
+
+        Raises:
+            RateLimitError: If the rate limit of the API is reached.
+            Exception: If the API request fails.
+        """
         start_date_str = start_date.strftime("%Y-%m-%d")
 
         request_url = (
@@ -79,15 +232,45 @@ class StockMarketController:
             f"&columns=close&token={self.api_key}"
         )
 
-        response = requests.get(request_url, headers=self.headers)
+        response = self._get(request_url, priority=PRIORITY_PIPELINE)
         if response.status_code != 200:
             raise Exception(f"Tiingo API request failed: {response.text}")
+        return response.json()
 
-        price_data = response.json()[-6:]  # Extract last 6 trading days
-        if not price_data:
-            raise Exception("No price data found for the given ticker.")
+    def _get(self, url: str, priority: int):
+        """
+        Sends a GET request to the Tiingo API within the rate limit.
+        A 429 response of any request pauses the requests of all processes for `Retry-After` (or an adaptive backoff);
+        pipeline requests are then sent again once the pause is over, searches fail right away.
+
+        Args:
+            url (str): The request URL.
+            priority (int): `PRIORITY_PIPELINE` or `PRIORITY_SEARCH`.
+
+        Returns:
+            requests.Response: The response other than 429.
+
+        Raises:
+            RateLimitError: If the rate limit doesn't allow the request in time or Tiingo answers 429.
+        """
+        wait = self.rate_limit_wait if priority == PRIORITY_PIPELINE else 0.0
+        deadline = time.monotonic() + wait
+        while True:
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire(priority, timeout=max(0.0, deadline - time.monotonic()))
+            response = self.http_client.get(url, headers=self.headers)
+            if response.status_code != 429:
+                if self.rate_limiter is not None:
+                    self.rate_limiter.reset_backoff()
+                return response
 
-        return [ float(entry["close"]) for entry in price_data ]
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            if self.rate_limiter is not None:
+                # every 429 pauses all processes, a search too
+                retry_after = self.rate_limiter.throttle(retry_after)
+            if self.rate_limiter is None or priority != PRIORITY_PIPELINE:
+                raise RateLimitError("Tiingo API rate limit reached.", retry_after=retry_after)
+            # the next `acquire` waits for the pause or gives up if it is longer than `wait`
 
 
 if __name__ == "__main__":
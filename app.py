@@ -1,73 +1,274 @@
-from flask import Flask, render_template, jsonify, request, redirect, url_for
-from apscheduler.schedulers.background import BackgroundScheduler
-from apscheduler.triggers.cron import CronTrigger
+from flask import Flask, Response, current_app, render_template, jsonify, request, redirect, url_for, g
 import json
+import os
+import time
+from datetime import datetime, timedelta
 
-from DataController import DataController
-from log_streamer import LogStreamer
-from StockMarketController import StockMarketController
-from config_manager import ConfigManager
-
-
-app = Flask(__name__)  # initialize the Flask app
-config_manager = ConfigManager(config_file='config.json')  # initialize the config manager
-logger = LogStreamer()  # initialize the logger
-stock_market = StockMarketController(api_key=config_manager.TIINGO_API_KEY)  # initialize the stock market controller
-scheduler = BackgroundScheduler()  # initialize the scheduler
-
-# initialize the DataController with the URL of the news module, the stock market controller, and the logger
-module_market = DataController(
-    stock_market=stock_market,
-    logger=logger,    
-    config_manager=config_manager,
-)  
-# create a job to update stock data at defined time intervals
-scheduler.add_job(
-    module_market.start_market,
-    trigger=CronTrigger(hour=config_manager.SCHEDULE, minute='0'),
-    id='start_market',
-    replace_existing=True,
-)
-scheduler.start()
+from log_streamer import DEBUG
+from metrics import MetricsRegistry
+from page_cache import StaticAssets
+from ratings import iter_ratings
+from rate_limiter import RateLimitError
+from services import Services
+
+
+# routes of the app, registered by `create_app`
+ROUTES = []
+
+
+def route(rule: str, **options):
+    """
+    Registers the decorated view under its function name, like `Flask.route` for the app built by `create_app`.
+    """
+    def decorator(view):
+        ROUTES.append((rule, view, options))
+        return view
+    return decorator
+
+
+def get_services() -> Services:
+    """
+    Returns the services of the current app.
+    """
+    return current_app.extensions['services']
+
+
+def create_app(config_file: str = 'config.json', start_scheduler: bool = True) -> Flask:
+    """
+    Creates the Flask app. The controllers are built on their first use (see `Services`),
+    so a worker boots without building them or importing their dependencies.
+
+    Args:
+        config_file (str): Path to the configuration file.
+        start_scheduler (bool): Start the leader election, the elected process runs the scheduled jobs.
+
+    Returns:
+        Flask: The app, e.g. `gunicorn "app:create_app()"`.
+    """
+    app = Flask(__name__)
+    services = Services(config_file)
+    app.extensions['services'] = services
+    for rule, view, options in ROUTES:
+        app.add_url_rule(rule, view_func=view, **options)
+    app.before_request(start_timer)
+    app.after_request(record_route_latency)
+    StaticAssets(app)  # content-hashed URLs of the static files, cached by the browsers for a year
+    if start_scheduler:
+        services.start()
+    return app
+
+
+# latency of the routes called by the users and module "News"
+TIMED_ROUTES = ('search_stock', 'receive_rating')
+
+
+def start_timer():
+    if request.endpoint in TIMED_ROUTES:
+        g.started = time.perf_counter()
+
+
+def record_route_latency(response):
+    started = g.pop('started', None)
+    if started is not None:
+        services = get_services()
+        route = request.url_rule.rule
+        services.route_seconds.observe(time.perf_counter() - started, route=route)
+        services.route_requests.inc(route=route, status=response.status_code)
+    return response
 
 
 # Route for streaming logs
-@app.route('/logs')
+@route('/logs')
 def logs():
-    return logger.stream()
+    """
+    Server-sent events with the logs. A reconnecting EventSource resumes after its `Last-Event-ID`.
+    Query parameters: `run_id`, `level` (minimum level, e.g. WARNING) and `ticker` filter the streamed logs.
+    """
+    services = get_services()
+    try:
+        return services.logger.stream(
+            last_event_id=request.headers.get('Last-Event-ID'),
+            run_id=request.args.get('run_id') or None,
+            level=request.args.get('level') or None,
+            ticker=request.args.get('ticker') or None,
+        )
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+
+
+# Route for the Prometheus metrics
+@route('/metrics')
+def metrics_endpoint():
+    services = get_services()
+    return Response(services.metrics.render(), content_type=MetricsRegistry.CONTENT_TYPE)
+
+
+# Route for the runtime statistics
+@route('/stats')
+def stats():
+    services = get_services()
+    built = services.built()
+
+    def stats_of(name):
+        # the services not used yet are not built just for the statistics
+        service = getattr(services, name) if name in built else None
+        return service.stats() if service is not None else None
+
+    return jsonify({
+        "services": built,
+        "http": stats_of("http_client"),
+        "price_cache": stats_of("price_cache"),
+        "search_cache": stats_of("search_cache"),
+        "ticker_index": stats_of("ticker_index"),
+        "page_cache": stats_of("page_cache"),
+        "rolling_state": stats_of("rolling"),
+        "rate_limiter": stats_of("rate_limiter"),
+        "news_latencies": [
+            {"run_id": run_id, "seconds": seconds} for run_id, seconds in services.module_market.news_latencies
+        ] if "module_market" in built else [],
+        "scheduler": {
+            "pid": os.getpid(),
+            "leader": services.leader.is_leader,
+            "holder": services.leader.holder(),
+        },
+    })
 
 
 # Route for the home page
-@app.route('/')
+@route('/')
 def home():
-    try:
-        favourites = module_market.get_favourite_stocks()
-    except FileNotFoundError:
-        favourites = []
-    return render_template('index.html', favourites=favourites)
+    """
+    The home page with the favourite stocks. The page is rendered again only when the favourites change,
+    browsers revalidate it with ETag/Last-Modified and get 304 Not Modified while it's unchanged.
+    """
+    services = get_services()
 
+    def render():
+        try:
+            favourites = services.module_market.get_favourite_stocks()
+        except FileNotFoundError:
+            favourites = []
+        return render_template('index.html', favourites=favourites)
+
+    page = services.page_cache.get('home', services.module_market.favourites_version(), render)
+    response = Response(page.body, mimetype='text/html')
+    response.set_etag(page.etag)
+    response.last_modified = page.last_modified
+    response.cache_control.no_cache = True  # always revalidated, the favourites may change any time
+    return response.make_conditional(request)
 
-@app.route('/start_app', methods=['POST'])
+
+@route('/start_app', methods=['POST'])
 def start_app():
     """
-    Start the application manually. Trigger the main pipeline.
+    Start the application manually. Trigger the main pipeline in the background.
+    If a run is already in flight, it is joined instead of starting a new one.
+    JSON clients get the run ID, browsers are redirected to the home page.
     """
-    module_market.start_market(mode='manually')  # start the market
-    return redirect(url_for('home'))
+    services = get_services()
+    run_id, started = services.pipeline_jobs.submit(mode='manually')  # start the market
+    if request.accept_mimetypes.best == 'application/json':
+        return jsonify({
+            'run_id': run_id,
+            'started': started,
+            'status_url': url_for('run_status', run_id=run_id),
+        }), 202
+    response = redirect(url_for('home'))
+    response.headers['X-Run-ID'] = run_id
+    return response
+
+
+@route('/runs/<run_id>', methods=['GET'])
+def run_status(run_id):
+    """
+    Status and stage progress of a pipeline run.
+    """
+    services = get_services()
+    status = services.pipeline_jobs.status(run_id)
+    if status is None:
+        return jsonify({'status': 'error', 'message': 'Unknown run'}), 404
+    return jsonify(status)
+
+
+def _parse_history_date(value: str, end: bool = False) -> float | None:
+    """
+    Converts an ISO date or datetime query parameter to a Unix timestamp.
+    A plain date as the end of a range includes the whole day.
+    """
+    if not value:
+        return None
+    moment = datetime.fromisoformat(value)
+    if end and len(value) == 10:
+        moment += timedelta(days=1)
+    return moment.timestamp()
+
+
+@route('/history', methods=['GET'])
+def history():
+    """
+    Paged history of the filtered stocks, ratings and sale recommendations.
+    Query parameters: `ticker`, `kind` (filtered/rating), `sale` (1/0), `start` and `end` (ISO dates),
+    `page` and `per_page`.
+    """
+    services = get_services()
+    if services.run_history is None:
+        return jsonify({'status': 'error', 'message': 'Run history is disabled'}), 404
+    try:
+        sale = request.args.get('sale', type=int)
+        result = services.run_history.query(
+            ticker=request.args.get('ticker') or None,
+            kind=request.args.get('kind') or None,
+            sale=sale,
+            start=_parse_history_date(request.args.get('start')),
+            end=_parse_history_date(request.args.get('end'), end=True),
+            page=request.args.get('page', 1, type=int),
+            per_page=request.args.get('per_page', 50, type=int),
+        )
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    return jsonify(result)
+
+
+@route('/history/runs', methods=['GET'])
+def history_runs():
+    """
+    Paged history of the pipeline runs with their stage timings.
+    Query parameters: `start` and `end` (ISO dates), `page` and `per_page`.
+    """
+    services = get_services()
+    if services.run_history is None:
+        return jsonify({'status': 'error', 'message': 'Run history is disabled'}), 404
+    try:
+        result = services.run_history.runs(
+            start=_parse_history_date(request.args.get('start')),
+            end=_parse_history_date(request.args.get('end'), end=True),
+            page=request.args.get('page', 1, type=int),
+            per_page=request.args.get('per_page', 50, type=int),
+        )
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    return jsonify(result)
 
 
 # Route for search functionality
-@app.route('/search_stock', methods=['GET'])
+@route('/search_stock', methods=['GET'])
 def search_stock():
+    services = get_services()
     query = request.args.get('query', '')
 
-    logger.log(f"Searching for stock: {query}")
+    services.logger.log(f"Searching for stock: {query}")
     
     if query:
         query = query.lower()
         try:
             # search for requested company using Stock Market
-            search_results = stock_market.search_ticker(query)
+            search_results = services.stock_market.search_ticker(query)
+        except RateLimitError as e:
+            # the rest of the Tiingo budget is kept for the pipeline
+            response = jsonify([])
+            if e.retry_after is not None:
+                response.headers['Retry-After'] = str(int(e.retry_after + 1))
+            return response, 429
         except Exception as e:
             # if no query/bad query will be provided, return empty results -> will be displayed in the UI as "No results found."
             search_results = []   
@@ -76,58 +277,53 @@ def search_stock():
 
 
 # Route for adding a company to the favourites list
-@app.route('/add_favourite_stock', methods=['POST'])
+@route('/add_favourite_stock', methods=['POST'])
 def add_favourite_stock():
+    services = get_services()
     ticker = request.form.get('ticker')
     name = request.form.get('name')
 
-    try:
-        favourites = module_market.get_favourite_stocks()
-    except FileNotFoundError:
-        favourites = []
-    
-    # Check if the company is already in the favourites list
-    if all(fav[1] != ticker for fav in favourites):
-        new_stock = (name, ticker)
-        module_market.update_favourite_stocks(new_stock)  # add the company to the favourites list
-        logger.log(f"Added favourite stock: {ticker}")
+    # add the company to the favourites list if it isn't there yet
+    if services.module_market.update_favourite_stocks((name, ticker)):
+        services.logger.log(f"Added favourite stock: {ticker}")
 
     return redirect(url_for('home'))
 
 
 # Route for removing a company from the favourites list
-@app.route('/delete_favourite_stock', methods=['POST'])
+@route('/delete_favourite_stock', methods=['POST'])
 def delete_favourite_stock():
+    services = get_services()
     ticker = request.form.get('ticker')
 
-    logger.log(f"Removed favourite stock: {ticker}")
-    
     # Remove the company from the favourites list
-    module_market.remove_favourite_stocks(ticker)
+    if services.module_market.remove_favourite_stocks(ticker):
+        services.logger.log(f"Removed favourite stock: {ticker}")
 
     return redirect(url_for('home'))
 
 
-@app.route('/rating', methods=['POST'])
+@route('/rating', methods=['POST'])
 def receive_rating():
     """
     The endpoint to receive ratings from the News module. 
-    This endpoint saves received JSON to DataController attribute.
+    The ratings are matched to the run that requested them by the `run_id` query parameter
+    or the `run_id` attribute of the stocks, and passed to the second step of that run.
     """
-    logger.log("Endpoint `/rating` was triggered")
+    services = get_services()
+    services.logger.log("Endpoint `/rating` was triggered")
 
     if request.method == 'POST':
-        # get the JSON data from the request
-        data = request.get_json()
-        data = json.loads(data)
-        logger.log(f"Received rating: {data}")
-
-        # valid_data = module_market.validate_stocks(data)
-        # logger.log(f"After validation stocks: {valid_data}")
-        #
-        # # save the received valid data to DataController
-        # module_market.stocks = valid_data
-        module_market.second_step_market(data)
+        # the stocks are parsed one by one while they are validated, the body isn't decoded into a list first
+        body = request.get_data(cache=False)
+        services.logger.log(f"Received rating", optional_data={'bytes': len(body)}, level=DEBUG)
+        try:
+            matched = services.module_market.second_step_market(iter_ratings(body), run_id=request.args.get('run_id'))
+        except ValueError as e:
+            # the body isn't a JSON array of stocks, also when the error is only reached while streaming it
+            return jsonify({'status': 'error', 'message': str(e)}), 400
+        if not matched:
+            return jsonify({'status': 'error', 'message': 'Unknown run'}), 404
     
         return jsonify({'status': 'success'}), 200
     else:
@@ -135,7 +331,7 @@ def receive_rating():
     
     
 ### TEST ROUTES FOR SIMULATING THE NEWS MODULE ###
-@app.route('/liststock', methods=['GET', 'POST'])
+@route('/liststock', methods=['GET', 'POST'])
 def list_stocks():
     """
     Route for listing stocks.
@@ -144,7 +340,7 @@ def list_stocks():
     return jsonify({"message": "Stocks listed successfully."}), 200
 
 
-@app.route('/salestock', methods=['GET', 'POST'])
+@route('/salestock', methods=['GET', 'POST'])
 def sale_stock():
     """
     Route for selling stocks.
@@ -155,4 +351,4 @@ def sale_stock():
 
 
 if __name__ == '__main__':
-    app.run()   # run the app
\ No newline at end of file
+    create_app().run()   # run the app
\ No newline at end of file
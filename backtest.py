@@ -0,0 +1,234 @@
+"""
+Backtest of the stock filters and the sale recommendation rule over historical daily closes.
+
+Usage:
+    python backtest.py --prices-dir ./data/history [--ratings ratings.csv] [--workers 4] [--horizon 5]
+
+Every CSV file in the prices directory holds the closes of one ticker (the file name is the ticker)
+with at least the columns `date` and `close`. The optional ratings CSV holds the columns `date`, `ticker`
+and `rating` of the News module ratings.
+
+For every ticker and every date, the filters see the window of the last closes like in the pipeline.
+A filter signal is a hit if the close rises within the horizon. A sale recommendation
+(rating > RATING_THRESHOLD) is a hit if the close falls within the horizon.
+"""
+import argparse
+import csv
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from config_manager import ConfigManager
+from filters import Filter, Filter3Days, Filter5Days, AndFilter
+
+
+WINDOW = 6  # number of closes the pipeline gets per ticker
+
+
+def load_closes(path: str) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Loads the daily closes of one ticker from a CSV file.
+
+        :param path: Path to the CSV file with the `date` and `close` columns.
+
+        :return: Dates (numpy `datetime64[D]`) and closes, sorted by date.
+    """
+    with open(path, newline="") as file:
+        rows = [(row["date"][:10], row["close"]) for row in csv.DictReader(file) if row.get("close")]
+    if not rows:
+        return np.array([], dtype="datetime64[D]"), np.array([], dtype=float)
+    dates = np.array([row[0] for row in rows], dtype="datetime64[D]")
+    closes = np.array([row[1] for row in rows], dtype=float)
+    order = np.argsort(dates, kind="stable")
+    return dates[order], closes[order]
+
+
+def load_ratings(path: str) -> dict[str, tuple[np.ndarray, np.ndarray]]:
+    """
+    Loads the News ratings from a CSV file.
+
+        :param path: Path to the CSV file with the `date`, `ticker` and `rating` columns.
+
+        :return: Dates and ratings per ticker.
+    """
+    per_ticker = {}
+    with open(path, newline="") as file:
+        for row in csv.DictReader(file):
+            per_ticker.setdefault(row["ticker"], []).append((row["date"][:10], int(row["rating"])))
+    return {
+        ticker: (np.array([r[0] for r in rows], dtype="datetime64[D]"), np.array([r[1] for r in rows], dtype=int))
+        for ticker, rows in per_ticker.items()
+    }
+
+
+def forward_returns(closes: np.ndarray, horizon: int) -> np.ndarray:
+    """
+    Relative change of the close after `horizon` trading days, NaN where the future is unknown.
+    """
+    returns = np.full(len(closes), np.nan)
+    if len(closes) > horizon:
+        returns[:-horizon] = closes[horizon:] / closes[:-horizon] - 1
+    return returns
+
+
+def backtest_ticker(dates: np.ndarray, closes: np.ndarray, filters: dict[str, Filter], horizon: int,
+                    ratings: tuple[np.ndarray, np.ndarray] = None, rating_threshold: int = 0) -> dict:
+    """
+    Backtests the filters and the recommendation rule on one ticker.
+    All windows of the ticker are evaluated at once with vectorized filters.
+
+        :param dates: Dates of the closes.
+        :param closes: Daily closes, oldest first.
+        :param filters: Filters by name.
+        :param horizon: Number of trading days to look ahead.
+        :param ratings: Dates and ratings of the ticker from the News module.
+        :param rating_threshold: Ratings above the threshold are sale recommendations.
+
+        :return: Counts of evaluated windows, signals and hits per filter and of the sale recommendations.
+    """
+    result = {"windows": 0, "filters": {name: {"signals": 0, "hits": 0} for name in filters},
+              "sales": {"signals": 0, "hits": 0}}
+    if len(closes) < WINDOW:
+        return result
+
+    windows = sliding_window_view(closes, WINDOW)  # one row per date, ending at that date
+    returns = forward_returns(closes, horizon)[WINDOW - 1:]
+    known = ~np.isnan(returns)
+    rising = returns > 0
+    result["windows"] = int(np.count_nonzero(known))
+
+    for name, filter in filters.items():
+        signals = filter.apply_batch(windows) & known
+        result["filters"][name] = {
+            "signals": int(np.count_nonzero(signals)),
+            "hits": int(np.count_nonzero(signals & rising)),
+        }
+
+    if ratings is not None:
+        rating_dates, rating_values = ratings
+        # the close of the rating day (or the last trading day before it)
+        positions = np.searchsorted(dates, rating_dates, side="right") - 1
+        all_returns = forward_returns(closes, horizon)
+        valid = (positions >= 0) & (rating_values > rating_threshold)
+        sale_returns = all_returns[positions[valid]]
+        sale_returns = sale_returns[~np.isnan(sale_returns)]
+        result["sales"] = {
+            "signals": int(len(sale_returns)),
+            "hits": int(np.count_nonzero(sale_returns < 0)),
+        }
+    return result
+
+
+def _default_filters() -> dict[str, Filter]:
+    return {
+        "Filter3Days": Filter3Days(),
+        "Filter5Days": Filter5Days(),
+        "Filter3Days & Filter5Days": AndFilter(Filter3Days(), Filter5Days()),
+    }
+
+
+def _backtest_chunk(args: tuple) -> dict:
+    """
+    Backtests a chunk of ticker files in a worker process.
+    The task carries only the ratings of its tickers, the ratings file is loaded once by `run_backtest`.
+    """
+    paths, ratings, horizon, rating_threshold = args
+    filters = _default_filters()
+    total = _empty_totals(filters)
+    for path in paths:
+        ticker = os.path.splitext(os.path.basename(path))[0]
+        dates, closes = load_closes(path)
+        _add_totals(total, backtest_ticker(dates, closes, filters, horizon, ratings.get(ticker), rating_threshold))
+        total["tickers"] += 1
+        total["days"] += len(closes)
+    return total
+
+
+def _empty_totals(filters) -> dict:
+    return {"tickers": 0, "days": 0, "windows": 0,
+            "filters": {name: {"signals": 0, "hits": 0} for name in filters},
+            "sales": {"signals": 0, "hits": 0}}
+
+
+def _add_totals(total: dict, result: dict):
+    total["windows"] += result["windows"]
+    for name, counts in result["filters"].items():
+        total["filters"][name]["signals"] += counts["signals"]
+        total["filters"][name]["hits"] += counts["hits"]
+    total["sales"]["signals"] += result["sales"]["signals"]
+    total["sales"]["hits"] += result["sales"]["hits"]
+    for key in ("tickers", "days"):
+        total[key] += result.get(key, 0)
+
+
+def run_backtest(prices_dir: str, ratings_path: str = None, workers: int = None, horizon: int = 5,
+                 rating_threshold: int = 0, chunk_size: int = 50) -> dict:
+    """
+    Backtests all tickers in the prices directory, split across a process pool.
+
+        :param prices_dir: Directory with one CSV file of closes per ticker.
+        :param ratings_path: Optional CSV file with the News ratings.
+        :param workers: Number of worker processes, defaults to the number of CPUs. 1 runs in this process.
+        :param horizon: Number of trading days to look ahead.
+        :param rating_threshold: Ratings above the threshold are sale recommendations.
+        :param chunk_size: Number of tickers per worker task.
+
+        :return: Report with the hit rates per filter and of the sale recommendations, and the throughput.
+    """
+    started = time.perf_counter()
+    paths = sorted(
+        os.path.join(prices_dir, name) for name in os.listdir(prices_dir) if name.lower().endswith(".csv")
+    )
+    ratings = load_ratings(ratings_path) if ratings_path else {}
+    tasks = []
+    for i in range(0, len(paths), chunk_size):
+        chunk = paths[i:i + chunk_size]
+        tickers = (os.path.splitext(os.path.basename(path))[0] for path in chunk)
+        tasks.append((chunk, {ticker: ratings[ticker] for ticker in tickers if ticker in ratings},
+                      horizon, rating_threshold))
+
+    total = _empty_totals(_default_filters())
+    if workers == 1:
+        for result in map(_backtest_chunk, tasks):
+            _add_totals(total, result)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for result in executor.map(_backtest_chunk, tasks):
+                _add_totals(total, result)
+
+    elapsed = time.perf_counter() - started
+    rate = lambda counts: counts["hits"] / counts["signals"] if counts["signals"] else None
+    return {
+        "tickers": total["tickers"],
+        "days": total["days"],
+        "windows": total["windows"],
+        "horizon": horizon,
+        "filters": {name: {**counts, "hit_rate": rate(counts)} for name, counts in total["filters"].items()},
+        "sales": {**total["sales"], "hit_rate": rate(total["sales"]), "rating_threshold": rating_threshold},
+        "seconds": round(elapsed, 3),
+        "windows_per_second": round(total["windows"] / elapsed) if elapsed > 0 else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtest the stock filters and the sale recommendation rule.")
+    parser.add_argument("--prices-dir", required=True, help="directory with one <TICKER>.csv file of closes per ticker")
+    parser.add_argument("--ratings", help="CSV file with the date, ticker and rating columns")
+    parser.add_argument("--workers", type=int, default=None, help="number of worker processes")
+    parser.add_argument("--horizon", type=int, default=5, help="trading days to look ahead")
+    parser.add_argument("--chunk-size", type=int, default=50, help="tickers per worker task")
+    parser.add_argument("--config", default="config.json", help="configuration file with the rating threshold")
+    args = parser.parse_args()
+
+    rating_threshold = ConfigManager(args.config).RATING_THRESHOLD
+    report = run_backtest(args.prices_dir, args.ratings, workers=args.workers, horizon=args.horizon,
+                          rating_threshold=rating_threshold, chunk_size=args.chunk_size)
+    print(json.dumps(report, indent=4))
+
+
+if __name__ == "__main__":
+    main()
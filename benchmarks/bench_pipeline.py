@@ -0,0 +1,212 @@
+"""
+Benchmark of the market pipeline (`DataController.start_market` -> `/rating` -> `second_step_market`)
+against local stand-ins for Tiingo and module "News".
+
+Usage:
+    python -m benchmarks.bench_pipeline [--sizes 10 100 1000 10000] [--baseline benchmarks/baseline.json]
+                                        [--update-baseline] [--tolerance 0.3]
+    python benchmarks/bench_pipeline.py [...]
+
+Every size runs the full pipeline once with that many favourite stocks and records the total time,
+the time spent in every stage and the peak of the traced memory. The results are compared to the
+baseline; the command exits with 1 if a metric got worse by more than the tolerance.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if not __package__:
+    # run as a script (`python benchmarks/bench_pipeline.py`) from any directory
+    sys.path.insert(0, ROOT)
+
+from benchmarks.fake_servers import FakeServer, FakeTiingo, FakeNews
+from config_manager import ConfigManager
+from DataController import DataController
+from favourites_store import FavouritesStore
+from http_client import HttpClient
+from log_streamer import LogStreamer
+from price_cache import PriceCache
+from ratings import iter_ratings
+from run_context import FINAL_STAGES
+from StockMarketController import StockMarketController
+
+
+SIZES = (10, 100, 1000, 10000)
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+MIN_SECONDS = 0.05  # timing differences below this are noise
+
+
+class RatingEndpoint(FakeServer):
+    """
+    The `/rating` endpoint of the app, passes the ratings posted by the fake News module to the pipeline.
+    """
+
+    def __init__(self, data_controller: DataController):
+        super().__init__()
+        self.data_controller = data_controller
+
+    def handle(self, method, path, query, body):
+        if method != "POST" or path != "/rating":
+            return 404, {"detail": "Not found."}
+        run_id = query.get("run_id", [None])[0]
+        try:
+            matched = self.data_controller.second_step_market(iter_ratings(body), run_id=run_id)
+        except ValueError as e:
+            return 400, {"status": "error", "message": str(e)}
+        if not matched:
+            return 404, {"status": "error", "message": "Unknown run"}
+        return 200, {"status": "success"}
+
+
+def _write_config(directory: str, news_url: str, overrides: dict = None) -> ConfigManager:
+    with open(os.path.join(ROOT, "config.json")) as file:
+        config = json.load(file)
+    config.update({
+        "news_module_url": news_url,
+        "liststock_endpoint": "/liststock",
+        "salestock_endpoint": "/salestock",
+        "favourite_stocks_path": os.path.join(directory, "favourite_stocks.txt"),
+        "favourites_db_path": os.path.join(directory, "favourites.sqlite3"),
+        "price_cache_path": os.path.join(directory, "price_cache.sqlite3"),
+        "history_db_path": None,
+        "http_backoff_factor": 0.01,
+        "log_level": "INFO",
+    })
+    config.update(overrides or {})
+    path = os.path.join(directory, "config.json")
+    with open(path, "w") as file:
+        json.dump(config, file)
+    return ConfigManager(path)
+
+
+def run_pipeline(size: int, tiingo_latency: float = 0.0, tiingo_error_rate: float = 0.0, news_latency: float = 0.0,
+                 news_error_rate: float = 0.0, rating_delay: float = 0.0, config: dict = None) -> dict:
+    """
+    Runs the full pipeline once with `size` favourite stocks.
+
+    Args:
+        size (int): Number of favourite stocks.
+        tiingo_latency (float): Seconds every Tiingo response is delayed.
+        tiingo_error_rate (float): Probability of a Tiingo response with 500.
+        news_latency (float): Seconds every News response is delayed.
+        news_error_rate (float): Probability of a News response with 500.
+        rating_delay (float): Seconds module "News" needs to rate the stocks.
+        config (dict): Overrides of the configuration, e.g. `fetch_concurrency`.
+
+    Returns:
+        dict: `final_stage`, `filtered` stocks, `total_seconds`, `stages` timings and `peak_memory_bytes`.
+    """
+    with tempfile.TemporaryDirectory() as directory, \
+            FakeTiingo(latency=tiingo_latency, error_rate=tiingo_error_rate) as tiingo, \
+            FakeNews(rating_delay=rating_delay, latency=news_latency, error_rate=news_error_rate) as news:
+        config_manager = _write_config(directory, news.url, config)
+        favourites = FavouritesStore(config_manager.FAVOURITES_DB_PATH)
+        for i in range(size):
+            favourites.add(f"Company {i}", f"T{i:05d}")
+        http_client = HttpClient(
+            pool_size=max(config_manager.HTTP_POOL_SIZE, config_manager.FETCH_CONCURRENCY),
+            connect_timeout=config_manager.HTTP_CONNECT_TIMEOUT,
+            read_timeout=config_manager.HTTP_READ_TIMEOUT,
+            retries=config_manager.HTTP_RETRIES,
+            backoff_factor=config_manager.HTTP_BACKOFF_FACTOR,
+        )
+        price_cache = PriceCache(config_manager.PRICE_CACHE_PATH)
+        stock_market = StockMarketController(api_key="benchmark", http_client=http_client,
+                                             price_cache=price_cache, base_url=tiingo.url)
+        data_controller = DataController(stock_market, LogStreamer(level=logging.getLevelName(config_manager.LOG_LEVEL)),
+                                         config_manager, http_client=http_client, favourites=favourites)
+        done = threading.Event()
+        data_controller.stage_listener = lambda run_id, stage: done.set() if stage in FINAL_STAGES else None
+
+        with RatingEndpoint(data_controller) as rating:
+            news.rating_url = f"{rating.url}/rating"
+            tracemalloc.start()
+            started = time.perf_counter()
+            run = data_controller.start_market(mode="benchmark")
+            done.wait(config_manager.NEWS_TIMEOUT)
+            total = time.perf_counter() - started
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+        price_cache.close()
+        favourites.close()
+        http_client.close()
+        return {
+            "final_stage": run.stage,
+            "filtered": len(run.tickers),
+            "total_seconds": round(total, 4),
+            "stages": {stage: round(seconds, 4) for stage, seconds in run.timings.items()},
+            "peak_memory_bytes": peak,
+        }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """
+    Compares the results to the baseline.
+
+    Returns:
+        list[str]: Descriptions of the metrics that got worse by more than the tolerance.
+    """
+    regressions = []
+    for size, result in results.items():
+        expected = baseline.get(size)
+        if expected is None:
+            continue
+        if result["final_stage"] != expected["final_stage"]:
+            regressions.append(f"{size}: final stage {result['final_stage']!r}, expected {expected['final_stage']!r}")
+        limit = max(expected["total_seconds"] * (1 + tolerance), expected["total_seconds"] + MIN_SECONDS)
+        if result["total_seconds"] > limit:
+            regressions.append(f"{size}: total {result['total_seconds']} s, baseline {expected['total_seconds']} s")
+        if result["peak_memory_bytes"] > expected["peak_memory_bytes"] * (1 + tolerance):
+            regressions.append(
+                f"{size}: peak memory {result['peak_memory_bytes']} B, baseline {expected['peak_memory_bytes']} B"
+            )
+    return regressions
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the market pipeline against fake Tiingo and News.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(SIZES), help="numbers of favourite stocks")
+    parser.add_argument("--tiingo-latency", type=float, default=0.0, help="seconds per Tiingo response")
+    parser.add_argument("--tiingo-error-rate", type=float, default=0.0, help="probability of a Tiingo 500")
+    parser.add_argument("--news-latency", type=float, default=0.0, help="seconds per News response")
+    parser.add_argument("--news-error-rate", type=float, default=0.0, help="probability of a News 500")
+    parser.add_argument("--rating-delay", type=float, default=0.0, help="seconds until News posts the ratings")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="baseline results to compare with")
+    parser.add_argument("--update-baseline", action="store_true", help="store the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.3, help="allowed relative regression")
+    args = parser.parse_args(argv)
+
+    results = {}
+    for size in args.sizes:
+        results[str(size)] = run_pipeline(
+            size, tiingo_latency=args.tiingo_latency, tiingo_error_rate=args.tiingo_error_rate,
+            news_latency=args.news_latency, news_error_rate=args.news_error_rate, rating_delay=args.rating_delay,
+        )
+        print(json.dumps({size: results[str(size)]}), flush=True)
+
+    if args.update_baseline:
+        with open(args.baseline, "w") as file:
+            json.dump(results, file, indent=4)
+        print(f"Baseline stored in {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline in {args.baseline}, run with --update-baseline first")
+        return 0
+    with open(args.baseline) as file:
+        regressions = compare(results, json.load(file), args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,146 @@
+"""
+Benchmark of the worker startup: importing `app`, creating the app with `create_app` and serving the first request.
+
+Usage:
+    python -m benchmarks.bench_startup [--repeat 5] [--baseline benchmarks/startup_baseline.json]
+                                       [--update-baseline] [--tolerance 0.5]
+
+Every repetition boots a fresh interpreter like a new gunicorn worker and records the time of the import,
+of `create_app` (with the leader election, so the elected worker starts the scheduler) and of the first
+request of the home page, which builds the controllers. The medians are compared to the baseline;
+the command exits with 1 if a timing got worse by more than the tolerance.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "startup_baseline.json")
+MIN_SECONDS = 0.05  # timing differences below this are noise
+HEAVY_MODULES = ("apscheduler", "requests", "numpy", "DataController")
+
+# runs in the fresh interpreter, the config file is the first argument
+_WORKER = """
+import json, sys, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+flask_app = app.create_app(sys.argv[1])
+created = time.perf_counter()
+loaded = [module for module in {heavy!r} if module in sys.modules]
+response = flask_app.test_client().get("/")
+served = time.perf_counter()
+print(json.dumps({{
+    "import_seconds": imported - started,
+    "create_seconds": created - imported,
+    "boot_seconds": created - started,
+    "first_request_seconds": served - created,
+    "status": response.status_code,
+    "loaded_at_boot": loaded,
+}}))
+"""
+
+
+def _write_config(directory: str) -> str:
+    with open(os.path.join(ROOT, "config.json")) as file:
+        config = json.load(file)
+    config.update({
+        "favourite_stocks_path": os.path.join(directory, "favourite_stocks.txt"),
+        "favourites_db_path": os.path.join(directory, "favourites.sqlite3"),
+        "price_cache_path": os.path.join(directory, "price_cache.sqlite3"),
+        "rolling_state_path": os.path.join(directory, "rolling_state.npz"),
+        "history_db_path": os.path.join(directory, "history.sqlite3"),
+        "rate_limit_path": os.path.join(directory, "rate_limit.sqlite3"),
+        "leader_lock_path": os.path.join(directory, "scheduler.lock"),
+    })
+    path = os.path.join(directory, "config.json")
+    with open(path, "w") as file:
+        json.dump(config, file)
+    return path
+
+
+def boot_worker(config_file: str) -> dict:
+    """
+    Boots the app in a fresh interpreter and serves one request.
+
+    Returns:
+        dict: `import_seconds`, `create_seconds`, `boot_seconds`, `first_request_seconds`, the `status`
+            of the request and the heavy modules `loaded_at_boot`.
+    """
+    result = subprocess.run(
+        [sys.executable, "-c", _WORKER.format(heavy=HEAVY_MODULES), config_file],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def run_startup(repeat: int = 5) -> dict:
+    """
+    Boots `repeat` workers one after another, every one in its own data directory.
+
+    Returns:
+        dict: Median of every timing in seconds and the heavy modules loaded at boot.
+    """
+    boots = []
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory() as directory:
+            boots.append(boot_worker(_write_config(directory)))
+    result = {
+        key: round(statistics.median(boot[key] for boot in boots), 4)
+        for key in ("import_seconds", "create_seconds", "boot_seconds", "first_request_seconds")
+    }
+    result["loaded_at_boot"] = sorted({module for boot in boots for module in boot["loaded_at_boot"]})
+    return result
+
+
+def compare(result: dict, baseline: dict, tolerance: float) -> list[str]:
+    """
+    Compares the result to the baseline.
+
+    Returns:
+        list[str]: Descriptions of the timings that got worse by more than the tolerance.
+    """
+    regressions = []
+    for key in ("import_seconds", "boot_seconds", "first_request_seconds"):
+        if key not in baseline:
+            continue
+        limit = max(baseline[key] * (1 + tolerance), baseline[key] + MIN_SECONDS)
+        if result[key] > limit:
+            regressions.append(f"{key} {result[key]} s, baseline {baseline[key]} s")
+    return regressions
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the import and boot time of a worker.")
+    parser.add_argument("--repeat", type=int, default=5, help="number of booted workers")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="baseline results to compare with")
+    parser.add_argument("--update-baseline", action="store_true", help="store the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="allowed relative regression")
+    args = parser.parse_args(argv)
+
+    result = run_startup(args.repeat)
+    print(json.dumps(result), flush=True)
+
+    if args.update_baseline:
+        with open(args.baseline, "w") as file:
+            json.dump(result, file, indent=4)
+        print(f"Baseline stored in {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline in {args.baseline}, run with --update-baseline first")
+        return 0
+    with open(args.baseline) as file:
+        regressions = compare(result, json.load(file), args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
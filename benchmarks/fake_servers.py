@@ -0,0 +1,181 @@
+import json
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import requests
+
+from price_cache import last_trading_day
+
+
+class FakeServer:
+    """
+    Local HTTP server in a background thread, used as a stand-in for the external APIs.
+    Every request path is recorded in `requests`. Every response is delayed by `latency` seconds
+    and answers with 500 with the probability `error_rate`.
+    """
+
+    def __init__(self, latency: float = 0.0, error_rate: float = 0.0, seed: int = 0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.requests = []
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._make_handler())
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def handle(self, method: str, path: str, query: dict, body: bytes) -> tuple[int, object]:
+        """
+        Answers a request with the status code and the JSON payload.
+        """
+        return 404, {"detail": "Not found."}
+
+    def _fail(self) -> bool:
+        with self._lock:
+            return self.error_rate > 0 and self._random.random() < self.error_rate
+
+    def _make_handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                self._dispatch("GET")
+
+            def do_POST(self):
+                self._dispatch("POST")
+
+            def _dispatch(self, method):
+                url = urlparse(self.path)
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                with fake._lock:
+                    fake.requests.append(url.path)
+                if fake.latency:
+                    time.sleep(fake.latency)
+                if fake._fail():
+                    return self._send(500, {"detail": "Injected error."})
+                self._send(*fake.handle(method, url.path, parse_qs(url.query), body))
+
+            def _send(self, status, payload):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class FakeTiingo(FakeServer):
+    """
+    Local stand-in for the Tiingo daily prices and search endpoints.
+    Tickers listed in `failing` answer with 404.
+    The closes of a ticker only depend on the ticker and on how many trading days ago they were,
+    so the filters pass the same tickers on every day of the week (see `passes_filters`).
+    """
+
+    PASS_RATE = 0.5  # part of the tickers whose closes pass the filters
+
+    def __init__(self, failing: tuple = (), latency: float = 0.0, error_rate: float = 0.0, seed: int = 0):
+        super().__init__(latency=latency, error_rate=error_rate, seed=seed)
+        self.failing = set(failing)
+
+    @classmethod
+    def passes_filters(cls, ticker: str) -> bool:
+        """
+        True if the closes of the ticker rise every day, otherwise they fall every day.
+        """
+        return random.Random(ticker).random() < cls.PASS_RATE
+
+    @classmethod
+    def closes(cls, ticker: str, start: str, today=None) -> list[dict]:
+        """
+        Deterministic daily closes of the ticker for the weekdays since `start` up to the last trading day.
+        """
+        day = datetime.strptime(start, "%Y-%m-%d").date()
+        last = last_trading_day(today or datetime.now().date())
+        days = []
+        while day <= last:
+            if day.weekday() < 5:
+                days.append(day)
+            day += timedelta(days=1)
+        base = 100.0 + sum(ord(char) for char in ticker) % 100
+        step = 1.0 if cls.passes_filters(ticker) else -1.0
+        # counted back from the last trading day, the closes seen by the pipeline don't depend on the date
+        return [
+            {"date": f"{day.isoformat()}T00:00:00.000Z", "close": base - step * (len(days) - 1 - i)}
+            for i, day in enumerate(days)
+        ]
+
+    def handle(self, method, path, query, body):
+        parts = path.strip("/").split("/")
+        if parts[:2] == ["tiingo", "daily"] and len(parts) == 4 and parts[3] == "prices":
+            ticker = parts[2]
+            if ticker in self.failing:
+                return 404, {"detail": "Not found."}
+            return 200, self.closes(ticker, query["startDate"][0])
+        if parts == ["tiingo", "utilities", "search"]:
+            text = query["query"][0]
+            return 200, [{"name": f"{text.title()} Inc.", "ticker": text.upper()}]
+        return 404, {"detail": "Not found."}
+
+    def price_requests(self) -> list[str]:
+        return [path for path in self.requests if path.endswith("/prices")]
+
+
+class FakeNews(FakeServer):
+    """
+    Local stand-in for module "News".
+    The stocks received on `/liststock` are rated with random ratings and posted back to `rating_url`
+    after `rating_delay` seconds, like module "News" calls the `/rating` endpoint of the app.
+    The recommendations received on `/salestock` are kept in `sales`.
+    """
+
+    def __init__(self, rating_url: str = None, rating_delay: float = 0.0, latency: float = 0.0,
+                 error_rate: float = 0.0, seed: int = 0):
+        super().__init__(latency=latency, error_rate=error_rate, seed=seed)
+        self.rating_url = rating_url
+        self.rating_delay = rating_delay
+        self.sales = []
+        self._ratings = random.Random(seed)
+
+    def handle(self, method, path, query, body):
+        if method != "POST":
+            return 405, {"detail": "Method not allowed."}
+        # the app sends the stocks as a JSON encoded string
+        stocks = json.loads(json.loads(body)) if body else []
+        if path == "/liststock":
+            if self.rating_url is not None:
+                threading.Thread(target=self._rate, args=(stocks,), daemon=True).start()
+            return 200, {"message": "Stocks listed successfully."}
+        if path == "/salestock":
+            with self._lock:
+                self.sales.append(stocks)
+            return 200, {"message": "Stock sold successfully."}
+        return 404, {"detail": "Not found."}
+
+    def _rate(self, stocks: list[dict]):
+        if self.rating_delay:
+            time.sleep(self.rating_delay)
+        with self._lock:
+            rated = [{**stock, "rating": self._ratings.randint(-10, 10)} for stock in stocks]
+        run_id = stocks[0].get("run_id") if stocks else None
+        requests.post(self.rating_url, params={"run_id": run_id}, json=json.dumps(rated), timeout=30)
@@ -15,8 +15,59 @@ class ConfigManager:
         self.LISTSTOCK_ENDPOINT    = config.get("liststock_endpoint")
         self.SALESTOCK_ENDPOINT    = config.get("salestock_endpoint")
         self.FAVOURITE_STOCKS_PATH = config.get("favourite_stocks_path")
+        self.FAVOURITES_DB_PATH    = config.get("favourites_db_path", "./data/favourites.sqlite3")
         self.SCHEDULE              = config.get("schedule")
         self.NEWS_URL              = config.get("news_module_url")
+        self.FETCH_CONCURRENCY     = config.get("fetch_concurrency", 8)
+        self.HTTP_POOL_SIZE        = config.get("http_pool_size", 10)
+        self.HTTP_CONNECT_TIMEOUT  = config.get("http_connect_timeout", 5)
+        self.HTTP_READ_TIMEOUT     = config.get("http_read_timeout", 30)
+        self.HTTP_RETRIES          = config.get("http_retries", 3)
+        self.HTTP_BACKOFF_FACTOR   = config.get("http_backoff_factor", 0.5)
+        self.PRICE_CACHE_PATH      = config.get("price_cache_path")
+        self.ROLLING_STATE_PATH    = config.get("rolling_state_path")
+        self.SEARCH_CACHE_TTL      = config.get("search_cache_ttl", 300)
+        self.SEARCH_CACHE_SIZE     = config.get("search_cache_size", 1024)
+        self.TICKER_INDEX_PATH     = config.get("ticker_index_path")
+        self.TICKER_INDEX_URL      = config.get("ticker_index_url")
+        self.TICKER_INDEX_MAX_RESULTS = config.get("ticker_index_max_results", 10)
+        self.TICKER_INDEX_REFRESH_INTERVAL = config.get("ticker_index_refresh_interval", 86400)
+        self.NEWS_TIMEOUT          = config.get("news_timeout", 60)
+        self.LOG_CAPACITY          = config.get("log_capacity", 1000)
+        self.LOG_LEVEL             = config.get("log_level", "INFO")
+        self.PIPELINE_WORKERS      = config.get("pipeline_workers", 2)
+        self.HISTORY_DB_PATH       = config.get("history_db_path")
+        self.LISTSTOCK_CHUNK_SIZE  = config.get("liststock_chunk_size", 500)
+        self.LISTSTOCK_CONCURRENCY = config.get("liststock_concurrency", 4)
+        self.SALESTOCK_MODE        = config.get("salestock_mode", "final")
+        self.RATE_LIMIT_PATH       = config.get("rate_limit_path")
+        self.RATE_LIMIT_PER_HOUR   = config.get("rate_limit_per_hour")
+        self.RATE_LIMIT_PER_DAY    = config.get("rate_limit_per_day")
+        self.RATE_LIMIT_SEARCH_RESERVE = config.get("rate_limit_search_reserve", 0.2)
+        self.RATE_LIMIT_WAIT       = self._rate_limit_wait(config.get("rate_limit_wait"))
+        self.LEADER_LOCK_PATH      = config.get("leader_lock_path", "./data/scheduler.lock")
+        self.LEADER_RETRY_INTERVAL = config.get("leader_retry_interval", 5)
+
+    def _rate_limit_wait(self, configured: float | None) -> float:
+        """
+        Seconds a pipeline request may wait for the rate limit.
+        Once the burst is used up, a request gets a token only after the refill interval of the slowest budget
+        (e.g. 72 s at 50 requests per hour), so a shorter wait would skip every remaining ticker.
+        Without a configured value, every fetch worker may wait for its own token.
+
+        Args:
+            configured (float): The configured `rate_limit_wait`, or None.
+
+        Returns:
+            float: The configured wait, at least one refill interval.
+        """
+        refill = max(
+            (period / limit for limit, period in ((self.RATE_LIMIT_PER_HOUR, 3600), (self.RATE_LIMIT_PER_DAY, 86400)) if limit),
+            default=0.0,
+        )
+        if configured is None:
+            return max(60.0, refill * self.FETCH_CONCURRENCY)
+        return max(configured, refill)
 
     def _load_config(self, config_file: str):
         """
@@ -0,0 +1,163 @@
+import os
+import sqlite3
+import threading
+from typing import Tuple
+
+
+class FavouritesStore:
+    """
+    Store of the user favourite stocks backed by SQLite.
+
+    This class provides:
+    - Atomic add and remove of a stock, safe with several worker processes writing at the same time.
+    - O(1) membership checks and listing from an in-memory index.
+      The index is reloaded only when another process changed the database.
+    - A one-time import of the legacy `name,ticker` text file.
+    """
+
+    def __init__(self, path: str, legacy_path: str = None):
+        """
+        Initializes the FavouritesStore.
+
+        Args:
+            path (str): Path to the SQLite database file, created if it doesn't exist.
+            legacy_path (str): Path to the legacy `name,ticker` text file imported on the first start.
+        """
+        self.path = path
+        self._lock = threading.RLock()
+        self._connection = sqlite3.connect(path, check_same_thread=False, timeout=5)
+        with self._lock, self._connection:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS favourites ("
+                " position INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " ticker TEXT NOT NULL UNIQUE, name TEXT NOT NULL)"
+            )
+            self._connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+
+        self._index = {}  # ticker -> name, in the order the stocks were added
+        self._data_version = None  # SQLite data version the index was loaded at
+        self.version = 0  # incremented on every change of the index
+
+        if legacy_path:
+            self.import_legacy(legacy_path)
+        self._refresh()
+
+    def import_legacy(self, legacy_path: str) -> int:
+        """
+        Imports the stocks from the legacy `name,ticker` text file, once per database.
+
+        Args:
+            legacy_path (str): Path to the text file.
+
+        Returns:
+            int: Number of imported stocks.
+        """
+        if not os.path.exists(legacy_path):
+            return 0
+        with self._lock:
+            # BEGIN IMMEDIATE makes concurrently starting workers import the file only once
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                imported = self._connection.execute(
+                    "SELECT value FROM meta WHERE key = 'legacy_imported'"
+                ).fetchone()
+                count = 0
+                if imported is None:
+                    with open(legacy_path, "r") as file:
+                        for line in file:
+                            line = line.strip()
+                            if not line:
+                                continue
+                            name, ticker = line.rsplit(",", 1)  # the company name may contain commas
+                            count += self._connection.execute(
+                                "INSERT OR IGNORE INTO favourites (ticker, name) VALUES (?, ?)", (ticker, name)
+                            ).rowcount
+                    self._connection.execute(
+                        "INSERT INTO meta (key, value) VALUES ('legacy_imported', ?)", (legacy_path,)
+                    )
+                self._connection.execute("COMMIT")
+            except Exception:
+                self._connection.execute("ROLLBACK")
+                raise
+            if count:
+                self._reload()
+            return count
+
+    def _refresh(self):
+        """
+        Reloads the index if the database was changed by another connection since the last load.
+        """
+        data_version = self._connection.execute("PRAGMA data_version").fetchone()[0]
+        if data_version != self._data_version:
+            self._reload()
+            self._data_version = data_version
+
+    def _reload(self):
+        rows = self._connection.execute("SELECT ticker, name FROM favourites ORDER BY position").fetchall()
+        self._index = dict(rows)
+        self.version += 1
+
+    def add(self, name: str, ticker: str) -> bool:
+        """
+        Adds a stock to the favourites if it isn't there yet.
+
+        Returns:
+            bool: True if the stock was added.
+        """
+        with self._lock:
+            self._refresh()
+            with self._connection:
+                added = self._connection.execute(
+                    "INSERT OR IGNORE INTO favourites (ticker, name) VALUES (?, ?)", (ticker, name)
+                ).rowcount == 1
+            if added:
+                self._index[ticker] = name
+                self.version += 1
+            return added
+
+    def remove(self, ticker: str) -> bool:
+        """
+        Removes a stock from the favourites.
+
+        Returns:
+            bool: True if the stock was removed.
+        """
+        with self._lock:
+            self._refresh()
+            with self._connection:
+                removed = self._connection.execute(
+                    "DELETE FROM favourites WHERE ticker = ?", (ticker,)
+                ).rowcount == 1
+            if removed or ticker in self._index:
+                self._index.pop(ticker, None)
+                self.version += 1
+            return removed
+
+    def contains(self, ticker: str) -> bool:
+        """
+        Checks whether the stock is in the favourites.
+        """
+        with self._lock:
+            self._refresh()
+            return ticker in self._index
+
+    def current_version(self) -> int:
+        """
+        Returns the version of the favourites, it changes whenever a stock is added or removed,
+        also by another process.
+        """
+        with self._lock:
+            self._refresh()
+            return self.version
+
+    def list(self) -> list[Tuple[str, str]]:
+        """
+        Returns the favourite stocks as tuples (name, ticker) in the order they were added.
+        """
+        with self._lock:
+            self._refresh()
+            return [(name, ticker) for ticker, name in self._index.items()]
+
+    def close(self):
+        self._connection.close()
@@ -1,12 +1,52 @@
+import numpy as np
+
+
 class Filter:
     """
     Abstract class for filters.
     This class defines the interface for all filters.
+
+    `apply` checks the prices of one stock. `apply_batch` checks the closes of many stocks at once,
+    given as a 2-D array with one row per stock (see `to_matrix`). Subclasses without a vectorized
+    `apply_batch` fall back to calling `apply` row by row. `apply_rolling` checks the stocks kept
+    in a `rolling_state.RollingCloses`, by default over the matrix of their windows.
+    Filters can be combined with `&` (all must pass) and `|` (any must pass).
     """
     @staticmethod
     def apply(prices: list[float]) -> bool:
         raise NotImplementedError("Subclasses should implement this method.")
-    
+
+    def apply_batch(self, closes: np.ndarray) -> np.ndarray:
+        """
+        Fallback adapter evaluating `apply` on every row of the matrix, without the NaN padding.
+
+            :param closes: 2-D array of closes, one row per stock, oldest close first.
+
+            :return: Boolean mask with one value per stock.
+        """
+        return np.fromiter(
+            (self.apply(row[~np.isnan(row)].tolist()) for row in closes),
+            dtype=bool,
+            count=len(closes),
+        )
+
+    def apply_rolling(self, state, rows: np.ndarray) -> np.ndarray:
+        """
+        Fallback adapter evaluating `apply_batch` over the windows of the rows of the rolling state.
+
+            :param state: `rolling_state.RollingCloses` with the last closes of the stocks.
+            :param rows: Rows of the stocks in the state (see `RollingCloses.rows`).
+
+            :return: Boolean mask with one value per row.
+        """
+        return self.apply_batch(state.matrix(rows))
+
+    def __and__(self, other: "Filter") -> "Filter":
+        return AndFilter(self, other)
+
+    def __or__(self, other: "Filter") -> "Filter":
+        return OrFilter(self, other)
+
 
 class Filter3Days(Filter):
     """
@@ -19,7 +59,16 @@ class Filter3Days(Filter):
             if relevant_prices[i - 1] > relevant_prices[i]:
                 return False
         return True
-    
+
+    @staticmethod
+    def apply_batch(closes: np.ndarray) -> np.ndarray:
+        relevant_closes = closes[:, -3:]
+        return ~np.any(relevant_closes[:, :-1] > relevant_closes[:, 1:], axis=1)
+
+    @staticmethod
+    def apply_rolling(state, rows: np.ndarray) -> np.ndarray:
+        return state.declines(rows, 2) == 0
+
 
 class Filter5Days(Filter):
     """
@@ -34,3 +83,94 @@ class Filter5Days(Filter):
                 declines += 1
         return declines <= 2
 
+    @staticmethod
+    def apply_batch(closes: np.ndarray) -> np.ndarray:
+        relevant_closes = closes[:, -5:]
+        declines = np.count_nonzero(relevant_closes[:, :-1] > relevant_closes[:, 1:], axis=1)
+        return declines <= 2
+
+    @staticmethod
+    def apply_rolling(state, rows: np.ndarray) -> np.ndarray:
+        return state.declines(rows, 4) <= 2
+
+
+class AndFilter(Filter):
+    """
+    Filter that passes if all of the combined filters pass.
+    """
+    def __init__(self, *filters: Filter):
+        self.filters = filters
+
+    def apply(self, prices: list[float]) -> bool:
+        return all(filter.apply(prices) for filter in self.filters)
+
+    def apply_batch(self, closes: np.ndarray) -> np.ndarray:
+        mask = np.ones(len(closes), dtype=bool)
+        for filter in self.filters:
+            mask &= filter.apply_batch(closes)
+        return mask
+
+    def apply_rolling(self, state, rows: np.ndarray) -> np.ndarray:
+        mask = np.ones(len(rows), dtype=bool)
+        for filter in self.filters:
+            mask &= filter.apply_rolling(state, rows)
+        return mask
+
+
+class OrFilter(Filter):
+    """
+    Filter that passes if any of the combined filters passes.
+    """
+    def __init__(self, *filters: Filter):
+        self.filters = filters
+
+    def apply(self, prices: list[float]) -> bool:
+        return any(filter.apply(prices) for filter in self.filters)
+
+    def apply_batch(self, closes: np.ndarray) -> np.ndarray:
+        mask = np.zeros(len(closes), dtype=bool)
+        for filter in self.filters:
+            mask |= filter.apply_batch(closes)
+        return mask
+
+    def apply_rolling(self, state, rows: np.ndarray) -> np.ndarray:
+        mask = np.zeros(len(rows), dtype=bool)
+        for filter in self.filters:
+            mask |= filter.apply_rolling(state, rows)
+        return mask
+
+
+def to_matrix(prices: list[list[float]], width: int = None) -> np.ndarray:
+    """
+    Packs the price lists of many stocks into one 2-D array, one row per stock.
+    Shorter lists are padded with NaN on the left; NaN never counts as a decline,
+    so the padded rows behave like the original shorter lists.
+
+        :param prices: Price lists, oldest close first.
+        :param width: Number of columns (the newest closes are kept), defaults to the longest list.
+
+        :return: 2-D float array of shape (len(prices), width).
+    """
+    if width is None:
+        width = max((len(row) for row in prices), default=0)
+    matrix = np.full((len(prices), width), np.nan)
+    for i, row in enumerate(prices):
+        row = row[-width:] if width else []
+        if len(row):
+            matrix[i, width - len(row):] = row
+    return matrix
+
+
+def evaluate_batch(filters: list[Filter], closes: np.ndarray) -> np.ndarray:
+    """
+    Evaluates every filter over all stocks at once.
+
+        :param filters: The filters to evaluate.
+        :param closes: 2-D array of closes, one row per stock (see `to_matrix`).
+
+        :return: Boolean array of shape (len(filters), number of stocks), one mask per filter.
+    """
+    masks = np.empty((len(filters), len(closes)), dtype=bool)
+    for i, filter in enumerate(filters):
+        masks[i] = filter.apply_batch(closes)
+    return masks
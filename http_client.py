@@ -0,0 +1,109 @@
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.poolmanager import PoolManager
+from urllib3.util.retry import Retry
+
+
+class _CountingAdapter(HTTPAdapter):
+    """
+    HTTPAdapter that remembers the connection counters of the pools it disposes,
+    so the statistics of the HttpClient survive the eviction of a pool.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self._lock = threading.Lock()
+        self.retired_connections = 0
+        self.retired_requests = 0
+        super().__init__(*args, **kwargs)
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        super().init_poolmanager(connections, maxsize, block=block, **pool_kwargs)
+        self.poolmanager.pools.dispose_func = self._dispose_pool
+
+    def _dispose_pool(self, pool):
+        with self._lock:
+            self.retired_connections += pool.num_connections
+            self.retired_requests += pool.num_requests
+        pool.close()
+
+    def pools(self) -> list:
+        """
+        Returns the connection pools that are currently alive.
+        """
+        manager: PoolManager = self.poolmanager
+        return [manager.pools[key] for key in manager.pools.keys()]
+
+
+class HttpClient:
+    """
+    Shared HTTP client built on a pooled keep-alive `requests.Session`.
+
+    This class provides:
+    - Connection pooling, so repeated requests to Tiingo and the News module reuse TLS connections.
+    - Connect and read timeouts applied to every request.
+    - Retries with exponential backoff for connection errors and 5xx responses of idempotent requests.
+    - Connection reuse counters to verify the savings under load.
+    """
+
+    def __init__(self, pool_size: int = 10, connect_timeout: float = 5.0, read_timeout: float = 30.0,
+                 retries: int = 3, backoff_factor: float = 0.5):
+        """
+        Initializes the HttpClient with a pooled session.
+
+        Args:
+            pool_size (int): Maximum number of kept-alive connections per host.
+            connect_timeout (float): Seconds to wait for establishing a connection.
+            read_timeout (float): Seconds to wait for the server response.
+            retries (int): Number of retries of failed idempotent requests.
+            backoff_factor (float): Backoff factor between retries (0.5 -> 0.5s, 1s, 2s, ...).
+        """
+        self.timeout = (connect_timeout, read_timeout)
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(500, 502, 503, 504),
+            raise_on_status=False,  # return the last response, the callers check the status code
+        )
+        self._adapter = _CountingAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("https://", self._adapter)
+        self.session.mount("http://", self._adapter)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        """
+        Sends a GET request through the pooled session.
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        return self.session.get(url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        """
+        Sends a POST request through the pooled session.
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        return self.session.post(url, **kwargs)
+
+    def stats(self) -> dict:
+        """
+        Returns the connection reuse counters of the client.
+
+        Returns:
+            dict: `requests` sent over the wire, `connections_opened` (each one costs a TCP/TLS handshake)
+            and `connections_reused` (requests that were served by an already open connection).
+        """
+        pools = self._adapter.pools()
+        with self._adapter._lock:
+            connections = self._adapter.retired_connections + sum(pool.num_connections for pool in pools)
+            sent = self._adapter.retired_requests + sum(pool.num_requests for pool in pools)
+        return {
+            "requests": sent,
+            "connections_opened": connections,
+            "connections_reused": max(0, sent - connections),
+        }
+
+    def close(self):
+        """
+        Closes all pooled connections.
+        """
+        self.session.close()
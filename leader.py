@@ -0,0 +1,137 @@
+import json
+import os
+import socket
+import threading
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows, every process is the leader there
+    fcntl = None
+
+
+def _is_running(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, TypeError):
+        return True
+    return True
+
+
+class LeaderElection:
+    """
+    Leader election across the processes of one host based on an exclusive lock of a file.
+
+    This class provides methods to:
+    - Try to become the leader in a background thread until the lock is acquired.
+    - Run a callback once the process is elected (e.g. start the scheduler).
+    - Show which process holds the leadership.
+
+    The operating system releases the lock when the leader process dies, so another process
+    takes over at its next attempt.
+    """
+
+    def __init__(self, lock_path: str, on_elected=None, retry_interval: float = 5.0):
+        """
+        Initializes the LeaderElection.
+
+        Args:
+            lock_path (str): Path to the lock file, shared by all processes.
+            on_elected (callable): Called without arguments when this process becomes the leader.
+            retry_interval (float): Seconds between the attempts to become the leader.
+        """
+        self.lock_path = lock_path
+        self.on_elected = on_elected
+        self.retry_interval = retry_interval
+        self.is_leader = False
+        self.elected_at = None
+        self._file = None
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def try_acquire(self) -> bool:
+        """
+        Tries to become the leader without blocking.
+
+        Returns:
+            bool: True if this process is the leader.
+        """
+        if self.is_leader:
+            return True
+        file = open(self.lock_path, "a+")
+        if fcntl is not None:
+            try:
+                fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                file.close()
+                return False
+        self._file = file
+        self.elected_at = datetime.now().isoformat(timespec="seconds")
+        # record the holder before announcing the leadership, the other processes only read the file
+        file.seek(0)
+        file.truncate()
+        file.write(json.dumps({"pid": os.getpid(), "host": socket.gethostname(), "since": self.elected_at}))
+        file.flush()
+        self.is_leader = True
+        if self.on_elected is not None:
+            try:
+                self.on_elected()
+            except Exception:
+                self._release()  # let another process take over
+                raise
+        return True
+
+    def start(self):
+        """
+        Tries to become the leader now and keeps trying in a background thread until it succeeds.
+        """
+        try:
+            if self.try_acquire():
+                return
+        except Exception:
+            pass  # retried in the background
+        self._thread = threading.Thread(target=self._retry, name="leader-election", daemon=True)
+        self._thread.start()
+
+    def _retry(self):
+        while not self._stopped.wait(self.retry_interval):
+            try:
+                if self.try_acquire():
+                    return
+            except Exception:
+                pass  # e.g. a failing `on_elected`, try again later
+
+    def holder(self) -> dict | None:
+        """
+        Returns the process holding the leadership.
+
+        Returns:
+            dict: `pid`, `host` and `since` of the leader, or `None` if no living process holds it.
+        """
+        try:
+            with open(self.lock_path) as file:
+                holder = json.loads(file.read() or "null")
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        if holder is not None and holder.get("host") == socket.gethostname() and not _is_running(holder.get("pid")):
+            return None  # the leader died, the next attempt of another process takes over
+        return holder
+
+    def stop(self):
+        """
+        Stops the attempts and gives up the leadership.
+        """
+        self._stopped.set()
+        self._release()
+
+    def _release(self):
+        if self._file is not None:
+            self._file.truncate(0)  # no holder until the next process is elected
+            self._file.flush()
+            if fcntl is not None:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+        self.is_leader = False
@@ -1,6 +1,59 @@
+import re
 import time
+import logging
+import threading
+from collections import deque
+from itertools import islice
 from flask import Response, stream_with_context
-from typing import Any
+from typing import Any, Callable
+
+
+# log levels, the same values as in the standard `logging` module
+DEBUG = logging.DEBUG
+INFO = logging.INFO
+WARNING = logging.WARNING
+ERROR = logging.ERROR
+
+
+class LogRecord:
+    """
+    A structured log record.
+    The record keeps the raw message and payload and is rendered to text only when it is consumed
+    (by an SSE subscriber or a sink). The rendered text is cached, so it is built at most once.
+    A shallow copy of a list, dict or set payload is kept, so it is rendered in the state it had
+    when it was logged, e.g. the stocks of a run that are extended later.
+    """
+
+    __slots__ = ("seq", "created", "level", "message", "run_id", "data", "_text")
+
+    def __init__(self, seq: int, level: int, message: str, run_id: str = None, data: Any = None):
+        self.seq = seq  # sequence number of the record in the LogStreamer
+        self.created = time.time()
+        self.level = level
+        self.message = message
+        self.run_id = run_id
+        self.data = data.copy() if isinstance(data, (list, dict, set)) else data
+        self._text = None
+
+    @property
+    def level_name(self) -> str:
+        return logging.getLevelName(self.level)
+
+    def render(self) -> str:
+        """
+        Render the record to a text line.
+            :return: The formatted log message.
+        """
+        if self._text is None:
+            created = time.localtime(self.created)
+            # get the time of the record and format it
+            timestamp = time.strftime("[%H:%M:%S]", created)
+            date = time.strftime("[%d.%m.%Y]", created)
+            run = f" [run {self.run_id}]" if self.run_id is not None else ""
+            # format the message with the timestamp and source
+            optional_msg = f"DATA: {self.data}" if self.data is not None else ""
+            self._text = f"{timestamp}{date} {self.level_name}{run} - {self.message}; {optional_msg}"
+        return self._text
 
 
 class LogStreamer:
@@ -8,43 +61,184 @@ class LogStreamer:
     LogStreamer class to handle logging and streaming of log messages.
     This class is used to log messages and stream them to the client in real-time.
     It uses Flask's Response and stream_with_context to create a server-sent event (SSE) stream.
+
+    The messages are kept as structured records in a bounded ring buffer, the oldest records are dropped when it is full.
+    Every record gets a sequence number, so subscribers can tell which records they haven't seen yet.
+    Subscribers are woken up only when new records arrive.
+    Records below the configured level are dropped without any formatting work.
+    The SSE frames carry the sequence number as the event ID, so a reconnecting client resumes after `Last-Event-ID`.
     """
 
-    def __init__(self):
-        self._messages = []
+    WAIT_TIMEOUT = 15  # seconds a subscriber sleeps before re-checking the buffer and sending a heartbeat
+
+    def __init__(self, capacity: int = 1000, level: int = INFO):
+        """
+        Initialize the LogStreamer.
+            :param capacity: Maximum number of records kept in memory.
+            :param level: Minimum level of the logged records.
+        """
+        self.level = level
+        self._messages = deque(maxlen=capacity)
+        self._next_seq = 0  # sequence number of the next logged record
+        self._condition = threading.Condition()
+        self._sinks = []
+        self.sink_errors = 0  # records a sink failed to take
+
+    def is_enabled_for(self, level: int) -> bool:
+        """
+        Check whether records of the given level are logged.
+        Use it to skip building expensive messages of verbose logs.
+            :param level: The log level.
+
+            :return: True if the records of the level are logged.
+        """
+        return level >= self.level
+
+    def add_sink(self, sink: Callable[[LogRecord], None]):
+        """
+        Add a sink that receives every logged record, e.g. to write the records to the standard output.
+        A failing sink is only counted in `sink_errors`, it never fails the code that logs.
+            :param sink: Callable receiving the LogRecord.
+        """
+        self._sinks.append(sink)
 
-    def log(self, message: str, optional_data: Any = None):
+    def log(self, message: str, optional_data: Any = None, level: int = INFO, run_id: str = None):
         """
         Log a message with a timestamp and optional source.
             :param message: The message to log.
             :param optional_data: Optional data to include with the message.
+            :param level: Level of the message.
+            :param run_id: ID of the pipeline run the message belongs to.
 
             :return: None
         """
-        # get the current time and format it
-        timestamp = time.strftime("[%H:%M:%S]")
-        date = time.strftime("[%d.%m.%Y]")
-        # format the message with the timestamp and source
-        optional_msg = f"DATA: {optional_data}" if optional_data is not None else ""
-        full_message = f"{timestamp}{date} - {message}; {optional_msg}"
-        self._messages.append(full_message)  # add the message to the list
+        if level < self.level:
+            return
+        with self._condition:
+            record = LogRecord(self._next_seq, level, message, run_id=run_id, data=optional_data)
+            self._messages.append(record)  # add the record to the buffer
+            self._next_seq += 1
+            self._condition.notify_all()  # wake up the subscribers
+        for sink in self._sinks:
+            try:
+                sink(record)
+            except Exception:
+                with self._condition:
+                    self.sink_errors += 1
+
+    def messages_since(self, seq: int) -> tuple[list[LogRecord], int]:
+        """
+        Get the buffered records starting at the given sequence number.
+        Records that were already dropped from the buffer are skipped.
+            :param seq: Sequence number of the first requested record.
+
+            :return: The records and the sequence number following the last of them.
+        """
+        with self._condition:
+            first_seq = self._next_seq - len(self._messages)  # sequence number of the oldest buffered record
+            start = max(seq, first_seq) - first_seq
+            return list(islice(self._messages, start, None)), self._next_seq
 
-    def stream(self):
+    def wait_for_messages(self, seq: int, timeout: float = None) -> tuple[list[LogRecord], int]:
+        """
+        Block until there are records starting at the given sequence number, or the timeout expires.
+            :param seq: Sequence number of the first requested record.
+            :param timeout: Maximum number of seconds to wait.
+
+            :return: The records (empty on timeout) and the sequence number following the last of them.
+        """
+        with self._condition:
+            self._condition.wait_for(lambda: self._next_seq > seq, timeout)
+            return self.messages_since(seq)
+
+    @staticmethod
+    def parse_level(level: str | int | None) -> int | None:
+        """
+        Convert a level name (e.g. `WARNING`) or number to the level number.
+            :param level: The level name or number, or None.
+
+            :return: The level number, or None if no level is given.
+            :raises ValueError: If the level is unknown.
+        """
+        if level is None or isinstance(level, int):
+            return level
+        if level.isdigit():
+            return int(level)
+        number = logging.getLevelName(level.upper())
+        if not isinstance(number, int):
+            raise ValueError(f"Unknown log level: {level}")
+        return number
+
+    @staticmethod
+    def record_filter(run_id: str = None, level: int = None, ticker: str = None) -> Callable[[LogRecord], bool] | None:
+        """
+        Build the check of the records a subscriber asked for.
+            :param run_id: Only the records of this pipeline run.
+            :param level: Only the records of this level or above.
+            :param ticker: Only the records mentioning this ticker in the message or the payload.
+
+            :return: Callable returning True for the matching records, or None if every record matches.
+        """
+        if run_id is None and level is None and ticker is None:
+            return None
+        # the ticker as a whole word, e.g. `AAPL` doesn't match `AAPLX`
+        pattern = re.compile(rf"(?<![\w.]){re.escape(ticker)}(?!\w)") if ticker else None
+
+        def matches(record: LogRecord) -> bool:
+            if run_id is not None and record.run_id != run_id:
+                return False
+            if level is not None and record.level < level:
+                return False
+            return pattern is None or pattern.search(record.render()) is not None
+        return matches
+
+    def stream(self, last_event_id: str = None, run_id: str = None, level: str | int = None, ticker: str = None):
         """
         Stream the log messages to the client using server-sent events (SSE).
         This method creates a generator that yields log messages as they are added.
+        All messages pending for the client are sent in one SSE frame, one `data:` line per message line,
+        with the sequence number of the last of them as the event ID. A heartbeat comment is sent
+        after `WAIT_TIMEOUT` seconds without a frame, also when only filtered out messages arrived,
+        so idle proxies don't close the connection.
         The client can connect to this stream to receive real-time updates.
 
+            :param last_event_id: The `Last-Event-ID` header of a reconnecting client, the stream resumes after it.
+            :param run_id: Only the messages of this pipeline run.
+            :param level: Only the messages of this level or above (name or number).
+            :param ticker: Only the messages mentioning this ticker.
+
             :return: A Flask Response object that streams log messages.
+            :raises ValueError: If the level is unknown.
         """
+        matches = self.record_filter(run_id, self.parse_level(level), ticker)
+        try:
+            last_seq = int(last_event_id) + 1
+        except (TypeError, ValueError):
+            last_seq = 0
+        if last_seq > self._next_seq:
+            last_seq = 0  # the ID is from before a restart of the server, send the whole buffer
+
         def event_stream():
-            last_index = 0
+            seq = last_seq
+            last_sent = time.monotonic()
 
             while True:
-                # Check if there are new messages to send
-                if len(self._messages) > last_index:
-                    # Send the new messages to the client
-                    yield f"data: {self._messages[last_index]}\n\n"
-                    last_index += 1
-                time.sleep(0.1)
-        return Response(stream_with_context(event_stream()), mimetype="text/event-stream")
\ No newline at end of file
+                # Wait until there are new records to send
+                records, seq = self.wait_for_messages(seq, timeout=self.WAIT_TIMEOUT)
+                if matches is not None:
+                    records = [record for record in records if matches(record)]
+                if records:
+                    # Send all new messages to the client in one frame
+                    yield f"id: {seq - 1}\n" + "".join(
+                        f"data: {line}\n" for record in records for line in record.render().split("\n")
+                    ) + "\n"
+                    last_sent = time.monotonic()
+                elif time.monotonic() - last_sent >= self.WAIT_TIMEOUT:
+                    # nothing (matching) to send, other runs may still be logging; the ID moves
+                    # a reconnecting client past the skipped records
+                    yield (f"id: {seq - 1}\n" if seq > 0 else "") + ": heartbeat\n\n"
+                    last_sent = time.monotonic()
+        response = Response(stream_with_context(event_stream()), mimetype="text/event-stream")
+        response.headers["Cache-Control"] = "no-cache"
+        response.headers["X-Accel-Buffering"] = "no"  # don't let nginx buffer the stream
+        return response
@@ -0,0 +1,130 @@
+import hashlib
+import os
+import threading
+from datetime import datetime, timezone
+from typing import Callable
+
+from flask import Flask, request
+from werkzeug.security import safe_join
+
+
+class CachedPage:
+    """
+    A rendered page with its validators for conditional requests.
+    """
+
+    __slots__ = ("body", "etag", "last_modified")
+
+    def __init__(self, body: str):
+        self.body = body
+        self.etag = hashlib.sha1(body.encode("utf-8")).hexdigest()
+        # HTTP dates have a precision of seconds
+        self.last_modified = datetime.now(timezone.utc).replace(microsecond=0)
+
+
+class PageCache:
+    """
+    In-memory cache of rendered pages.
+
+    This class provides methods to:
+    - Render a page only when the version of the data it shows changed (e.g. `DataController.favourites_version`).
+    - Keep the ETag and Last-Modified of every page, so unchanged pages are answered with 304 Not Modified.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pages = {}  # name -> (version, CachedPage)
+        self.hits = 0
+        self.renders = 0
+
+    def get(self, name: str, version, render: Callable[[], str]) -> CachedPage:
+        """
+        Returns the cached page, rendered again if it was rendered for another version.
+
+        Args:
+            name (str): Name of the page.
+            version: Version of the data shown on the page.
+            render (callable): Renders the page.
+
+        Returns:
+            CachedPage: The page with its validators.
+        """
+        with self._lock:
+            cached = self._pages.get(name)
+            if cached is not None and cached[0] == version:
+                self.hits += 1
+                return cached[1]
+        page = CachedPage(render())  # rendered outside of the lock, a concurrent render is harmless
+        with self._lock:
+            self._pages[name] = (version, page)
+            self.renders += 1
+        return page
+
+    def stats(self) -> dict:
+        return {"pages": len(self._pages), "hits": self.hits, "renders": self.renders}
+
+
+class StaticAssets:
+    """
+    Content-hashed URLs of the static files.
+
+    This class provides methods to:
+    - Add the hash of the file content to the URLs built by `url_for('static', ...)`, e.g. `?v=3f2a9c1b04de`.
+    - Serve the files requested with their current hash as immutable for a year, a changed file gets a new URL.
+    """
+
+    MAX_AGE = 365 * 24 * 3600  # seconds the browsers keep a hashed file
+    VERSION_ARG = "v"
+
+    def __init__(self, app: Flask = None):
+        self._lock = threading.Lock()
+        self._versions = {}  # filename -> (mtime, size, hash)
+        self.static_folder = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app: Flask):
+        self.static_folder = app.static_folder
+        app.url_defaults(self._add_version)
+        app.after_request(self._cache_headers)
+
+    def version(self, filename: str) -> str | None:
+        """
+        Returns the hash of the static file, computed again only when the file changes.
+
+        Returns:
+            str: First 12 hex digits of the SHA-256 of the content, or None if the file doesn't exist.
+        """
+        path = safe_join(self.static_folder, filename)
+        try:
+            stat = os.stat(path) if path is not None else None
+        except OSError:
+            stat = None
+        if stat is None:
+            return None
+        with self._lock:
+            cached = self._versions.get(filename)
+        if cached is not None and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+            return cached[2]
+        with open(path, "rb") as file:
+            digest = hashlib.sha256(file.read()).hexdigest()[:12]
+        with self._lock:
+            self._versions[filename] = (stat.st_mtime_ns, stat.st_size, digest)
+        return digest
+
+    def _add_version(self, endpoint: str, values: dict):
+        if endpoint == "static" and self.VERSION_ARG not in values and "filename" in values:
+            version = self.version(values["filename"])
+            if version is not None:
+                values[self.VERSION_ARG] = version
+
+    def _cache_headers(self, response):
+        if request.endpoint != "static" or response.status_code not in (200, 304):
+            return response
+        requested = request.args.get(self.VERSION_ARG)
+        if requested is not None and requested == self.version(request.view_args["filename"]):
+            response.cache_control.public = True
+            response.cache_control.max_age = self.MAX_AGE
+            response.cache_control.immutable = True
+            response.cache_control.no_cache = None
+        return response
@@ -0,0 +1,124 @@
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from DataController import DataController
+from run_context import FINAL_STAGES, STAGE_FAILED, STAGE_TIMED_OUT
+
+
+class PipelineJobs:
+    """
+    Background job queue of the market pipeline runs.
+
+    This class provides methods to:
+    - Submit a run to a background executor and get its run ID right away.
+    - Join the run in flight instead of starting a duplicate one.
+    - Query the status and the stage progress of a run.
+    """
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    FINISHED = "finished"
+    FAILED = "failed"
+
+    def __init__(self, data_controller: DataController, max_workers: int = 2, history_size: int = 100):
+        """
+        Initializes the PipelineJobs and subscribes to the stage progress of the DataController.
+
+        Args:
+            data_controller (DataController): The controller running the pipeline.
+            max_workers (int): Maximum number of runs executed at the same time.
+            history_size (int): Number of runs whose status is kept.
+        """
+        self.data_controller = data_controller
+        self.data_controller.stage_listener = self.update_stage
+        self.history_size = history_size
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="pipeline")
+        self._lock = threading.Lock()
+        self._runs = OrderedDict()  # run ID -> status
+        self._in_flight = {}  # pipeline key -> run ID of the run in flight
+
+    def submit(self, mode: str = "manually", key: str = "favourites") -> tuple[str, bool]:
+        """
+        Submits a pipeline run to the background executor.
+        If a run with the same key is still in flight, it is joined instead of starting a new one.
+
+        Args:
+            mode (str): Who started the market.
+            key (str): Identifies the pipeline, e.g. the watchlist; only one run per key is in flight.
+
+        Returns:
+            tuple[str, bool]: The run ID and whether a new run was started.
+        """
+        with self._lock:
+            run_id = self._in_flight.get(key)
+            status = self._runs.get(run_id) if run_id is not None else None
+            if status is not None and status["state"] in (self.QUEUED, self.RUNNING):
+                return run_id, False
+
+            run_id = uuid.uuid4().hex
+            self._in_flight[key] = run_id
+            self._runs[run_id] = {
+                "run_id": run_id,
+                "mode": mode,
+                "state": self.QUEUED,
+                "stage": self.QUEUED,
+                "stages": [{"stage": self.QUEUED, "at": self._now()}],
+            }
+            while len(self._runs) > self.history_size:
+                self._runs.popitem(last=False)  # forget the oldest run
+
+        self._executor.submit(self._run, run_id, mode)
+        return run_id, True
+
+    def _run(self, run_id: str, mode: str):
+        """
+        Executes the first part of the pipeline. The run is complete when a final stage is reported,
+        which may happen later from the `/rating` callback.
+        """
+        try:
+            self.data_controller.start_market(mode=mode, run_id=run_id)
+        except Exception:
+            self.update_stage(run_id, STAGE_FAILED)
+
+    def update_stage(self, run_id: str, stage: str):
+        """
+        Records the stage the run entered. Updates of unknown or completed runs are ignored.
+
+        Args:
+            run_id (str): ID of the run.
+            stage (str): The stage the run entered.
+        """
+        with self._lock:
+            status = self._runs.get(run_id)
+            if status is None or status["state"] in (self.FINISHED, self.FAILED):
+                return
+            status["stage"] = stage
+            status["stages"].append({"stage": stage, "at": self._now()})
+            if stage in FINAL_STAGES:
+                status["state"] = self.FAILED if stage in (STAGE_FAILED, STAGE_TIMED_OUT) else self.FINISHED
+            else:
+                status["state"] = self.RUNNING
+
+    def status(self, run_id: str) -> dict | None:
+        """
+        Returns the status of the run.
+
+        Returns:
+            dict: `run_id`, `mode`, `state` (queued, running, finished or failed), the current `stage`
+            and the list of `stages` with the time they were entered, or `None` for an unknown run.
+        """
+        with self._lock:
+            status = self._runs.get(run_id)
+            if status is None:
+                return None
+            return {**status, "stages": list(status["stages"])}
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
+
+    @staticmethod
+    def _now() -> str:
+        return datetime.now().isoformat(timespec="milliseconds")
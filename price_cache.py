@@ -0,0 +1,184 @@
+import sqlite3
+import threading
+from datetime import date, timedelta
+
+
+def last_trading_day(day: date) -> date:
+    """
+    Returns the last weekday before the given day, i.e. the newest trading day
+    whose daily close is already published. Exchange holidays are not taken into account.
+
+    Args:
+        day (date): The reference day.
+
+    Returns:
+        date: The last trading day before `day`.
+    """
+    previous = day - timedelta(days=1)
+    while previous.weekday() >= 5:  # skip Saturday and Sunday
+        previous -= timedelta(days=1)
+    return previous
+
+
+class PriceCache:
+    """
+    Persistent on-disk store of daily closing prices keyed by ticker and date.
+
+    This class provides methods to:
+    - Store the closing prices received from the stock market API.
+    - Read the latest cached closes of a ticker.
+    - Decide whether the cached data of a ticker is current for the trading day.
+    - Count cache hits (served without the network) and misses.
+    """
+
+    MAX_VARIABLES = 500  # maximum number of tickers bound into one SQL query
+
+    def __init__(self, path: str):
+        """
+        Initializes the PriceCache with a SQLite database file.
+
+        Args:
+            path (str): Path to the SQLite database file, created if it doesn't exist.
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS prices ("
+                " ticker TEXT NOT NULL, date TEXT NOT NULL, close REAL NOT NULL,"
+                " PRIMARY KEY (ticker, date))"
+            )
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS sync (ticker TEXT PRIMARY KEY, checked_on TEXT NOT NULL)"
+            )
+        self.hits = 0
+        self.misses = 0
+        self.incremental = 0
+
+    def get_closes(self, ticker: str, limit: int) -> list[float]:
+        """
+        Returns the last `limit` cached closes of the ticker ordered from the oldest to the newest.
+        """
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT close FROM prices WHERE ticker = ? ORDER BY date DESC LIMIT ?",
+                (ticker, limit),
+            ).fetchall()
+        return [row[0] for row in reversed(rows)]
+
+    def last_date(self, ticker: str) -> date | None:
+        """
+        Returns the date of the newest cached close of the ticker, or `None` if nothing is cached.
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT MAX(date) FROM prices WHERE ticker = ?", (ticker,)
+            ).fetchone()
+        return date.fromisoformat(row[0]) if row[0] else None
+
+    def is_current(self, ticker: str, today: date) -> bool:
+        """
+        Checks whether the cache of the ticker is current for the trading day.
+        It is current if it holds the close of the last trading day, or if the API was already
+        asked today (e.g. on exchange holidays no new close is published).
+        """
+        last = self.last_date(ticker)
+        if last is not None and last >= last_trading_day(today):
+            return True
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT checked_on FROM sync WHERE ticker = ?", (ticker,)
+            ).fetchone()
+        return row is not None and row[0] == today.isoformat()
+
+    def get_current_many(self, tickers: list[str], today: date, limit: int) -> dict[str, list[float]]:
+        """
+        Returns the last `limit` closes of every ticker whose cache is current for the trading day.
+        All tickers are looked up with a few SQL queries instead of one query per ticker.
+
+        Args:
+            tickers (list[str]): The stock tickers.
+            today (date): The reference day.
+            limit (int): Number of closes per ticker.
+
+        Returns:
+            dict[str, list[float]]: Closes ordered from the oldest to the newest per current ticker.
+        """
+        expected = last_trading_day(today).isoformat()
+        current = {}
+        for start in range(0, len(tickers), self.MAX_VARIABLES):
+            chunk = tickers[start:start + self.MAX_VARIABLES]
+            placeholders = ",".join("?" * len(chunk))
+            with self._lock:
+                rows = self._connection.execute(
+                    f"SELECT p.ticker, MAX(p.date), s.checked_on FROM prices p"
+                    f" LEFT JOIN sync s ON s.ticker = p.ticker"
+                    f" WHERE p.ticker IN ({placeholders}) GROUP BY p.ticker",
+                    chunk,
+                ).fetchall()
+                fresh = [ticker for ticker, last, checked_on in rows
+                         if last >= expected or checked_on == today.isoformat()]
+                if not fresh:
+                    continue
+                placeholders = ",".join("?" * len(fresh))
+                closes = self._connection.execute(
+                    f"SELECT ticker, close FROM ("
+                    f" SELECT ticker, date, close,"
+                    f" ROW_NUMBER() OVER (PARTITION BY ticker ORDER BY date DESC) AS position"
+                    f" FROM prices WHERE ticker IN ({placeholders}))"
+                    f" WHERE position <= ? ORDER BY ticker, date",
+                    [*fresh, limit],
+                ).fetchall()
+            for ticker, close in closes:
+                current.setdefault(ticker, []).append(close)
+        return current
+
+    def store(self, ticker: str, prices: list[tuple[str, float]], checked_on: date):
+        """
+        Stores the closes of the ticker and remembers when the API was asked.
+
+        Args:
+            ticker (str): The stock ticker.
+            prices (list[tuple[str, float]]): Pairs of ISO date and closing price.
+            checked_on (date): The day the prices were requested.
+        """
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO prices (ticker, date, close) VALUES (?, ?, ?)",
+                [(ticker, day, close) for day, close in prices],
+            )
+            self._connection.execute(
+                "INSERT OR REPLACE INTO sync (ticker, checked_on) VALUES (?, ?)",
+                (ticker, checked_on.isoformat()),
+            )
+
+    def record_hit(self, count: int = 1):
+        with self._lock:
+            self.hits += count
+
+    def record_miss(self, incremental: bool = False):
+        with self._lock:
+            self.misses += 1
+            if incremental:
+                self.incremental += 1
+
+    def stats(self) -> dict:
+        """
+        Returns the cache statistics.
+
+        Returns:
+            dict: `hits` served without the network, `misses` that needed an API request,
+            `incremental` misses that only requested the days after the last cached close and the `hit_ratio`.
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "incremental": self.incremental,
+                "hit_ratio": self.hits / total if total else 0.0,
+            }
+
+    def close(self):
+        self._connection.close()
@@ -0,0 +1,223 @@
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+
+
+# priorities of the requests, the lower the more important
+PRIORITY_PIPELINE = 0  # scheduled and manual pipeline runs
+PRIORITY_SEARCH = 1  # interactive searches from the UI
+
+
+class RateLimitError(Exception):
+    """
+    The request budget of the API is exhausted.
+
+    Attributes:
+        retry_after (float): Seconds until a request may succeed again.
+    """
+
+    def __init__(self, message: str, retry_after: float = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """
+    Converts the `Retry-After` header (seconds or an HTTP date) to seconds from now.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now().astimezone()).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+class RateLimiter:
+    """
+    Token bucket rate limiter shared by all threads and worker processes through a SQLite database.
+
+    This class provides methods to:
+    - Take one request from every configured budget (e.g. per hour and per day), waiting if allowed.
+    - Keep a part of every budget for the pipeline, so interactive searches can't starve it.
+    - Pause all requests after a 429 response, for `Retry-After` or an exponentially growing backoff.
+    """
+
+    def __init__(self, path: str, limits: dict[str, tuple[int, float]], search_reserve: float = 0.2,
+                 backoff: float = 1.0, max_backoff: float = 300.0, clock=time.time, sleep=time.sleep):
+        """
+        Initializes the RateLimiter with a SQLite database file.
+
+        Args:
+            path (str): Path to the SQLite database file, shared by the processes.
+            limits (dict[str, tuple[int, float]]): Budgets by name, each the number of requests per period in seconds,
+                e.g. `{"hour": (500, 3600), "day": (20000, 86400)}`.
+            search_reserve (float): Part of every budget only the pipeline may use.
+            backoff (float): Seconds of the first pause after a 429 response without `Retry-After`.
+            max_backoff (float): Longest pause after a 429 response.
+            clock (callable): Returns the current Unix time.
+            sleep (callable): Sleeps for the given seconds.
+        """
+        self.path = path
+        self.limits = dict(limits)
+        self.search_reserve = search_reserve
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False, timeout=10, isolation_level=None)
+        with self._lock:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS buckets (name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+            )
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS backoff ("
+                " id INTEGER PRIMARY KEY CHECK (id = 1), blocked_until REAL NOT NULL, failures INTEGER NOT NULL)"
+            )
+        self.acquired = 0
+        self.rejected = 0
+        self.throttled = 0  # 429 responses
+        self._failures = 0  # consecutive 429 responses as last seen in the database, resets are skipped at 0
+
+    def _reserve(self, priority: int, capacity: int) -> float:
+        return capacity * self.search_reserve if priority > PRIORITY_PIPELINE else 0.0
+
+    def try_acquire(self, priority: int = PRIORITY_PIPELINE) -> float:
+        """
+        Takes one request from every budget if all of them allow it.
+
+        Returns:
+            float: 0 if the request may be sent, otherwise the seconds to wait before trying again.
+        """
+        with self._lock:
+            connection = self._connection
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                now = self._clock()
+                row = connection.execute("SELECT blocked_until, failures FROM backoff WHERE id = 1").fetchone()
+                self._failures = row[1] if row is not None else 0
+                if row is not None and row[0] > now:
+                    connection.execute("COMMIT")
+                    return row[0] - now
+
+                stored = {name: (tokens, updated) for name, tokens, updated in
+                          connection.execute("SELECT name, tokens, updated FROM buckets")}
+                buckets, wait = {}, 0.0
+                for name, (capacity, period) in self.limits.items():
+                    tokens, updated = stored.get(name, (capacity, now))
+                    tokens = min(capacity, tokens + (now - updated) * capacity / period)  # refill
+                    buckets[name] = tokens
+                    needed = 1 + self._reserve(priority, capacity)
+                    if tokens < needed:
+                        wait = max(wait, (needed - tokens) * period / capacity)
+
+                if wait == 0:
+                    buckets = {name: tokens - 1 for name, tokens in buckets.items()}
+                connection.executemany(
+                    "INSERT OR REPLACE INTO buckets (name, tokens, updated) VALUES (?, ?, ?)",
+                    [(name, tokens, now) for name, tokens in buckets.items()],
+                )
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+        return wait
+
+    def acquire(self, priority: int = PRIORITY_PIPELINE, timeout: float = 0.0):
+        """
+        Takes one request from every budget, waiting at most `timeout` seconds for it.
+        Doesn't wait at all if the request can't be allowed within the timeout.
+
+        Args:
+            priority (int): `PRIORITY_PIPELINE` or `PRIORITY_SEARCH`.
+            timeout (float): Maximum seconds to wait.
+
+        Raises:
+            RateLimitError: If the request can't be allowed within the timeout.
+        """
+        deadline = self._clock() + timeout
+        while True:
+            wait = self.try_acquire(priority)
+            if wait == 0:
+                self.acquired += 1
+                return
+            if self._clock() + wait > deadline:
+                self.rejected += 1
+                raise RateLimitError(f"Rate limit of the API reached, retry in {wait:.1f} s.", retry_after=wait)
+            self._sleep(wait)
+
+    def throttle(self, retry_after: float = None) -> float:
+        """
+        Pauses all requests after a 429 response. Without `Retry-After` the pause doubles
+        with every consecutive 429 response, up to `max_backoff`.
+
+        Args:
+            retry_after (float): Seconds from the `Retry-After` header, if any.
+
+        Returns:
+            float: Seconds of the pause.
+        """
+        with self._lock:
+            connection = self._connection
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                now = self._clock()
+                row = connection.execute("SELECT blocked_until, failures FROM backoff WHERE id = 1").fetchone()
+                failures = (row[1] if row is not None else 0) + 1
+                pause = retry_after if retry_after is not None else min(self.max_backoff, self.backoff * 2 ** (failures - 1))
+                blocked_until = max(row[0] if row is not None else 0.0, now + pause)
+                connection.execute(
+                    "INSERT OR REPLACE INTO backoff (id, blocked_until, failures) VALUES (1, ?, ?)",
+                    (blocked_until, failures),
+                )
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            self._failures = failures
+        self.throttled += 1
+        return pause
+
+    def reset_backoff(self):
+        """
+        Resets the backoff after a successful response.
+        The database is updated only if a backoff was recorded when this process last looked at it,
+        so the successful responses of an unthrottled API don't write anything.
+        """
+        with self._lock:
+            if not self._failures:
+                return
+            self._connection.execute("UPDATE backoff SET failures = 0 WHERE id = 1 AND failures > 0")
+            self._failures = 0
+
+    def stats(self) -> dict:
+        """
+        Returns the remaining budgets and the counters of this process.
+        """
+        with self._lock:
+            now = self._clock()
+            stored = {name: (tokens, updated) for name, tokens, updated in
+                      self._connection.execute("SELECT name, tokens, updated FROM buckets")}
+            row = self._connection.execute("SELECT blocked_until FROM backoff WHERE id = 1").fetchone()
+        remaining = {}
+        for name, (capacity, period) in self.limits.items():
+            tokens, updated = stored.get(name, (capacity, now))
+            remaining[name] = int(min(capacity, tokens + (now - updated) * capacity / period))
+        return {
+            "remaining": remaining,
+            "blocked_for": max(0.0, row[0] - now) if row is not None else 0.0,
+            "acquired": self.acquired,
+            "rejected": self.rejected,
+            "throttled": self.throttled,
+        }
+
+    def close(self):
+        self._connection.close()
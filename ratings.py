@@ -0,0 +1,147 @@
+import json
+import re
+from typing import Iterable, Iterator
+
+
+_decoder = json.JSONDecoder()
+_whitespace = re.compile(r"[ \t\n\r]*")
+
+
+class MalformedJSONError(ValueError):
+    """
+    The text isn't a valid JSON array, raised when the invalid part is reached.
+    Tells a broken request body apart from a valid one without any valid ratings.
+    """
+
+
+def iter_json_array(text: str) -> Iterator:
+    """
+    Returns an iterator over the elements of a JSON array, which are decoded one by one
+    without building the whole list. An invalid element raises `MalformedJSONError` when it is reached.
+
+    Raises:
+        MalformedJSONError: If the text isn't a JSON array.
+    """
+    def skip(index: int) -> int:
+        index = _whitespace.match(text, index).end()
+        if index >= len(text):
+            raise MalformedJSONError("Unexpected end of the JSON array.")
+        return index
+
+    def items(index: int) -> Iterator:
+        if text[index] == "]":
+            return
+        while True:
+            try:
+                item, index = _decoder.raw_decode(text, index)
+            except json.JSONDecodeError as e:
+                raise MalformedJSONError(f"Invalid element of the JSON array: {e}") from e
+            yield item
+            index = skip(index)
+            if text[index] == "]":
+                return
+            if text[index] != ",":
+                raise MalformedJSONError(f"Expected ',' or ']' at position {index} of the JSON array.")
+            index = skip(index + 1)
+
+    index = skip(0)
+    if text[index] != "[":
+        raise MalformedJSONError("Expected a JSON array.")
+    return items(skip(index + 1))
+
+
+def iter_ratings(body: bytes | str) -> Iterator:
+    """
+    Returns an iterator over the stocks of a `/rating` request body, decoded one by one.
+    Module "News" sends the stocks as a JSON encoded string of a JSON array, a plain JSON array is accepted too.
+
+    Raises:
+        MalformedJSONError: If the body isn't a JSON array of stocks.
+    """
+    try:
+        text = body.decode("utf-8") if isinstance(body, bytes) else body
+        if text.lstrip().startswith('"'):
+            text = json.loads(text)
+    except ValueError as e:  # also the decoding errors
+        raise MalformedJSONError(f"Invalid JSON body: {e}") from e
+    if not isinstance(text, str):
+        raise MalformedJSONError("Expected a JSON encoded array of stocks.")
+    return iter_json_array(text)
+
+
+class RatingValidator:
+    """
+    Validator of the ratings received from module "News" with the schema compiled in once.
+
+    This class provides methods to:
+    - Check that a stock has the `name`, `date` and `rating` attributes with a rating in the valid range.
+    - Validate the stocks and add the sale recommendations in one pass over a stream of stocks.
+    """
+
+    REQUIRED = ("name", "date", "rating")
+
+    def __init__(self, rating_min: int, rating_max: int, rating_threshold: int):
+        """
+        Initializes the RatingValidator.
+
+        Args:
+            rating_min (int): Minimum valid rating.
+            rating_max (int): Maximum valid rating.
+            rating_threshold (int): Stocks rated above the threshold are recommended to sell.
+        """
+        self.rating_min = rating_min
+        self.rating_max = rating_max
+        self.rating_threshold = rating_threshold
+        self.is_valid = self._compile()
+
+    def _compile(self):
+        """
+        Builds the check of one stock with the schema and the limits bound as locals.
+        """
+        name, date, rating = self.REQUIRED
+        rating_min, rating_max = self.rating_min, self.rating_max
+
+        def is_valid(stock) -> bool:
+            """
+            Returns True if the stock has all required attributes and a valid rating.
+
+            Raises:
+                TypeError: If the stock is not a dictionary.
+            """
+            if not isinstance(stock, dict):
+                raise TypeError("The stock data is not a dictionary.")
+            if name not in stock or date not in stock or rating not in stock:
+                return False
+            value = stock[rating]
+            return isinstance(value, int) and rating_min <= value <= rating_max
+
+        return is_valid
+
+    def process(self, stocks: Iterable[dict]) -> tuple[list[dict], int]:
+        """
+        Validates the stocks and adds the sale recommendation (`sale` 1 - sell, 0 - keep) to the valid ones
+        while the stocks are streamed in.
+
+        Args:
+            stocks (Iterable[dict]): Stocks received from module "News".
+
+        Returns:
+            tuple[list[dict], int]: The valid stocks with the recommendations and the number of invalid stocks.
+
+        Raises:
+            ValueError: If there are no stocks or none of them is valid.
+            TypeError: If a stock is not a dictionary.
+        """
+        is_valid, threshold = self.is_valid, self.rating_threshold
+        valid, invalid = [], 0
+        for stock in stocks:
+            if is_valid(stock):
+                stock["sale"] = 1 if stock["rating"] > threshold else 0
+                valid.append(stock)
+            else:
+                invalid += 1
+        if not valid:
+            if not invalid:
+                raise ValueError("The response JSON is empty.")
+            raise ValueError("The response JSON is empty after the validation.")
+        return valid, invalid
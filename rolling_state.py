@@ -0,0 +1,220 @@
+import os
+import threading
+from datetime import date
+
+import numpy as np
+
+
+# number of set bits of every byte, the decline counters are popcounts of the decline masks
+_POPCOUNT = np.array([bin(value).count("1") for value in range(256)], dtype=np.uint8)
+
+
+class RollingCloses:
+    """
+    Compact rolling state of the last closes of many tickers, kept in numpy arrays with one row per ticker.
+
+    This class provides methods to:
+    - Append a new close of a ticker in O(1), the closes are kept in a ring buffer per row.
+    - Keep a bitmask of the declines between the consecutive closes (bit 0 is the newest step), so the
+      number of declines in the last days is a popcount without rescanning the window (see `declines`).
+    - Sync a ticker with a fetched window of closes, only the closes newer than the state are appended.
+    - Persist the state in a snapshot file and load it on the next start.
+    """
+
+    def __init__(self, window: int = 6, path: str = None):
+        """
+        Initializes the RollingCloses, loading the snapshot if it exists.
+
+        Args:
+            window (int): Number of last closes kept per ticker, at most 9 (the declines fit in one byte).
+            path (str): Path to the snapshot file (`.npz`), the state is kept in memory only if not provided.
+        """
+        if not 1 <= window <= 9:
+            raise ValueError(f"Invalid window of the rolling state: {window}")
+        self.window = window
+        self.path = path
+        self._lock = threading.Lock()
+        self._rows = {}  # ticker -> row
+        self._allocate(0)
+        self.appended = 0  # closes appended to the existing state
+        self.resets = 0  # windows not continuing the state, rebuilt from scratch
+        if path is not None and os.path.exists(path):
+            self._load(path)
+
+    def _allocate(self, capacity: int):
+        self._closes = np.full((capacity, self.window), np.nan)
+        self._position = np.zeros(capacity, dtype=np.int8)  # slot of the next close
+        self._count = np.zeros(capacity, dtype=np.int8)  # number of closes in the window
+        self._declines = np.zeros(capacity, dtype=np.uint8)  # bit i set if the close i + 1 steps back declined
+        self._synced = np.full(capacity, np.datetime64("NaT"), dtype="datetime64[D]")
+
+    def _grow(self):
+        size = len(self._rows)
+        old = (self._closes, self._position, self._count, self._declines, self._synced)
+        self._allocate(max(16, 2 * len(self._count)))
+        for new, values in zip((self._closes, self._position, self._count, self._declines, self._synced), old):
+            new[:size] = values[:size]
+
+    def _row(self, ticker: str) -> int:
+        row = self._rows.get(ticker)
+        if row is None:
+            if len(self._rows) == len(self._count):
+                self._grow()
+            row = self._rows[ticker] = len(self._rows)
+        return row
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, ticker: str) -> bool:
+        return ticker in self._rows
+
+    def _append(self, row: int, close: float):
+        position, count = int(self._position[row]), int(self._count[row])
+        declined = count > 0 and self._closes[row, (position - 1) % self.window] > close
+        self._declines[row] = ((int(self._declines[row]) << 1) | int(declined)) & ((1 << (self.window - 1)) - 1)
+        self._closes[row, position] = close
+        self._position[row] = (position + 1) % self.window
+        self._count[row] = min(count + 1, self.window)
+
+    def _reset(self, row: int):
+        self._closes[row] = np.nan
+        self._position[row] = self._count[row] = self._declines[row] = 0
+
+    def append(self, ticker: str, close: float):
+        """
+        Appends the newest close of a ticker, dropping the oldest one if the window is full.
+        """
+        with self._lock:
+            self._append(self._row(ticker), float(close))
+            self.appended += 1
+
+    def _window(self, row: int) -> list[float]:
+        count = int(self._count[row])
+        start = (int(self._position[row]) - count) % self.window
+        return [float(self._closes[row, (start + i) % self.window]) for i in range(count)]
+
+    def closes(self, ticker: str) -> list[float]:
+        """
+        Returns the closes of a ticker, oldest close first, or an empty list for an unknown ticker.
+        """
+        with self._lock:
+            row = self._rows.get(ticker)
+            return self._window(row) if row is not None else []
+
+    def update(self, ticker: str, closes: list[float], day: date) -> int:
+        """
+        Syncs a ticker with the last closes fetched for the day. The closes continuing the state
+        are appended, a window that doesn't continue it (e.g. corrected prices) replaces the state.
+        Afterwards the window of the ticker equals the last `window` closes given.
+
+        Args:
+            ticker (str): Ticker of the stock.
+            closes (list[float]): The last closes of the ticker, oldest close first.
+            day (date): Day of the sync, see `stale`.
+
+        Returns:
+            int: Number of closes appended to the state.
+        """
+        closes = [float(close) for close in closes[-self.window:]]
+        with self._lock:
+            row = self._row(ticker)
+            current = self._window(row)
+            # the smallest shift where the newest closes of the state are the oldest given closes,
+            # a window shorter than the state size has to start with the whole state
+            shifts = range(len(current) + 1) if len(closes) == self.window else range(1)
+            for shift in shifts:
+                overlap = len(current) - shift
+                if overlap <= len(closes) and current[shift:] == closes[:overlap]:
+                    new = closes[overlap:]
+                    break
+            else:
+                self._reset(row)
+                new = closes
+            if current and len(new) == len(closes):
+                self.resets += 1  # nothing continued, the window was rebuilt
+            for close in new:
+                self._append(row, close)
+            self.appended += len(new)
+            self._synced[row] = np.datetime64(day, "D")
+        return len(new)
+
+    def stale(self, tickers: list[str], day: date) -> list[str]:
+        """
+        Returns the tickers without a state synced on the day, their closes have to be fetched.
+        """
+        with self._lock:
+            day = np.datetime64(day, "D")
+            return [ticker for ticker in tickers
+                    if ticker not in self._rows or self._synced[self._rows[ticker]] != day]
+
+    def rows(self, tickers: list[str]) -> np.ndarray:
+        """
+        Returns the rows of the tickers in the state arrays.
+
+        Raises:
+            KeyError: If a ticker has no state.
+        """
+        with self._lock:
+            return np.fromiter((self._rows[ticker] for ticker in tickers), dtype=np.intp, count=len(tickers))
+
+    def declines(self, rows: np.ndarray, steps: int) -> np.ndarray:
+        """
+        Counts the declines between the last `steps` + 1 closes of every row, one popcount per row.
+        """
+        mask = (1 << min(steps, self.window - 1)) - 1
+        return _POPCOUNT[self._declines[rows] & mask]
+
+    def matrix(self, rows: np.ndarray) -> np.ndarray:
+        """
+        Returns the windows of the rows as a 2-D array, oldest close first and NaN padded on the left
+        like `filters.to_matrix`.
+        """
+        # the slots of a window that isn't full yet are NaN and come first from the slot of the next close
+        columns = (self._position[rows, None].astype(np.intp) + np.arange(self.window)) % self.window
+        return self._closes[rows[:, None], columns]
+
+    def save(self, path: str = None):
+        """
+        Writes the snapshot of the state, atomically replacing the previous one.
+
+        Args:
+            path (str): Path to the snapshot file, defaults to the path the state was loaded from.
+        """
+        path = path if path is not None else self.path
+        if path is None:
+            return
+        with self._lock:
+            size = len(self._rows)
+            snapshot = {
+                "window": np.array(self.window),
+                "tickers": np.array(list(self._rows), dtype=str),
+                "closes": self._closes[:size].copy(),
+                "position": self._position[:size].copy(),
+                "count": self._count[:size].copy(),
+                "declines": self._declines[:size].copy(),
+                "synced": self._synced[:size].copy(),
+            }
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "wb") as file:
+            np.savez(file, **snapshot)
+        os.replace(temporary, path)
+
+    def _load(self, path: str):
+        with np.load(path) as snapshot:
+            if int(snapshot["window"]) != self.window:
+                return  # snapshot of another window, rebuilt by the next syncs
+            tickers = snapshot["tickers"].tolist()
+            self._allocate(len(tickers))
+            self._closes[:] = snapshot["closes"]
+            self._position[:] = snapshot["position"]
+            self._count[:] = snapshot["count"]
+            self._declines[:] = snapshot["declines"]
+            self._synced[:] = snapshot["synced"]
+        self._rows = {ticker: row for row, ticker in enumerate(tickers)}
+
+    def stats(self) -> dict:
+        """
+        Returns the number of tickers and the counters of the appended closes and rebuilt windows.
+        """
+        return {"tickers": len(self._rows), "appended": self.appended, "resets": self.resets}
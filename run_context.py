@@ -0,0 +1,116 @@
+import threading
+import time
+
+
+# stages of a pipeline run
+STAGE_FAVOURITES = "getting favourite stocks"
+STAGE_FILTERING = "filtering stocks"
+STAGE_LISTSTOCK = "sending stocks to News"
+STAGE_WAITING = "waiting for News ratings"
+STAGE_VALIDATING = "validating ratings"  # and adding the recommendations
+STAGE_SALESTOCK = "sending recommendations to News"
+# final stages, the run is complete
+STAGE_FINISHED = "finished"
+STAGE_NO_STOCKS = "no stocks to process"
+STAGE_TIMED_OUT = "timed out waiting for News"
+STAGE_FAILED = "failed"
+FINAL_STAGES = (STAGE_FINISHED, STAGE_NO_STOCKS, STAGE_TIMED_OUT, STAGE_FAILED)
+
+
+class RunContext:
+    """
+    State of one pipeline execution.
+    Every run has its own context, so several runs (e.g. a scheduled and a manual one) can proceed in parallel
+    and the `/rating` callbacks are matched to the run that requested them by the run ID.
+    """
+
+    def __init__(self, run_id: str, mode: str):
+        """
+        Initializes the RunContext.
+
+        Args:
+            run_id (str): ID of the run, sent to module "News" with the stocks.
+            mode (str): Who started the run.
+        """
+        self.run_id = run_id
+        self.mode = mode
+        self.created = time.time()
+        self.stage = None
+        self.tickers = []  # tickers sent to module "News"
+        self.stocks = []  # validated ratings with the sale recommendations, merged from all callbacks
+        self.chunks = 0  # chunks of stocks sent to `/liststock`, one `/rating` callback is expected per chunk
+        self.callbacks = 0  # `/rating` callbacks received
+        self.rated = set()  # tickers rated by module "News"
+        self.news_received = threading.Event()  # set when the ratings of the run arrive
+        self.news_sent_at = None  # monotonic time the stocks were sent to `/liststock`
+        self.news_latency = None  # seconds from `/liststock` to `/rating`
+        self.timings = {}  # stage -> seconds spent in the stage
+        self._stage_started = None
+        self._lock = threading.Lock()
+
+    @property
+    def finished(self) -> bool:
+        return self.stage in FINAL_STAGES
+
+    @property
+    def waiting_for_news(self) -> bool:
+        return self.news_sent_at is not None and not self.news_received.is_set() and not self.finished
+
+    @property
+    def ratings_complete(self) -> bool:
+        """
+        True when a callback arrived for every sent chunk or all sent tickers were rated.
+        A run without any sent chunk is complete with its first callback.
+        """
+        return self.callbacks >= self.chunks or self.rated.issuperset(self.tickers)
+
+    def add_ratings(self, stocks: list[dict], rated: set[str]) -> bool:
+        """
+        Merges the ratings of one `/rating` callback into the run.
+
+        Args:
+            stocks (list[dict]): Valid stocks of the callback with the sale recommendations.
+            rated (set[str]): Tickers in the callback, valid or not.
+
+        Returns:
+            bool: True if the ratings of the run are complete with this callback.
+        """
+        with self._lock:
+            complete_before = self.callbacks > 0 and self.ratings_complete
+            self.stocks.extend(stocks)
+            self.rated.update(rated)
+            self.callbacks += 1
+            return not complete_before and self.ratings_complete
+
+    def chunk_failed(self) -> bool:
+        """
+        Stops expecting the callback of a chunk that couldn't be sent.
+
+        Returns:
+            bool: True if the ratings of the run are complete with this chunk dropped.
+        """
+        with self._lock:
+            complete_before = self.callbacks > 0 and self.ratings_complete
+            self.chunks -= 1
+            return not complete_before and self.callbacks > 0 and self.ratings_complete
+
+    def enter_stage(self, stage: str) -> bool:
+        """
+        Moves the run to the next stage and records the time spent in the previous one.
+        A final stage is never left, a late callback or a slow sender can't reopen a completed run.
+
+        Args:
+            stage (str): The stage the run entered.
+
+        Returns:
+            bool: True if the run entered the stage, False if the run is already complete.
+        """
+        with self._lock:
+            if self.finished:
+                return False
+            now = time.monotonic()
+            if self.stage is not None and self._stage_started is not None:
+                self.timings[self.stage] = self.timings.get(self.stage, 0.0) + now - self._stage_started
+            self.stage = stage
+            self._stage_started = None if stage in FINAL_STAGES else now
+            return True
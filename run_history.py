@@ -0,0 +1,169 @@
+import json
+import sqlite3
+import threading
+import time
+
+from run_context import RunContext
+
+
+class RunHistory:
+    """
+    Persistent, indexed history of the pipeline runs backed by SQLite.
+
+    This class provides methods to:
+    - Record the runs with their final stage and stage timings.
+    - Record the filtered tickers, the received ratings and the sale recommendations of every run.
+    - Query the records page by page by ticker, kind and date range.
+    """
+
+    FILTERED = "filtered"  # the ticker passed the filters and was sent to module "News"
+    RATING = "rating"  # the rating of the ticker with the sale recommendation
+    MAX_PER_PAGE = 500
+
+    def __init__(self, path: str):
+        """
+        Initializes the RunHistory with a SQLite database file.
+
+        Args:
+            path (str): Path to the SQLite database file, created if it doesn't exist.
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False, timeout=5)
+        self._connection.row_factory = sqlite3.Row
+        with self._lock, self._connection:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS runs ("
+                " run_id TEXT PRIMARY KEY, mode TEXT, started REAL NOT NULL, finished REAL,"
+                " stage TEXT, news_latency REAL, timings TEXT)"
+            )
+            self._connection.execute("CREATE INDEX IF NOT EXISTS runs_started ON runs (started)")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS run_stocks ("
+                " id INTEGER PRIMARY KEY, run_id TEXT NOT NULL, ticker TEXT NOT NULL, recorded REAL NOT NULL,"
+                " kind TEXT NOT NULL, rating INTEGER, sale INTEGER)"
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS run_stocks_ticker ON run_stocks (ticker, recorded)"
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS run_stocks_recorded ON run_stocks (recorded)"
+            )
+            self._connection.execute("CREATE INDEX IF NOT EXISTS run_stocks_run ON run_stocks (run_id)")
+
+    def record_run(self, run: RunContext):
+        """
+        Stores the run with its current stage, news latency and stage timings.
+
+        Args:
+            run (RunContext): The run.
+        """
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO runs (run_id, mode, started, finished, stage, news_latency, timings)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (run.run_id, run.mode, run.created, time.time() if run.finished else None,
+                 run.stage, run.news_latency, json.dumps(run.timings)),
+            )
+
+    def record_filtered(self, run_id: str, tickers: list[str]):
+        """
+        Stores the tickers that passed the filters in the run.
+        """
+        now = time.time()
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "INSERT INTO run_stocks (run_id, ticker, recorded, kind) VALUES (?, ?, ?, ?)",
+                [(run_id, ticker, now, self.FILTERED) for ticker in tickers],
+            )
+
+    def record_ratings(self, run_id: str, stocks: list[dict]):
+        """
+        Stores the received ratings and the sale recommendations of the run.
+        """
+        now = time.time()
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "INSERT INTO run_stocks (run_id, ticker, recorded, kind, rating, sale) VALUES (?, ?, ?, ?, ?, ?)",
+                [(run_id, stock["name"], now, self.RATING, stock["rating"], stock.get("sale")) for stock in stocks],
+            )
+
+    def query(self, ticker: str = None, kind: str = None, sale: int = None, start: float = None, end: float = None,
+              page: int = 1, per_page: int = 50) -> dict:
+        """
+        Returns one page of the stock records, the newest first.
+
+        Args:
+            ticker (str): Only records of the ticker.
+            kind (str): Only records of the kind (`filtered` or `rating`).
+            sale (int): Only ratings with the sale recommendation (1 - sell, 0 - keep).
+            start (float): Only records at or after the Unix timestamp.
+            end (float): Only records before the Unix timestamp.
+            page (int): Page number, starting at 1.
+            per_page (int): Records per page.
+
+        Returns:
+            dict: `items` of the page, `page`, `per_page` and `total` number of matching records.
+        """
+        conditions, params = [], []
+        for column, operator, value in (("ticker", "=", ticker), ("kind", "=", kind), ("sale", "=", sale),
+                                        ("recorded", ">=", start), ("recorded", "<", end)):
+            if value is not None:
+                conditions.append(f"{column} {operator} ?")
+                params.append(value)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        page = max(1, page)
+        per_page = max(1, min(per_page, self.MAX_PER_PAGE))
+
+        with self._lock:
+            total = self._connection.execute(f"SELECT COUNT(*) FROM run_stocks{where}", params).fetchone()[0]
+            rows = self._connection.execute(
+                f"SELECT run_id, ticker, recorded, kind, rating, sale FROM run_stocks{where}"
+                f" ORDER BY recorded DESC, id DESC LIMIT ? OFFSET ?",
+                [*params, per_page, (page - 1) * per_page],
+            ).fetchall()
+        return {"items": [dict(row) for row in rows], "page": page, "per_page": per_page, "total": total}
+
+    def last_sale_recommendation(self, ticker: str) -> dict | None:
+        """
+        Returns the newest sale recommendation of the ticker, or `None` if it was never recommended to sell.
+        """
+        items = self.query(ticker=ticker, kind=self.RATING, sale=1, per_page=1)["items"]
+        return items[0] if items else None
+
+    def runs(self, start: float = None, end: float = None, page: int = 1, per_page: int = 50) -> dict:
+        """
+        Returns one page of the runs, the newest first.
+
+        Args:
+            start (float): Only runs started at or after the Unix timestamp.
+            end (float): Only runs started before the Unix timestamp.
+            page (int): Page number, starting at 1.
+            per_page (int): Runs per page.
+
+        Returns:
+            dict: `items` of the page, `page`, `per_page` and `total` number of matching runs.
+        """
+        conditions, params = [], []
+        if start is not None:
+            conditions.append("started >= ?")
+            params.append(start)
+        if end is not None:
+            conditions.append("started < ?")
+            params.append(end)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        page = max(1, page)
+        per_page = max(1, min(per_page, self.MAX_PER_PAGE))
+
+        with self._lock:
+            total = self._connection.execute(f"SELECT COUNT(*) FROM runs{where}", params).fetchone()[0]
+            rows = self._connection.execute(
+                f"SELECT * FROM runs{where} ORDER BY started DESC LIMIT ? OFFSET ?",
+                [*params, per_page, (page - 1) * per_page],
+            ).fetchall()
+        items = [{**dict(row), "timings": json.loads(row["timings"] or "{}")} for row in rows]
+        return {"items": items, "page": page, "per_page": per_page, "total": total}
+
+    def close(self):
+        self._connection.close()
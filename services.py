@@ -0,0 +1,237 @@
+import logging
+import threading
+
+from config_manager import ConfigManager
+
+
+class lazy:
+    """
+    Property built on its first access and cached on the instance, like `functools.cached_property`.
+    The services are built under the lock of the instance, so concurrent requests share one instance.
+    """
+
+    def __init__(self, factory):
+        self.factory = factory
+        self.name = factory.__name__
+        self.__doc__ = factory.__doc__
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        try:
+            return instance.__dict__[self.name]
+        except KeyError:
+            pass
+        with instance._lock:  # reentrant, a service may build the services it depends on
+            if self.name not in instance.__dict__:
+                instance.__dict__[self.name] = self.factory(instance)
+            return instance.__dict__[self.name]
+
+
+class Services:
+    """
+    Controllers, stores and clients of the application, built lazily on their first use.
+
+    This class provides methods to:
+    - Build every service together with the services it depends on when it's used for the first time.
+    - Import the heavy dependencies (requests, numpy, apscheduler) only when a service needing them is built.
+    - Start the leader election, only the elected process builds and starts the scheduler.
+    """
+
+    def __init__(self, config_file: str = 'config.json'):
+        """
+        Initializes the Services with the configuration file, nothing is built yet.
+
+        Args:
+            config_file (str): Path to the configuration file.
+        """
+        self.config_file = config_file
+        self._lock = threading.RLock()
+
+    def built(self) -> list[str]:
+        """
+        Returns the names of the services built so far.
+        """
+        return [name for name, value in vars(type(self)).items() if isinstance(value, lazy) and name in self.__dict__]
+
+    @lazy
+    def config_manager(self):
+        return ConfigManager(config_file=self.config_file)
+
+    @lazy
+    def logger(self):
+        from log_streamer import LogStreamer
+        config = self.config_manager
+        return LogStreamer(capacity=config.LOG_CAPACITY, level=logging.getLevelName(config.LOG_LEVEL))
+
+    @lazy
+    def metrics(self):
+        """Registry of the timings and counters exposed on `/metrics`."""
+        from metrics import MetricsRegistry
+        return MetricsRegistry()
+
+    @lazy
+    def route_seconds(self):
+        return self.metrics.histogram('http_request_seconds', 'Duration of the route handling in seconds.', ('route',))
+
+    @lazy
+    def route_requests(self):
+        return self.metrics.counter('http_requests_total', 'Handled requests by route and status.', ('route', 'status'))
+
+    @lazy
+    def page_cache(self):
+        """Rendered pages cached by the version of the data they show."""
+        from page_cache import PageCache
+        return PageCache()
+
+    @lazy
+    def http_client(self):
+        """Pooled HTTP client shared by the Stock Market and the News requests."""
+        from http_client import HttpClient
+        config = self.config_manager
+        return HttpClient(
+            pool_size=config.HTTP_POOL_SIZE,
+            connect_timeout=config.HTTP_CONNECT_TIMEOUT,
+            read_timeout=config.HTTP_READ_TIMEOUT,
+            retries=config.HTTP_RETRIES,
+            backoff_factor=config.HTTP_BACKOFF_FACTOR,
+        )
+
+    @lazy
+    def price_cache(self):
+        """On-disk cache of daily prices, `None` if no path is configured."""
+        from price_cache import PriceCache
+        path = self.config_manager.PRICE_CACHE_PATH
+        return PriceCache(path) if path else None
+
+    @lazy
+    def rolling(self):
+        """Rolling state of the last closes persisted in a snapshot, in memory only if no path is configured."""
+        from rolling_state import RollingCloses
+        from StockMarketController import StockMarketController
+        return RollingCloses(StockMarketController.PRICE_WINDOW, path=self.config_manager.ROLLING_STATE_PATH)
+
+    @lazy
+    def search_cache(self):
+        """In-process cache of search results."""
+        from ttl_cache import TTLCache
+        return TTLCache(ttl=self.config_manager.SEARCH_CACHE_TTL, max_size=self.config_manager.SEARCH_CACHE_SIZE)
+
+    @lazy
+    def rate_limiter(self):
+        """Rate limiter of the Tiingo requests shared by the worker processes, `None` if no path is configured."""
+        from rate_limiter import RateLimiter
+        config = self.config_manager
+        if not config.RATE_LIMIT_PATH:
+            return None
+        limits = {
+            name: (limit, period) for name, limit, period in (
+                ('hour', config.RATE_LIMIT_PER_HOUR, 3600),
+                ('day', config.RATE_LIMIT_PER_DAY, 86400),
+            ) if limit
+        }
+        return RateLimiter(config.RATE_LIMIT_PATH, limits=limits, search_reserve=config.RATE_LIMIT_SEARCH_RESERVE)
+
+    @lazy
+    def ticker_index(self):
+        """Local index of the symbol universe searched before the Tiingo API, `None` if no path is configured."""
+        from ticker_index import TickerIndex
+        config = self.config_manager
+        if not config.TICKER_INDEX_PATH:
+            return None
+        return TickerIndex(
+            config.TICKER_INDEX_PATH,
+            max_results=config.TICKER_INDEX_MAX_RESULTS,
+            source_url=config.TICKER_INDEX_URL,
+            refresh_interval=config.TICKER_INDEX_REFRESH_INTERVAL,
+            http_client=self.http_client,
+        )
+
+    @lazy
+    def stock_market(self):
+        from StockMarketController import StockMarketController
+        return StockMarketController(
+            api_key=self.config_manager.TIINGO_API_KEY,
+            http_client=self.http_client,
+            price_cache=self.price_cache,
+            search_cache=self.search_cache,
+            metrics=self.metrics,
+            rate_limiter=self.rate_limiter,
+            rate_limit_wait=self.config_manager.RATE_LIMIT_WAIT,
+            ticker_index=self.ticker_index,
+        )
+
+    @lazy
+    def run_history(self):
+        """Persistent history of the pipeline runs, `None` if no path is configured."""
+        from run_history import RunHistory
+        path = self.config_manager.HISTORY_DB_PATH
+        return RunHistory(path) if path else None
+
+    @lazy
+    def module_market(self):
+        from DataController import DataController
+        return DataController(
+            stock_market=self.stock_market,
+            logger=self.logger,
+            config_manager=self.config_manager,
+            http_client=self.http_client,
+            history=self.run_history,
+            metrics=self.metrics,
+            rolling=self.rolling,
+        )
+
+    @lazy
+    def pipeline_jobs(self):
+        """Background queue of the pipeline runs."""
+        from pipeline_jobs import PipelineJobs
+        return PipelineJobs(self.module_market, max_workers=self.config_manager.PIPELINE_WORKERS)
+
+    @lazy
+    def scheduler(self):
+        """Scheduler of the pipeline runs at the configured hours, started only in the leader process."""
+        from apscheduler.schedulers.background import BackgroundScheduler
+        from apscheduler.triggers.cron import CronTrigger
+        scheduler = BackgroundScheduler()
+        scheduler.add_job(
+            self.submit_scheduled_run,
+            trigger=CronTrigger(hour=self.config_manager.SCHEDULE, minute='0'),
+            id='start_market',
+            replace_existing=True,
+        )
+        if self.config_manager.TICKER_INDEX_PATH and self.config_manager.TICKER_INDEX_URL:
+            scheduler.add_job(
+                self.refresh_ticker_index,
+                trigger='interval',
+                seconds=self.config_manager.TICKER_INDEX_REFRESH_INTERVAL,
+                id='refresh_ticker_index',
+                replace_existing=True,
+            )
+        return scheduler
+
+    @lazy
+    def leader(self):
+        """Leader election, only one of the worker processes runs the scheduled jobs."""
+        from leader import LeaderElection
+        return LeaderElection(
+            self.config_manager.LEADER_LOCK_PATH,
+            on_elected=lambda: self.scheduler.start(),
+            retry_interval=self.config_manager.LEADER_RETRY_INTERVAL,
+        )
+
+    def submit_scheduled_run(self):
+        # the pipeline is built when the first scheduled run is due, not when the scheduler starts
+        return self.pipeline_jobs.submit(mode='by scheduler')
+
+    def refresh_ticker_index(self):
+        # downloads the dump once per interval, the other workers reload the changed file on their next search
+        self.ticker_index.refresh()
+
+    def start(self):
+        """
+        Starts the leader election, another process takes over the scheduled jobs if the leader dies.
+        """
+        self.leader.start()
@@ -56,5 +56,6 @@ function logEvent(message) {
 // Connect to SSE for server logs
 const eventSource = new EventSource('/logs');
 eventSource.onmessage = function (event) {
-    logEvent(event.data);
+    // one event can carry several messages, one per line
+    event.data.split('\n').forEach(logEvent);
 };
\ No newline at end of file
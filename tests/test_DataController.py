@@ -1,11 +1,27 @@
+import json
 import pytest
-from unittest.mock import MagicMock, patch, mock_open
+import threading
+import time
+from unittest.mock import MagicMock, patch
 from DataController import DataController
+from ratings import MalformedJSONError, iter_ratings
+from rolling_state import RollingCloses
+from run_context import STAGE_FAILED, STAGE_FINISHED, STAGE_TIMED_OUT, STAGE_WAITING
 
 @pytest.fixture
-def mock_dependencies():
+def mock_dependencies(tmp_path):
     stock_market = MagicMock()
     stock_market.get_recent_prices.return_value = [100, 101, 102, 103, 104]
+
+    def get_recent_prices_bulk(tickers, max_workers=8, on_error=None):
+        prices = {}
+        for ticker in tickers:
+            try:
+                prices[ticker] = stock_market.get_recent_prices(ticker)
+            except Exception as e:
+                on_error(ticker, e)
+        return prices
+    stock_market.get_recent_prices_bulk.side_effect = get_recent_prices_bulk
     logger = MagicMock()
     config = MagicMock()
     config.RATING_THRESHOLD = 3
@@ -14,29 +30,38 @@ def mock_dependencies():
     config.NEWS_URL = "http://news.local"
     config.LISTSTOCK_ENDPOINT = "/list"
     config.SALESTOCK_ENDPOINT = "/sale"
-    config.FAVOURITE_STOCKS_PATH = "mock_favourites.txt"
+    config.FAVOURITE_STOCKS_PATH = str(tmp_path / "favourites.txt")
+    config.FAVOURITES_DB_PATH = str(tmp_path / "favourites.sqlite3")
+    config.FETCH_CONCURRENCY = 4
+    config.NEWS_TIMEOUT = 10
+    config.LISTSTOCK_CHUNK_SIZE = 500
+    config.LISTSTOCK_CONCURRENCY = 4
+    config.SALESTOCK_MODE = "final"
     return stock_market, logger, config
 
 def test_update_and_get_favourites(mock_dependencies):
     stock_market, logger, config = mock_dependencies
+    with open(config.FAVOURITE_STOCKS_PATH, "w") as file:
+        file.write("Test,TEST\n")
     controller = DataController(stock_market, logger, config)
 
-    with patch("builtins.open", mock_open(read_data="Test,TEST\n")) as m:
-        favourites = controller.get_favourite_stocks()
-        assert favourites == [("Test", "TEST")]
+    favourites = controller.get_favourite_stocks()
+    assert favourites == [("Test", "TEST")]
 
-    with patch("builtins.open", mock_open()) as m:
-        controller.update_favourite_stocks(("NewCorp", "NEW"))
-        m().write.assert_called_with("NewCorp,NEW\n")
+    assert controller.update_favourite_stocks(("NewCorp", "NEW"))
+    assert not controller.update_favourite_stocks(("NewCorp", "NEW"))  # already a favourite
+    assert controller.get_favourite_stocks() == [("Test", "TEST"), ("NewCorp", "NEW")]
+    assert controller.is_favourite_stock("NEW")
 
 def test_remove_favourite_stock(mock_dependencies):
     stock_market, logger, config = mock_dependencies
+    with open(config.FAVOURITE_STOCKS_PATH, "w") as file:
+        file.write("Apple,AAPL\nTesla,TSLA\n")
     controller = DataController(stock_market, logger, config)
 
-    mock_data = "Apple,AAPL\nTesla,TSLA\n"
-    with patch("builtins.open", mock_open(read_data=mock_data)) as m:
-        controller.remove_favourite_stocks("TSLA")
-        m().write.assert_called_once_with("Apple,AAPL\n")
+    assert controller.remove_favourite_stocks("TSLA")
+    assert controller.get_favourite_stocks() == [("Apple", "AAPL")]
+    assert not controller.is_favourite_stock("TSLA")
 
 def test_filter_stocks_applies_all_filters(mock_dependencies):
     stock_market, logger, config = mock_dependencies
@@ -46,6 +71,44 @@ def test_filter_stocks_applies_all_filters(mock_dependencies):
     filtered = controller.filter_stocks(stocks)
     assert filtered == ["TST"]
 
+def test_filter_stocks_isolates_failed_tickers(mock_dependencies):
+    stock_market, logger, config = mock_dependencies
+    controller = DataController(stock_market, logger, config)
+
+    def get_recent_prices(ticker):
+        if ticker == "BAD":
+            raise Exception("Tiingo API request failed")
+        return [100, 101, 102, 103, 104]
+    stock_market.get_recent_prices.side_effect = get_recent_prices
+
+    stocks = [("A", "AAA"), ("Bad", "BAD"), ("B", "BBB"), ("C", "CCC")]
+    filtered = controller.filter_stocks(stocks)
+    assert filtered == ["AAA", "BBB", "CCC"]
+    assert stock_market.get_recent_prices_bulk.call_args.kwargs["max_workers"] == 4
+
+def test_filter_stocks_with_rolling_state(mock_dependencies, tmp_path):
+    stock_market, logger, config = mock_dependencies
+    path = str(tmp_path / "rolling.npz")
+    controller = DataController(stock_market, logger, config, rolling=RollingCloses(path=path))
+    prices = {"AAA": [100, 101, 102, 103, 104], "DEC": [104, 103, 102, 101, 100]}
+
+    def get_recent_prices(ticker):
+        if ticker == "BAD":
+            raise Exception("Tiingo API request failed")
+        return prices[ticker]
+    stock_market.get_recent_prices.side_effect = get_recent_prices
+
+    stocks = [("A", "AAA"), ("Bad", "BAD"), ("Dec", "DEC")]
+    assert controller.filter_stocks(stocks) == ["AAA"]
+    # synced today, only the failed stock is fetched again
+    assert controller.filter_stocks(stocks) == ["AAA"]
+    assert stock_market.get_recent_prices_bulk.call_args.args[0] == ["BAD"]
+
+    # the snapshot is loaded by the next process
+    restarted = DataController(stock_market, logger, config, rolling=RollingCloses(path=path))
+    assert restarted.filter_stocks(stocks) == ["AAA"]
+    assert stock_market.get_recent_prices_bulk.call_args.args[0] == ["BAD"]
+
 def test_pack_stock_data(mock_dependencies):
     stock_market, logger, config = mock_dependencies
     controller = DataController(stock_market, logger, config)
@@ -54,30 +117,321 @@ def test_pack_stock_data(mock_dependencies):
     assert result[0]["name"] == "TST"
     assert "date" in result[0]
 
-def test_validate_stocks(mock_dependencies):
+def test_process_ratings(mock_dependencies):
     stock_market, logger, config = mock_dependencies
     controller = DataController(stock_market, logger, config)
 
-    stock_data = [{"name": "Test", "date": 1234567890, "rating": 3}]
-    result = controller.validate_stocks(stock_data)
-    assert result == stock_data
+    stocks = controller.process_ratings([
+        {"name": "Test", "date": 0, "rating": 4},
+        {"name": "Other", "date": 0, "rating": 2},
+        {"name": "X", "date": 0, "rating": 999},
+    ])
+    assert [(stock["name"], stock["sale"]) for stock in stocks] == [("Test", 1), ("Other", 0)]
+    assert controller.invalid_ratings.value() == 1
 
-def test_validate_stocks_errors(mock_dependencies):
+def test_process_ratings_errors(mock_dependencies):
     stock_market, logger, config = mock_dependencies
     controller = DataController(stock_market, logger, config)
 
     with pytest.raises(ValueError):
-        controller.validate_stocks([])
+        controller.process_ratings([])
 
     with pytest.raises(TypeError):
-        controller.validate_stocks([123])
+        controller.process_ratings([123])
 
     with pytest.raises(ValueError):
-        controller.validate_stocks([{"name": "X", "date": 0, "rating": 999}])
+        controller.process_ratings([{"name": "X", "date": 0, "rating": 999}])
+
+def test_news_response_wakes_waiting_run(mock_dependencies):
+    stock_market, logger, config = mock_dependencies
+    controller = DataController(stock_market, logger, config)
+    controller._create_run("run-1", "manually").news_sent_at = time.monotonic()
+
+    timer = threading.Timer(0.05, controller.notify_news_response, args=("run-1",))
+    started = time.monotonic()
+    timer.start()
+    assert controller.wait_for_news_response("run-1", timeout=5)
+    assert time.monotonic() - started < 1
+    assert controller.news_latencies[-1][0] == "run-1"
+    assert controller.news_latencies[-1][1] > 0
 
-def test_add_recommendations(mock_dependencies):
+def test_news_response_timeout(mock_dependencies):
     stock_market, logger, config = mock_dependencies
     controller = DataController(stock_market, logger, config)
-    controller.stocks = [{"name": "Test", "rating": 4}]
-    controller.add_recommendations()
-    assert controller.stocks[0]["sale"] == 1
\ No newline at end of file
+    controller._create_run("run-1", "manually").news_sent_at = time.monotonic()
+
+    assert not controller.wait_for_news_response("run-1", timeout=0.01)
+    assert controller.notify_news_response("unknown-run") is None
+
+@patch("DataController.DataController.send_to_news_module")
+def test_start_market_returns_when_rating_received(mock_send, mock_dependencies):
+    stock_market, logger, config = mock_dependencies
+    controller = DataController(stock_market, logger, config)
+    controller.get_favourite_stocks = MagicMock(return_value=[("Test", "TST")])
+    # the News module answers while the liststock request is being sent
+    mock_send.side_effect = lambda endpoint, data: threading.Timer(
+        0.05, controller.second_step_market, args=([{"name": "TST", "date": 0, "rating": 4}],)
+    ).start() if endpoint == controller.liststock_endpoint else None
+
+    started = time.monotonic()
+    controller.start_market(mode="manually")
+    assert time.monotonic() - started < 5
+    assert len(controller.news_latencies) == 1
+
+@patch("DataController.DataController.send_to_news_module")
+def test_overlapping_runs_keep_their_own_state(mock_send, mock_dependencies):
+    stock_market, logger, config = mock_dependencies
+    controller = DataController(stock_market, logger, config)
+    controller.get_favourite_stocks = MagicMock(return_value=[("Test", "TST")])
+    sent = {}
+
+    def send(endpoint, data):
+        if endpoint == controller.liststock_endpoint:
+            sent[data[0]["run_id"]] = data
+    mock_send.side_effect = send
+
+    runs = []
+    threads = [threading.Thread(target=lambda: runs.append(controller.start_market(mode="manually"))) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    while len(sent) < 2:
+        time.sleep(0.01)
+
+    first_id, second_id = list(sent)
+    # answer the runs in the reverse order, matched by the run ID in the stocks
+    assert controller.second_step_market([{"name": "TST", "date": 0, "rating": 4, "run_id": second_id}])
+    assert controller.second_step_market([{"name": "TST", "date": 0, "rating": 2}], run_id=first_id)
+    for thread in threads:
+        thread.join()
+
+    assert controller.get_run(first_id).stocks[0]["sale"] == 0
+    assert controller.get_run(second_id).stocks[0]["sale"] == 1
+    assert all(run.stage == STAGE_FINISHED for run in runs)
+    assert not controller.second_step_market([{"name": "TST", "date": 0, "rating": 2}], run_id="unknown")
+
+def test_callback_during_liststock_finishes_run(mock_dependencies):
+    stock_market, logger, config = mock_dependencies
+    stages = []
+    controller = DataController(stock_market, logger, config)
+    controller.stage_listener = lambda run_id, stage: stages.append(stage)
+    controller.get_favourite_stocks = MagicMock(return_value=[("Test", "TST")])
+    # News answers before the liststock request returns
+    controller.send_to_news_module = MagicMock(side_effect=lambda endpoint, data: controller.second_step_market(
+        rate(data)) if endpoint == controller.liststock_endpoint else None)
+
+    run = controller.start_market(mode="manually")
+    assert run.stage == STAGE_FINISHED
+    assert stages[-1] == STAGE_FINISHED and stages.count(STAGE_FINISHED) == 1
+    assert controller.runs_total.value(stage=STAGE_FINISHED) == 1
+
+def test_late_callback_keeps_timed_out_run(mock_dependencies):
+    stock_market, logger, config = mock_dependencies
+    config.NEWS_TIMEOUT = 0.01
+    history = MagicMock()
+    controller = DataController(stock_market, logger, config, history=history)
+    controller.get_favourite_stocks = MagicMock(return_value=[("Test", "TST")])
+    controller.send_to_news_module = MagicMock()
+
+    run = controller.start_market(mode="manually")
+    assert run.stage == STAGE_TIMED_OUT
+    assert controller.second_step_market([{"name": "TST", "date": 0, "rating": 4}], run_id=run.run_id)
+    assert run.stage == STAGE_TIMED_OUT
+    assert controller.runs_total.value(stage=STAGE_TIMED_OUT) == 1
+    assert controller.runs_total.value(stage=STAGE_FINISHED) == 0
+    history.record_run.assert_called_once_with(run)
+    # nothing is validated, recorded or sent for the dead run
+    history.record_ratings.assert_not_called()
+    assert run.stocks == []
+    controller.send_to_news_module.assert_called_once()  # only the liststock
+
+def test_failed_callback_wakes_waiting_run(mock_dependencies):
+    stock_market, logger, config = mock_dependencies
+    config.SALESTOCK_MODE = "incremental"  # the salestock fails before the run is completed
+    controller = DataController(stock_market, logger, config)
+    controller.get_favourite_stocks = MagicMock(return_value=[("Test", "TST")])
+
+    def send(endpoint, data):
+        if endpoint == controller.liststock_endpoint:
+            threading.Timer(0.05, controller.second_step_market, args=(rate(data),)).start()
+        else:
+            raise ConnectionError("News is down")
+    controller.send_to_news_module = MagicMock(side_effect=send)
+
+    started = time.monotonic()
+    run = controller.start_market(mode="manually")
+    assert time.monotonic() - started < 5  # not the NEWS_TIMEOUT
+    assert run.stage == STAGE_FAILED
+
+def test_run_is_recorded_in_history(mock_dependencies):
+    stock_market, logger, config = mock_dependencies
+    history = MagicMock()
+    controller = DataController(stock_market, logger, config, history=history)
+    controller.get_favourite_stocks = MagicMock(return_value=[])
+
+    run = controller.start_market(mode="manually")
+    history.record_run.assert_called_once_with(run)
+
+def test_pipeline_steps_are_measured(mock_dependencies):
+    stock_market, logger, config = mock_dependencies
+    controller = DataController(stock_market, logger, config)
+    controller.http_client = MagicMock()
+
+    controller.filter_stocks([("Test", "TST")])
+    controller.send_to_news_module(controller.liststock_endpoint, [])
+    with pytest.raises(ValueError):
+        controller.process_ratings([])
+
+    assert controller.step_seconds.count(step="filter_stocks") == 1
+    assert controller.step_errors.value(step="process_ratings") == 1
+    assert controller.news_request_seconds.count(endpoint=controller.liststock_endpoint) == 1
+    text = controller.metrics.render()
+    assert 'pipeline_step_seconds_count{step="filter_stocks"} 1' in text
+    assert 'pipeline_step_errors_total{step="process_ratings"} 1' in text
+
+def test_second_step_market_streams_ratings(mock_dependencies):
+    stock_market, logger, config = mock_dependencies
+    controller = DataController(stock_market, logger, config)
+    controller.send_to_news_module = MagicMock()
+    run = controller._create_run("run-1", "manually")
+    run.news_sent_at = time.monotonic()
+
+    stocks = iter([
+        {"name": "A", "date": 0, "rating": 4, "run_id": "run-1"},
+        {"name": "B", "date": 0, "rating": 99, "run_id": "run-1"},
+        {"name": "C", "date": 0, "rating": 2, "run_id": "run-1"},
+    ])
+    assert controller.second_step_market(stocks)
+    assert run.stage == STAGE_FINISHED
+    assert [(stock["name"], stock["sale"]) for stock in run.stocks] == [("A", 1), ("C", 0)]
+    assert controller.invalid_ratings.value() == 1
+    controller.send_to_news_module.assert_called_once_with(controller.salestock_endpoint, run.stocks)
+
+def test_malformed_callback_is_rejected(mock_dependencies):
+    stock_market, logger, config = mock_dependencies
+    controller = DataController(stock_market, logger, config)
+    controller.send_to_news_module = MagicMock()
+    run = controller._create_run("run-1", "manually")
+    run.tickers, run.chunks = ["A", "B"], 1
+    run.news_sent_at = time.monotonic()
+
+    body = json.dumps([{"name": "A", "date": 0, "rating": 4}])[:-1] + ', {"name": "B", "date": }]'
+    with pytest.raises(MalformedJSONError):
+        controller.second_step_market(iter_ratings(body), run_id="run-1")
+    assert run.callbacks == 0 and run.rated == set() and run.stocks == []
+    assert run.waiting_for_news and run.stage == STAGE_WAITING
+
+    # the callback sent again completes the run
+    assert controller.second_step_market(iter_ratings(body.replace('"date": }', '"date": 0, "rating": 2}')), run_id="run-1")
+    assert run.stage == STAGE_FINISHED
+    assert [stock["name"] for stock in run.stocks] == ["A", "B"]
+
+def start_chunked_run(controller, tickers):
+    """
+    Starts a run in the background and returns it with the chunks it sent to `/liststock`.
+    """
+    controller.get_favourite_stocks = MagicMock(return_value=[(ticker, ticker) for ticker in tickers])
+    chunks, sales = [], []
+    lock = threading.Lock()
+
+    def send(endpoint, data):
+        with lock:
+            (chunks if endpoint == controller.liststock_endpoint else sales).append(data)
+    controller.send_to_news_module = MagicMock(side_effect=send)
+
+    runs = []
+    thread = threading.Thread(target=lambda: runs.append(controller.start_market(mode="manually")))
+    thread.start()
+    while len(chunks) < -(-len(tickers) // controller.liststock_chunk_size):
+        time.sleep(0.01)
+    return thread, runs, chunks, sales
+
+def rate(chunk, rating=4):
+    return [{**stock, "rating": rating} for stock in chunk]
+
+def test_liststock_is_sent_in_chunks_and_ratings_merged(mock_dependencies):
+    stock_market, logger, config = mock_dependencies
+    config.LISTSTOCK_CHUNK_SIZE = 2
+    controller = DataController(stock_market, logger, config)
+    thread, runs, chunks, sales = start_chunked_run(controller, ["A", "B", "C", "D", "E"])
+
+    assert sorted(len(chunk) for chunk in chunks) == [1, 2, 2]
+    run_id = chunks[0][0]["run_id"]
+    controller.second_step_market(rate(chunks[0], 4))
+    controller.second_step_market(rate(chunks[1], 2), run_id=run_id)
+    assert controller.get_run(run_id).waiting_for_news  # one chunk missing
+    assert sales == []
+    controller.second_step_market(rate(chunks[2], 4), run_id=run_id)
+    thread.join()
+
+    run = runs[0]
+    assert run.stage == STAGE_FINISHED
+    assert sorted(stock["name"] for stock in run.stocks) == ["A", "B", "C", "D", "E"]
+    assert len(sales) == 1 and len(sales[0]) == 5  # sent once for the whole run
+
+def test_salestock_incremental(mock_dependencies):
+    stock_market, logger, config = mock_dependencies
+    config.LISTSTOCK_CHUNK_SIZE = 2
+    config.SALESTOCK_MODE = "incremental"
+    controller = DataController(stock_market, logger, config)
+    thread, runs, chunks, sales = start_chunked_run(controller, ["A", "B", "C"])
+
+    controller.second_step_market(rate(chunks[0]))
+    assert len(sales) == 1 and sales[0] == controller.get_run(chunks[0][0]["run_id"]).stocks
+    # a chunk without valid ratings doesn't fail the run
+    controller.second_step_market(rate(chunks[1], rating=99))
+    thread.join()
+
+    assert runs[0].stage == STAGE_FINISHED
+    assert len(sales) == 1
+    assert len(runs[0].stocks) == len(chunks[0])
+
+@pytest.mark.parametrize("callback_first", [False, True])
+def test_failed_chunk_is_not_awaited(mock_dependencies, callback_first):
+    stock_market, logger, config = mock_dependencies
+    config.LISTSTOCK_CHUNK_SIZE = 1
+    controller = DataController(stock_market, logger, config)
+    controller.get_favourite_stocks = MagicMock(return_value=[("A", "A"), ("B", "B")])
+    sales = []
+
+    def send(endpoint, data):
+        if endpoint != controller.liststock_endpoint:
+            sales.append(data)
+        elif data[0]["name"] == "B":
+            raise ConnectionError("News is down")
+        elif callback_first:
+            # the callback of the other chunk lands before the failed chunk is processed
+            controller.second_step_market(rate(data))
+        else:
+            threading.Timer(0.05, controller.second_step_market, args=(rate(data),)).start()
+    controller.send_to_news_module = MagicMock(side_effect=send)
+
+    run = controller.start_market(mode="manually")
+    deadline = time.monotonic() + 5
+    while not run.finished and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert run.stage == STAGE_FINISHED
+    assert [stock["name"] for stock in run.stocks] == ["A"]
+    assert sales == [run.stocks]
+    assert controller.runs_total.value(stage=STAGE_FINISHED) == 1
+
+def test_failed_chunk_fails_run_without_ratings(mock_dependencies):
+    stock_market, logger, config = mock_dependencies
+    config.LISTSTOCK_CHUNK_SIZE = 1
+    controller = DataController(stock_market, logger, config)
+    controller.get_favourite_stocks = MagicMock(return_value=[("A", "A"), ("B", "B")])
+
+    def send(endpoint, data):
+        if data[0]["name"] == "B":
+            raise ConnectionError("News is down")
+        controller.second_step_market(rate(data, rating=99))
+    controller.send_to_news_module = MagicMock(side_effect=send)
+
+    run = controller.start_market(mode="manually")
+    assert run.stage == STAGE_FAILED
+    assert controller.send_to_news_module.call_count == 2  # no salestock
+
+def test_invalid_salestock_mode(mock_dependencies):
+    stock_market, logger, config = mock_dependencies
+    config.SALESTOCK_MODE = "sometimes"
+    with pytest.raises(ValueError):
+        DataController(stock_market, logger, config)
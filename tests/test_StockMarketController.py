@@ -1,13 +1,19 @@
 import pytest
 import requests
 from unittest.mock import patch, MagicMock
+from datetime import date, datetime, timedelta
 from StockMarketController import StockMarketController
+from price_cache import PriceCache, last_trading_day
+from ttl_cache import TTLCache
+from ticker_index import TickerIndex
+from rate_limiter import RateLimiter, RateLimitError
+from benchmarks.fake_servers import FakeTiingo
 
 @pytest.fixture
 def controller():
     return StockMarketController(api_key="fake_api_key")
 
-@patch("requests.get")
+@patch("http_client.HttpClient.get")
 def test_search_ticker_success(mock_get, controller):
     mock_get.return_value = MagicMock(status_code=200)
     mock_get.return_value.json.return_value = [
@@ -16,13 +22,13 @@ def test_search_ticker_success(mock_get, controller):
     result = controller.search_ticker("test")
     assert result == [("Test Inc.", "TST")]
 
-@patch("requests.get")
+@patch("http_client.HttpClient.get")
 def test_search_ticker_failure(mock_get, controller):
     mock_get.return_value = MagicMock(status_code=500, text="Internal Server Error")
     with pytest.raises(Exception, match="Tiingo API request failed"):
         controller.search_ticker("test")
 
-@patch("requests.get")
+@patch("http_client.HttpClient.get")
 def test_get_recent_prices_success(mock_get, controller):
     mock_get.return_value = MagicMock(status_code=200)
     mock_get.return_value.json.return_value = [
@@ -36,8 +42,177 @@ def test_get_recent_prices_success(mock_get, controller):
     prices = controller.get_recent_prices("TST")
     assert prices == [100.0, 101.5, 99.3, 102.4, 104.0, 105.1]
 
-@patch("requests.get")
+@patch("http_client.HttpClient.get")
 def test_get_recent_prices_failure(mock_get, controller):
     mock_get.return_value = MagicMock(status_code=400, text="Bad Request")
     with pytest.raises(Exception, match="Tiingo API request failed"):
-        controller.get_recent_prices("TST")
\ No newline at end of file
+        controller.get_recent_prices("TST")
+
+@pytest.fixture
+def cached_controller(tmp_path):
+    cache = PriceCache(str(tmp_path / "prices.sqlite3"))
+    yield StockMarketController(api_key="fake_api_key", price_cache=cache)
+    cache.close()
+
+def _price_entries(days):
+    return [{"date": f"{day.isoformat()}T00:00:00.000Z", "close": 100.0 + i} for i, day in enumerate(days)]
+
+def test_last_trading_day():
+    assert last_trading_day(date(2025, 4, 15)) == date(2025, 4, 14)  # Tuesday -> Monday
+    assert last_trading_day(date(2025, 4, 14)) == date(2025, 4, 11)  # Monday -> Friday
+    assert last_trading_day(date(2025, 4, 13)) == date(2025, 4, 11)  # Sunday -> Friday
+
+@patch("http_client.HttpClient.get")
+def test_get_recent_prices_cache_hit_skips_network(mock_get, cached_controller):
+    today = datetime.now().date()
+    days = [last_trading_day(today) - timedelta(days=i) for i in range(7, -1, -1)]
+    mock_get.return_value = MagicMock(status_code=200)
+    mock_get.return_value.json.return_value = _price_entries(days)
+
+    first = cached_controller.get_recent_prices("TST")
+    second = cached_controller.get_recent_prices("TST")
+
+    assert first == second == [102.0, 103.0, 104.0, 105.0, 106.0, 107.0]
+    assert mock_get.call_count == 1
+    stats = cached_controller.price_cache.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 1
+
+@patch("http_client.HttpClient.get")
+def test_get_recent_prices_requests_only_new_days(mock_get, cached_controller):
+    today = datetime.now().date()
+    last_cached = last_trading_day(today) - timedelta(days=7)
+    cached_controller.price_cache.store(
+        "TST", [((last_cached - timedelta(days=i)).isoformat(), 90.0 + i) for i in range(6)], checked_on=last_cached
+    )
+    new_day = last_trading_day(today)
+    mock_get.return_value = MagicMock(status_code=200)
+    mock_get.return_value.json.return_value = [{"date": f"{new_day.isoformat()}T00:00:00.000Z", "close": 120.0}]
+
+    prices = cached_controller.get_recent_prices("TST")
+
+    requested_url = mock_get.call_args[0][0]
+    assert f"startDate={(last_cached + timedelta(days=1)).isoformat()}" in requested_url
+    assert prices == [94.0, 93.0, 92.0, 91.0, 90.0, 120.0]
+    assert cached_controller.price_cache.stats()["incremental"] == 1
+
+@patch("http_client.HttpClient.get")
+def test_get_recent_prices_checked_today_skips_network(mock_get, cached_controller):
+    today = datetime.now().date()
+    old_day = last_trading_day(today) - timedelta(days=3)  # e.g. an exchange holiday in between
+    cached_controller.price_cache.store("TST", [(old_day.isoformat(), 50.0)], checked_on=today)
+
+    assert cached_controller.get_recent_prices("TST") == [50.0]
+    mock_get.assert_not_called()
+
+def test_get_recent_prices_bulk_against_fake_tiingo(tmp_path):
+    cache = PriceCache(str(tmp_path / "prices.sqlite3"))
+    errors = {}
+    with FakeTiingo(failing=("BAD",)) as tiingo:
+        controller = StockMarketController(api_key="fake_api_key", price_cache=cache, base_url=tiingo.url)
+        tickers = ["MSFT", "AAPL", "BAD", "MSFT", "TSLA"]
+
+        first = controller.get_recent_prices_bulk(tickers, max_workers=3, on_error=lambda t, e: errors.update({t: e}))
+        assert list(first) == ["MSFT", "AAPL", "TSLA"]  # order kept, duplicates merged, failure left out
+        assert all(len(closes) == 6 for closes in first.values())
+        assert list(errors) == ["BAD"]
+        assert len(tiingo.price_requests()) == 4  # one per unique ticker
+
+        # second run: the cache is current, only the failed ticker goes to the network again
+        second = controller.get_recent_prices_bulk(tickers, max_workers=3, on_error=lambda t, e: None)
+        assert second == first
+        assert len(tiingo.price_requests()) == 5
+        assert cache.stats()["hits"] == 3
+    cache.close()
+
+def test_get_recent_prices_bulk_without_cache():
+    with FakeTiingo() as tiingo:
+        controller = StockMarketController(api_key="fake_api_key", base_url=tiingo.url)
+        prices = controller.get_recent_prices_bulk(["AAA", "BBB"])
+        assert prices["AAA"] == [float(entry["close"]) for entry in
+                                 FakeTiingo.closes("AAA", (datetime.now().date() - timedelta(days=14)).isoformat())[-6:]]
+        assert len(tiingo.price_requests()) == 2
+
+@patch("http_client.HttpClient.get")
+def test_search_ticker_uses_cache_for_normalized_query(mock_get):
+    controller = StockMarketController(api_key="fake_api_key", search_cache=TTLCache())
+    mock_get.return_value = MagicMock(status_code=200)
+    mock_get.return_value.json.return_value = [{"name": "Tesla Inc.", "ticker": "TSLA"}]
+
+    assert controller.search_ticker("Tesla") == [("Tesla Inc.", "TSLA")]
+    assert controller.search_ticker("  tesla ") == [("Tesla Inc.", "TSLA")]
+    assert mock_get.call_count == 1
+    assert controller.search_cache.stats()["hits"] == 1
+
+@patch("http_client.HttpClient.get")
+def test_search_ticker_caches_empty_results(mock_get):
+    controller = StockMarketController(api_key="fake_api_key", search_cache=TTLCache())
+    mock_get.return_value = MagicMock(status_code=200)
+    mock_get.return_value.json.return_value = []
+
+    for _ in range(2):
+        with pytest.raises(Exception, match="No tickers found"):
+            controller.search_ticker("xyzxyz")
+    assert mock_get.call_count == 1
+
+def rate_limited(status_codes, retry_after="1"):
+    responses = []
+    for status_code in status_codes:
+        response = MagicMock(status_code=status_code, headers={"Retry-After": retry_after} if status_code == 429 else {})
+        response.json.return_value = [{"date": "2025-01-01T00:00:00.000Z", "close": 1.0}]
+        responses.append(response)
+    return responses
+
+@patch("http_client.HttpClient.get")
+def test_pipeline_request_waits_out_429(mock_get, tmp_path):
+    mock_get.side_effect = rate_limited([429, 200])
+    now, sleeps = [1_000_000.0], []
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        now[0] += seconds
+    limiter = RateLimiter(str(tmp_path / "limit.sqlite3"), limits={"hour": (100, 3600)},
+                          clock=lambda: now[0], sleep=sleep)
+    controller = StockMarketController(api_key="fake_api_key", rate_limiter=limiter)
+
+    assert controller.get_recent_prices("TST") == [1.0]
+    assert mock_get.call_count == 2
+    assert sleeps == [1]  # Retry-After
+    assert limiter.stats()["throttled"] == 1
+
+@patch("http_client.HttpClient.get")
+def test_search_fails_fast_on_429(mock_get, tmp_path):
+    mock_get.side_effect = rate_limited([429])
+    limiter = RateLimiter(str(tmp_path / "limit.sqlite3"), limits={"hour": (100, 3600)})
+    controller = StockMarketController(api_key="fake_api_key", rate_limiter=limiter)
+
+    with pytest.raises(RateLimitError) as error:
+        controller.search_ticker("tesla")
+    assert error.value.retry_after == 1
+    assert mock_get.call_count == 1
+    # the pipeline requests pause too
+    assert limiter.stats()["throttled"] == 1
+    assert limiter.stats()["blocked_for"] == pytest.approx(1, abs=0.5)
+
+@patch("http_client.HttpClient.get")
+def test_pipeline_gives_up_when_budget_is_exhausted(mock_get, tmp_path):
+    limiter = RateLimiter(str(tmp_path / "limit.sqlite3"), limits={"hour": (1, 3600)})
+    limiter.acquire()
+    controller = StockMarketController(api_key="fake_api_key", rate_limiter=limiter, rate_limit_wait=60)
+
+    with pytest.raises(RateLimitError):
+        controller.get_recent_prices("TST")
+    mock_get.assert_not_called()
+
+@patch("http_client.HttpClient.get")
+def test_search_ticker_uses_index_before_api(mock_get, tmp_path):
+    path = tmp_path / "tickers.csv"
+    path.write_text("ticker,name\nTSLA,Tesla Inc.\n")
+    controller = StockMarketController(api_key="fake_api_key", ticker_index=TickerIndex(str(path)))
+    assert controller.search_ticker("Tesla") == [("Tesla Inc.", "TSLA")]
+    mock_get.assert_not_called()
+
+    # a miss falls back to the API
+    mock_get.return_value = MagicMock(status_code=200)
+    mock_get.return_value.json.return_value = [{"name": "Apple Inc.", "ticker": "AAPL"}]
+    assert controller.search_ticker("apple") == [("Apple Inc.", "AAPL")]
+    assert mock_get.call_count == 1
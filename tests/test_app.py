@@ -1,66 +1,190 @@
+import json
+import os
+import subprocess
+import sys
+import time
 import pytest
 from unittest.mock import patch, MagicMock
-from app import app as flask_app
+from flask import url_for
+from app import create_app
+from rate_limiter import RateLimitError
 
 @pytest.fixture
-def client():
+def flask_app(tmp_path):
+    # the data files of the app are kept in the temporary directory
+    with open("config.json") as file:
+        config = json.load(file)
+    for key in ("favourites_db_path", "price_cache_path", "rolling_state_path", "history_db_path",
+                "rate_limit_path", "leader_lock_path", "ticker_index_path"):
+        config[key] = str(tmp_path / os.path.basename(config[key]))
+    config["favourite_stocks_path"] = str(tmp_path / "favourite_stocks.txt")
+    config_file = tmp_path / "config.json"
+    config_file.write_text(json.dumps(config))
+
+    flask_app = create_app(str(config_file), start_scheduler=False)
     flask_app.config["TESTING"] = True
+    return flask_app
+
+@pytest.fixture
+def services(flask_app):
+    return flask_app.extensions["services"]
+
+@pytest.fixture
+def client(flask_app):
     with flask_app.test_client() as client:
         yield client
 
-@patch("app.module_market.get_favourite_stocks")
-def test_home_page(mock_get_favourites, client):
-    mock_get_favourites.return_value = [("Test Company", "TEST")]
-    response = client.get("/")
+def test_home_page(services, client):
+    with patch.object(services.module_market, "get_favourite_stocks", return_value=[("Test Company", "TEST")]):
+        response = client.get("/")
     assert response.status_code == 200
     assert b"Test Company" in response.data
 
-@patch("app.module_market.get_favourite_stocks", side_effect=FileNotFoundError)
-def test_home_page_file_not_found(mock_get_favourites, client):
-    response = client.get("/")
+def test_home_page_file_not_found(services, client):
+    with patch.object(services.module_market, "get_favourite_stocks", side_effect=FileNotFoundError):
+        response = client.get("/")
     assert response.status_code == 200
     assert b"No results found" not in response.data  # Still renders
 
-@patch("app.module_market.start_market")
-def test_start_app_route(mock_start_market, client):
-    response = client.post("/start_app")
+def test_start_app_route(services, client):
+    with patch.object(services.module_market, "start_market"):
+        response = client.post("/start_app")
     assert response.status_code == 302  # Should redirect
 
-@patch("app.stock_market.search_ticker")
-@patch("app.logger.log")
-def test_search_stock_success(mock_log, mock_search_ticker, client):
-    mock_search_ticker.return_value = [("Test Company", "TEST")]
-    response = client.get("/search_stock?query=test")
+def test_search_stock_success(services, client):
+    with patch.object(services.stock_market, "search_ticker", return_value=[("Test Company", "TEST")]), \
+            patch.object(services.logger, "log"):
+        response = client.get("/search_stock?query=test")
     assert response.status_code == 200
     assert b"TEST" in response.data
 
-@patch("app.stock_market.search_ticker", side_effect=Exception("API failure"))
-@patch("app.logger.log")
-def test_search_stock_failure(mock_log, mock_search_ticker, client):
-    response = client.get("/search_stock?query=test")
+def test_search_stock_failure(services, client):
+    with patch.object(services.stock_market, "search_ticker", side_effect=Exception("API failure")), \
+            patch.object(services.logger, "log"):
+        response = client.get("/search_stock?query=test")
     assert response.status_code == 200
     assert response.json == []
 
-@patch("app.module_market.get_favourite_stocks", return_value=[])
-@patch("app.module_market.update_favourite_stocks")
-@patch("app.logger.log")
-def test_add_favourite_stock(mock_log, mock_update_fav, mock_get_fav, client):
-    response = client.post("/add_favourite_stock", data={"name": "Test", "ticker": "TST"})
+def test_add_favourite_stock(services, client):
+    with patch.object(services.module_market, "get_favourite_stocks", return_value=[]), \
+            patch.object(services.module_market, "update_favourite_stocks"), patch.object(services.logger, "log"):
+        response = client.post("/add_favourite_stock", data={"name": "Test", "ticker": "TST"})
     assert response.status_code == 302
 
-@patch("app.module_market.remove_favourite_stocks")
-@patch("app.logger.log")
-def test_delete_favourite_stock(mock_log, mock_remove_fav, client):
-    response = client.post("/delete_favourite_stock", data={"ticker": "TST"})
+def test_delete_favourite_stock(services, client):
+    with patch.object(services.module_market, "remove_favourite_stocks"), patch.object(services.logger, "log"):
+        response = client.post("/delete_favourite_stock", data={"ticker": "TST"})
     assert response.status_code == 302
 
-# @patch("app.module_market.second_step_market")
-# @patch("app.logger.log")
-# def test_receive_rating_post_success(mock_log, mock_second_step, client):
-#     response = client.post("/rating", json={"name": "Test", "rating": 5, "date": 1234567890})
-#     assert response.status_code == 200
-#     assert response.json["status"] == "success"
-
 def test_receive_rating_wrong_method(client):
     response = client.get("/rating")
     assert response.status_code == 405
+
+def test_start_app_returns_run_id_to_json_clients(services, client):
+    with patch.object(services.module_market, "start_market"):
+        response = client.post("/start_app", headers={"Accept": "application/json"})
+    assert response.status_code == 202
+    run_id = response.json["run_id"]
+
+    status = client.get(f"/runs/{run_id}")
+    assert status.status_code == 200
+    assert status.json["run_id"] == run_id
+    assert client.get("/runs/unknown").status_code == 404
+
+def test_history_query(services, client):
+    services.run_history.record_ratings("test-run", [{"name": "HISTTEST", "rating": 5, "sale": 1}])
+
+    response = client.get("/history?ticker=HISTTEST&sale=1&per_page=1")
+    assert response.status_code == 200
+    assert response.json["items"][0]["run_id"] == "test-run"
+    assert client.get("/history?start=not-a-date").status_code == 400
+    assert client.get("/history/runs?per_page=5").status_code == 200
+
+def test_metrics_endpoint(services, client):
+    with patch.object(services.stock_market, "search_ticker", return_value=[("Test Company", "TEST")]):
+        client.get("/search_stock?query=test")
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.content_type.startswith("text/plain; version=0.0.4")
+    text = response.get_data(as_text=True)
+    assert "# TYPE pipeline_step_seconds histogram" in text
+    assert 'http_requests_total{route="/search_stock",status="200"}' in text
+    assert 'http_request_seconds_count{route="/search_stock"}' in text
+
+def test_receive_rating_rejects_invalid_body(client):
+    response = client.post("/rating?run_id=unknown", data='{"name": "TEST"}', content_type="application/json")
+    assert response.status_code == 400
+
+def test_receive_rating_rejects_malformed_stream(services, client):
+    run = services.module_market._create_run("malformed-run", "manually")
+    run.news_sent_at = time.monotonic()
+    body = '[{"name": "TEST", "date": 0, "rating": 1}, {"name": '
+    response = client.post("/rating?run_id=malformed-run", json=body)
+    assert response.status_code == 400
+    assert run.callbacks == 0 and run.waiting_for_news
+
+def test_receive_rating_unknown_run(client):
+    response = client.post("/rating?run_id=unknown", json=json.dumps([{"name": "TEST", "date": 0, "rating": 1}]))
+    assert response.status_code == 404
+
+def test_search_stock_rate_limited(services, client):
+    with patch.object(services.stock_market, "search_ticker", side_effect=RateLimitError("limit", retry_after=30)):
+        response = client.get("/search_stock?query=test")
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "31"
+    assert response.get_json() == []
+
+def test_controllers_are_built_on_first_use(services, client):
+    assert services.built() == []
+    response = client.get("/stats")
+    assert response.json["http"] is None  # not built just for the statistics
+    assert "module_market" not in services.built()
+
+    with patch.object(services.module_market, "get_favourite_stocks", return_value=[]):
+        client.get("/")
+    assert {"config_manager", "stock_market", "module_market"} <= set(services.built())
+    assert "scheduler" not in services.built()
+    assert client.get("/stats").json["http"] is not None
+
+def test_create_app_defers_heavy_imports():
+    code = (
+        "import sys, app; app.create_app(start_scheduler=False); "
+        "print(sorted(m for m in ('apscheduler', 'requests', 'numpy', 'DataController') if m in sys.modules))"
+    )
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    assert result.stdout.strip() == "[]"
+
+def test_logs_rejects_unknown_level(client):
+    assert client.get("/logs?level=LOUD").status_code == 400
+
+def test_home_page_is_cached_and_conditional(services, client):
+    services.module_market.favourites.add("Test Company", "TEST")
+    first = client.get("/")
+    assert first.status_code == 200 and b"Test Company" in first.data
+    assert first.headers["ETag"] and first.headers["Last-Modified"]
+
+    with patch.object(services.module_market, "get_favourite_stocks") as get_favourites:
+        assert client.get("/").data == first.data
+        not_modified = client.get("/", headers={"If-None-Match": first.headers["ETag"]})
+        get_favourites.assert_not_called()  # served from the cache
+    assert not_modified.status_code == 304 and not_modified.data == b""
+
+    # a change of the favourites renders the page again
+    services.module_market.favourites.remove("TEST")
+    changed = client.get("/", headers={"If-None-Match": first.headers["ETag"]})
+    assert changed.status_code == 200 and b"Test Company" not in changed.data
+    assert changed.headers["ETag"] != first.headers["ETag"]
+
+def test_static_files_have_hashed_urls(flask_app, client):
+    with flask_app.test_request_context():
+        url = url_for("static", filename="js/scripts.js")
+    assert "?v=" in url
+    assert url in client.get("/").get_data(as_text=True)
+
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.cache_control.immutable and response.cache_control.max_age == 365 * 24 * 3600
+    # a stale or missing hash isn't cached for long
+    assert not client.get("/static/js/scripts.js?v=stale").cache_control.immutable
+    assert client.get("/static/js/scripts.js").cache_control.max_age is None
@@ -0,0 +1,92 @@
+import numpy as np
+import backtest
+from backtest import backtest_ticker, forward_returns, load_closes, run_backtest, WINDOW
+from filters import Filter3Days, Filter5Days
+
+
+def write_closes(path, closes, start="2024-01-01"):
+    dates = np.datetime64(start) + np.arange(len(closes))
+    with open(path, "w") as file:
+        file.write("date,open,close\n")
+        for date, close in zip(dates, closes):
+            file.write(f"{date},0,{close}\n")
+
+
+def test_forward_returns():
+    returns = forward_returns(np.array([100.0, 110.0, 99.0]), horizon=1)
+    assert np.allclose(returns[:2], [0.1, -0.1])
+    assert np.isnan(returns[2])
+
+def test_load_closes_sorts_by_date(tmp_path):
+    path = tmp_path / "AAPL.csv"
+    path.write_text("date,close\n2024-01-03,3\n2024-01-01,1\n2024-01-02,2\n")
+    dates, closes = load_closes(str(path))
+    assert closes.tolist() == [1.0, 2.0, 3.0]
+    assert str(dates[0]) == "2024-01-01"
+
+def test_backtest_ticker_matches_scalar_filters():
+    rng = np.random.default_rng(7)
+    closes = 100 + np.cumsum(rng.normal(size=200))
+    dates = np.datetime64("2024-01-01") + np.arange(len(closes))
+    horizon = 3
+    result = backtest_ticker(dates, closes, {"Filter3Days": Filter3Days()}, horizon)
+
+    signals = hits = 0
+    for end in range(WINDOW, len(closes) - horizon + 1):
+        if Filter3Days.apply(list(closes[end - WINDOW:end])):
+            signals += 1
+            hits += closes[end - 1 + horizon] > closes[end - 1]
+    assert result["windows"] == len(closes) - WINDOW + 1 - horizon
+    assert result["filters"]["Filter3Days"] == {"signals": signals, "hits": hits}
+
+def test_backtest_ticker_sale_recommendations():
+    closes = np.array([10.0, 9.0, 8.0, 9.0, 10.0, 11.0, 12.0, 11.0])
+    dates = np.datetime64("2024-01-01") + np.arange(len(closes))
+    ratings = (np.array(["2024-01-01", "2024-01-04", "2024-01-05", "2023-12-01"], dtype="datetime64[D]"),
+               np.array([5, 5, -3, 5]))
+    result = backtest_ticker(dates, closes, {"Filter5Days": Filter5Days()}, 1, ratings, rating_threshold=0)
+    # sell on 01-01 (falls next day) and 01-04 (rises), the negative and the too early ratings are skipped
+    assert result["sales"] == {"signals": 2, "hits": 1}
+
+def test_backtest_ticker_too_short_history():
+    result = backtest_ticker(np.array([], dtype="datetime64[D]"), np.array([1.0, 2.0]), {"Filter3Days": Filter3Days()}, 1)
+    assert result["windows"] == 0
+
+def test_run_backtest_in_process_and_pool(tmp_path):
+    rng = np.random.default_rng(1)
+    prices = tmp_path / "prices"
+    prices.mkdir()
+    for ticker in ("AAA", "BBB", "CCC"):
+        write_closes(prices / f"{ticker}.csv", np.round(100 + np.cumsum(rng.normal(size=50)), 2))
+    ratings = tmp_path / "ratings.csv"
+    ratings.write_text("date,ticker,rating\n2024-01-10,AAA,4\n2024-01-11,BBB,-2\n")
+
+    report = run_backtest(str(prices), str(ratings), workers=1, horizon=2, chunk_size=2)
+    assert report["tickers"] == 3
+    assert report["days"] == 150
+    assert report["windows"] == 3 * (50 - WINDOW + 1 - 2)
+    assert report["sales"]["signals"] == 1
+    for counts in report["filters"].values():
+        assert counts["hits"] <= counts["signals"]
+
+    pooled = run_backtest(str(prices), str(ratings), workers=2, horizon=2, chunk_size=1)
+    assert pooled["filters"] == report["filters"]
+    assert pooled["sales"] == report["sales"]
+
+def test_run_backtest_loads_ratings_once(tmp_path, monkeypatch):
+    prices = tmp_path / "prices"
+    prices.mkdir()
+    for ticker in ("AAA", "BBB", "CCC"):
+        write_closes(prices / f"{ticker}.csv", np.arange(100.0, 120.0))
+    ratings = tmp_path / "ratings.csv"
+    ratings.write_text("date,ticker,rating\n2024-01-10,AAA,4\n2024-01-11,CCC,4\n2024-01-12,ZZZ,4\n")
+    loads, chunks = [], []
+    load_ratings, backtest_chunk = backtest.load_ratings, backtest._backtest_chunk
+    monkeypatch.setattr(backtest, "load_ratings", lambda path: loads.append(path) or load_ratings(path))
+    monkeypatch.setattr(backtest, "_backtest_chunk", lambda args: chunks.append(args) or backtest_chunk(args))
+
+    report = run_backtest(str(prices), str(ratings), workers=1, horizon=2, chunk_size=2)
+    assert loads == [str(ratings)]
+    # every task carries only the ratings of its own tickers
+    assert [sorted(chunk[1]) for chunk in chunks] == [["AAA"], ["CCC"]]
+    assert report["sales"]["signals"] == 2
@@ -0,0 +1,70 @@
+import json
+import requests
+from datetime import date
+from benchmarks.bench_pipeline import compare, main, run_pipeline
+from benchmarks import bench_startup
+from benchmarks.fake_servers import FakeNews, FakeTiingo
+from filters import Filter3Days, Filter5Days
+from run_context import STAGE_FINISHED
+
+
+def test_fake_tiingo_injects_errors():
+    with FakeTiingo(error_rate=1.0) as tiingo:
+        response = requests.get(f"{tiingo.url}/tiingo/utilities/search", params={"query": "tesla"})
+        assert response.status_code == 500
+    with FakeTiingo(error_rate=0.0) as tiingo:
+        response = requests.get(f"{tiingo.url}/tiingo/utilities/search", params={"query": "tesla"})
+        assert response.json() == [{"name": "Tesla Inc.", "ticker": "TESLA"}]
+
+def test_fake_news_records_sales():
+    with FakeNews() as news:
+        stocks = [{"name": "AAPL", "rating": 3, "sale": 1}]
+        assert requests.post(f"{news.url}/salestock", json=json.dumps(stocks)).status_code == 200
+        assert news.sales == [stocks]
+
+def test_run_pipeline_small():
+    result = run_pipeline(10)
+    assert result["final_stage"] == STAGE_FINISHED
+    assert result["filtered"] == sum(FakeTiingo.passes_filters(f"T{i:05d}") for i in range(10))
+    assert result["peak_memory_bytes"] > 0
+    assert result["total_seconds"] >= sum(result["stages"].values()) * 0.9
+
+def test_compare_reports_regressions():
+    baseline = {"10": {"final_stage": "finished", "total_seconds": 1.0, "peak_memory_bytes": 1000}}
+    assert compare({"10": {"final_stage": "finished", "total_seconds": 1.2, "peak_memory_bytes": 1200}},
+                   baseline, tolerance=0.3) == []
+    regressions = compare({"10": {"final_stage": "failed", "total_seconds": 2.0, "peak_memory_bytes": 2000}},
+                          baseline, tolerance=0.3)
+    assert len(regressions) == 3
+    # sizes without a baseline are not compared
+    assert compare({"100": {"final_stage": "failed", "total_seconds": 9, "peak_memory_bytes": 9}},
+                   baseline, tolerance=0.3) == []
+
+def test_main_fails_on_regression(tmp_path):
+    baseline = tmp_path / "baseline.json"
+    assert main(["--sizes", "10", "--baseline", str(baseline), "--update-baseline"]) == 0
+    stored = json.loads(baseline.read_text())
+    assert main(["--sizes", "10", "--baseline", str(baseline), "--tolerance", "10"]) == 0
+
+    stored["10"]["peak_memory_bytes"] = 1
+    baseline.write_text(json.dumps(stored))
+    assert main(["--sizes", "10", "--baseline", str(baseline)]) == 1
+
+def test_startup_benchmark():
+    result = bench_startup.run_startup(repeat=1)
+    assert result["boot_seconds"] >= result["import_seconds"] > 0
+    assert "requests" not in result["loaded_at_boot"]
+    assert "DataController" not in result["loaded_at_boot"]
+
+    baseline = {"import_seconds": 0.2, "boot_seconds": 0.3, "first_request_seconds": 0.2}
+    assert bench_startup.compare({**baseline, "boot_seconds": 0.34}, baseline, tolerance=0.5) == []
+    assert len(bench_startup.compare({**baseline, "boot_seconds": 1.0}, baseline, tolerance=0.5)) == 1
+
+def test_fake_closes_do_not_depend_on_the_weekday():
+    tickers = [f"T{i:05d}" for i in range(20)]
+    passing = [FakeTiingo.passes_filters(ticker) for ticker in tickers]
+    assert any(passing) and not all(passing)
+    for today in (date(2026, 10, 19), date(2026, 10, 20), date(2026, 10, 21), date(2026, 10, 24)):
+        for ticker, passes in zip(tickers, passing):
+            closes = [entry["close"] for entry in FakeTiingo.closes(ticker, "2026-09-01", today)][-6:]
+            assert Filter3Days.apply(closes) == Filter5Days.apply(closes) == passes
@@ -0,0 +1,18 @@
+import json
+import pytest
+from config_manager import ConfigManager
+
+
+def load(tmp_path, **config):
+    path = tmp_path / "config.json"
+    path.write_text(json.dumps(config))
+    return ConfigManager(str(path))
+
+def test_rate_limit_wait_covers_the_refill_of_every_fetch_worker(tmp_path):
+    config = load(tmp_path, rate_limit_per_hour=50, rate_limit_per_day=1000, fetch_concurrency=8)
+    assert config.RATE_LIMIT_WAIT == pytest.approx(86400 / 1000 * 8)  # the daily budget refills slowest
+    assert load(tmp_path).RATE_LIMIT_WAIT == 60
+
+def test_configured_rate_limit_wait_is_at_least_one_refill(tmp_path):
+    assert load(tmp_path, rate_limit_per_hour=50, rate_limit_wait=60).RATE_LIMIT_WAIT == 72
+    assert load(tmp_path, rate_limit_per_hour=50, rate_limit_wait=600).RATE_LIMIT_WAIT == 600
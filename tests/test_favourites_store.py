@@ -0,0 +1,58 @@
+import threading
+from favourites_store import FavouritesStore
+
+
+def test_import_legacy_file_once(tmp_path):
+    legacy = tmp_path / "favourite_stocks.txt"
+    legacy.write_text("Apple,AAPL\nTesla, Inc.,TSLA\n\nApple,AAPL\n")
+    db = str(tmp_path / "favourites.sqlite3")
+
+    store = FavouritesStore(db, legacy_path=str(legacy))
+    assert store.list() == [("Apple", "AAPL"), ("Tesla, Inc.", "TSLA")]
+    store.remove("AAPL")
+    store.close()
+
+    # the legacy file isn't imported again, the removed stock stays removed
+    store = FavouritesStore(db, legacy_path=str(legacy))
+    assert store.list() == [("Tesla, Inc.", "TSLA")]
+    store.close()
+
+def test_missing_legacy_file(tmp_path):
+    store = FavouritesStore(str(tmp_path / "favourites.sqlite3"), legacy_path=str(tmp_path / "missing.txt"))
+    assert store.list() == []
+
+def test_add_remove_and_contains(tmp_path):
+    store = FavouritesStore(str(tmp_path / "favourites.sqlite3"))
+    version = store.version
+
+    assert store.add("Apple", "AAPL")
+    assert not store.add("Apple again", "AAPL")
+    assert store.contains("AAPL")
+    assert store.version == version + 1
+    assert store.remove("AAPL")
+    assert not store.remove("AAPL")
+    assert not store.contains("AAPL")
+
+def test_index_sees_changes_of_other_connections(tmp_path):
+    db = str(tmp_path / "favourites.sqlite3")
+    first = FavouritesStore(db)
+    second = FavouritesStore(db)  # e.g. another gunicorn worker
+
+    first.add("Apple", "AAPL")
+    assert second.contains("AAPL")
+    second.remove("AAPL")
+    assert not first.contains("AAPL")
+    assert first.list() == []
+
+def test_concurrent_adds_are_atomic(tmp_path):
+    db = str(tmp_path / "favourites.sqlite3")
+    stores = [FavouritesStore(db) for _ in range(4)]
+    results = []
+    threads = [threading.Thread(target=lambda s=store: results.append(s.add("Apple", "AAPL"))) for store in stores]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results.count(True) == 1
+    assert stores[0].list() == [("Apple", "AAPL")]
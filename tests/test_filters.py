@@ -1,4 +1,6 @@
-from filters import Filter3Days, Filter5Days
+import numpy as np
+import random
+from filters import Filter, Filter3Days, Filter5Days, AndFilter, OrFilter, to_matrix, evaluate_batch
 
 def test_filter_3_days_true():
     prices = [100, 101, 102]
@@ -14,4 +16,46 @@ def test_filter_5_days_true():
 
 def test_filter_5_days_false():
     prices = [100, 99, 98, 97, 96]
-    assert not Filter5Days.apply(prices)
\ No newline at end of file
+    assert not Filter5Days.apply(prices)
+
+
+class RisingFilter(Filter):
+    """
+    Filter without a vectorized implementation, evaluated by the fallback adapter.
+    """
+    @staticmethod
+    def apply(prices):
+        return prices[-1] > prices[0]
+
+def test_to_matrix_pads_shorter_rows():
+    matrix = to_matrix([[1, 2, 3], [4]])
+    assert matrix.shape == (2, 3)
+    assert np.isnan(matrix[1, :2]).all()
+    assert matrix[1, 2] == 4
+    assert to_matrix([[1, 2, 3, 4]], width=2).tolist() == [[3, 4]]
+
+def test_batch_matches_scalar_filters():
+    rng = random.Random(42)
+    prices = [[rng.choice([99.0, 100.0, 101.0]) for _ in range(rng.randint(1, 6))] for _ in range(500)]
+    closes = to_matrix(prices)
+
+    masks = evaluate_batch([Filter3Days(), Filter5Days(), RisingFilter()], closes)
+    assert masks.shape == (3, 500)
+    assert masks[0].tolist() == [Filter3Days.apply(p) for p in prices]
+    assert masks[1].tolist() == [Filter5Days.apply(p) for p in prices]
+    assert masks[2].tolist() == [RisingFilter.apply(p) for p in prices]
+
+def test_combined_filters():
+    prices = [[100, 101, 102], [100, 99, 101], [100, 99, 98, 97, 96]]
+    closes = to_matrix(prices)
+
+    both = Filter3Days() & Filter5Days()
+    either = Filter3Days() | RisingFilter()
+    assert isinstance(both, AndFilter) and isinstance(either, OrFilter)
+    assert both.apply_batch(closes).tolist() == [True, False, False]
+    assert either.apply_batch(closes).tolist() == [True, True, False]
+    assert [both.apply(p) for p in prices] == [True, False, False]
+    assert [either.apply(p) for p in prices] == [True, True, False]
+
+def test_batch_on_empty_matrix():
+    assert evaluate_batch([Filter3Days(), RisingFilter()], to_matrix([])).shape == (2, 0)
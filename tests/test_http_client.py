@@ -0,0 +1,47 @@
+import threading
+import pytest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from http_client import HttpClient
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    def do_GET(self):
+        body = b'{"status": "ok"}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+def test_connections_are_reused(server_url):
+    client = HttpClient(pool_size=2)
+    for _ in range(5):
+        response = client.get(f"{server_url}/prices")
+        assert response.status_code == 200
+        assert response.json() == {"status": "ok"}
+
+    stats = client.stats()
+    assert stats["requests"] == 5
+    assert stats["connections_opened"] == 1
+    assert stats["connections_reused"] == 4
+    client.close()
+
+def test_default_timeout_is_applied():
+    client = HttpClient(connect_timeout=1, read_timeout=2)
+    assert client.timeout == (1, 2)
+    assert client.stats() == {"requests": 0, "connections_opened": 0, "connections_reused": 0}
@@ -0,0 +1,71 @@
+import os
+import subprocess
+import sys
+import time
+from leader import LeaderElection
+
+
+def test_only_one_leader(tmp_path):
+    path = str(tmp_path / "scheduler.lock")
+    elected = []
+    first = LeaderElection(path, on_elected=lambda: elected.append("first"), retry_interval=0.05)
+    second = LeaderElection(path, on_elected=lambda: elected.append("second"), retry_interval=0.05)
+    first.start()
+    second.start()
+
+    assert first.is_leader and not second.is_leader
+    assert elected == ["first"]
+    assert second.holder()["pid"] == os.getpid()
+
+    # the leader steps down, the waiting one takes over
+    first.stop()
+    deadline = time.monotonic() + 5
+    while not second.is_leader and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert second.is_leader
+    assert elected == ["first", "second"]
+    second.stop()
+    assert second.holder() is None
+
+def test_failover_when_leader_process_dies(tmp_path):
+    path = str(tmp_path / "scheduler.lock")
+    leader = subprocess.Popen(
+        [sys.executable, "-c",
+         "import sys, time; from leader import LeaderElection; "
+         f"election = LeaderElection({path!r}); election.start(); print(election.is_leader, flush=True); time.sleep(60)"],
+        stdout=subprocess.PIPE, text=True, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    )
+    try:
+        assert leader.stdout.readline().strip() == "True"
+        follower = LeaderElection(path, retry_interval=0.05)
+        follower.start()
+        assert not follower.is_leader
+        assert follower.holder()["pid"] == leader.pid
+    finally:
+        leader.kill()
+        leader.wait()
+
+    deadline = time.monotonic() + 5
+    while not follower.is_leader and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert follower.is_leader
+    assert follower.holder()["pid"] == os.getpid()
+    follower.stop()
+
+def test_failing_callback_gives_up_leadership(tmp_path):
+    path = str(tmp_path / "scheduler.lock")
+    calls = []
+
+    def on_elected():
+        calls.append(1)
+        if len(calls) == 1:
+            raise RuntimeError("scheduler failed to start")
+
+    election = LeaderElection(path, on_elected=on_elected, retry_interval=0.05)
+    election.start()
+    assert not election.is_leader
+    deadline = time.monotonic() + 5
+    while not election.is_leader and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert election.is_leader and len(calls) == 2
+    election.stop()
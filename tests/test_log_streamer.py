@@ -1,7 +1,11 @@
 import pytest
 import tempfile
 import json
+import threading
+import time
+from flask import Flask
 from config_manager import ConfigManager
+from log_streamer import LogStreamer, LogRecord, DEBUG, INFO, WARNING
 
 def test_load_valid_config():
     config_data = {
@@ -42,4 +46,145 @@ def test_invalid_json():
         tmp.flush()
 
         with pytest.raises(Exception, match="Error decoding JSON"):
-            ConfigManager(tmp.name)
\ No newline at end of file
+            ConfigManager(tmp.name)
+
+def test_ring_buffer_drops_oldest_messages():
+    streamer = LogStreamer(capacity=3)
+    for i in range(5):
+        streamer.log(f"message {i}")
+
+    messages, next_seq = streamer.messages_since(0)
+    assert next_seq == 5
+    assert len(messages) == 3
+    assert messages[0].message == "message 2" and messages[-1].message == "message 4"
+    assert len(streamer.messages_since(4)[0]) == 1
+
+def test_wait_for_messages_wakes_on_log():
+    streamer = LogStreamer()
+    timer = threading.Timer(0.05, streamer.log, args=("hello",))
+    timer.start()
+    messages, next_seq = streamer.wait_for_messages(0, timeout=5)
+    assert next_seq == 1
+    assert "hello" in messages[0].render()
+    assert streamer.wait_for_messages(1, timeout=0.01) == ([], 1)
+
+def test_stream_sends_pending_messages_in_one_frame():
+    streamer = LogStreamer()
+    streamer.log("first")
+    streamer.log("second")
+
+    with Flask(__name__).test_request_context():
+        response = streamer.stream()
+        frame = next(response.response)
+    assert frame.count("data: ") == 2
+    assert "first" in frame and "second" in frame
+    assert frame.endswith("\n\n")
+
+def test_records_below_level_are_skipped():
+    streamer = LogStreamer(level=INFO)
+    sink = []
+    streamer.add_sink(sink.append)
+    streamer.log("per ticker details", optional_data=[1, 2, 3], level=DEBUG)
+    streamer.log("market started", run_id="abc", level=WARNING)
+
+    assert not streamer.is_enabled_for(DEBUG)
+    assert [record.message for record in sink] == ["market started"]
+    assert streamer.messages_since(0)[1] == 1
+
+def test_record_is_rendered_lazily_once():
+    record = LogRecord(0, INFO, "Filtered stocks", run_id="abc", data=["AAPL"])
+    assert record._text is None
+    text = record.render()
+    assert "INFO [run abc] - Filtered stocks; DATA: ['AAPL']" in text
+    assert record.render() is text
+
+def test_record_keeps_payload_as_logged():
+    stocks = [{"name": "AAPL"}]
+    record = LogRecord(0, INFO, "Validated stocks", data=stocks)
+    stocks.append({"name": "TSLA"})
+    assert "TSLA" not in record.render()
+
+def test_failing_sink_does_not_break_logging():
+    streamer = LogStreamer()
+    received = []
+
+    def broken(record):
+        raise OSError("disk full")
+    streamer.add_sink(broken)
+    streamer.add_sink(received.append)
+    streamer.log("market started")
+
+    assert streamer.sink_errors == 1
+    assert [record.message for record in received] == ["market started"]
+    assert streamer.messages_since(0)[1] == 1
+
+def test_stream_resumes_after_last_event_id():
+    streamer = LogStreamer()
+    for i in range(3):
+        streamer.log(f"message {i}")
+
+    with Flask(__name__).test_request_context():
+        frame = next(streamer.stream().response)
+        assert frame.startswith("id: 2\n")
+        frame = next(streamer.stream(last_event_id="1").response)
+    assert frame.startswith("id: 2\n")
+    assert frame.count("data: ") == 1 and "message 2" in frame
+
+def test_stream_restarts_after_unknown_event_id():
+    streamer = LogStreamer()
+    streamer.log("after restart")
+
+    with Flask(__name__).test_request_context():
+        frame = next(streamer.stream(last_event_id="500").response)
+        assert "after restart" in frame
+        assert "after restart" in next(streamer.stream(last_event_id="invalid").response)
+
+def test_stream_filters_records():
+    streamer = LogStreamer()
+    streamer.log("Filtered stocks: 2", optional_data=["AAPL", "TSLA"], run_id="run-1")
+    streamer.log("Failed to get prices for stock: AAPLX", level=WARNING, run_id="run-1")
+    streamer.log("Market failed", level=WARNING, run_id="run-2")
+
+    with Flask(__name__).test_request_context():
+        frame = next(streamer.stream(run_id="run-1", ticker="AAPL").response)
+        assert frame.count("data: ") == 1 and "Filtered stocks" in frame
+        frame = next(streamer.stream(level="warning", run_id="run-2").response)
+        assert frame.count("data: ") == 1 and "Market failed" in frame
+        assert frame.startswith("id: 2\n")
+        with pytest.raises(ValueError):
+            streamer.stream(level="LOUD")
+
+def test_stream_sends_heartbeat_when_idle():
+    streamer = LogStreamer()
+    streamer.WAIT_TIMEOUT = 0.01
+
+    with Flask(__name__).test_request_context():
+        response = streamer.stream()
+        assert next(response.response) == ": heartbeat\n\n"
+    assert response.headers["Cache-Control"] == "no-cache"
+
+def test_filtered_stream_sends_heartbeat_while_other_runs_log():
+    streamer = LogStreamer()
+    streamer.WAIT_TIMEOUT = 0.2
+    stop = threading.Event()
+
+    def log_other_run():
+        for _ in range(100):  # at most 2 s
+            if stop.wait(0.02):
+                return
+            streamer.log("Filtered stocks: 1", run_id="busy")
+    thread = threading.Thread(target=log_other_run)
+    thread.start()
+    try:
+        with Flask(__name__).test_request_context():
+            frames = streamer.stream(run_id="quiet").response
+            started = time.monotonic()
+            frame = next(frames)
+            assert time.monotonic() - started < 1
+    finally:
+        stop.set()
+        thread.join()
+    assert frame.startswith("id: ") and frame.endswith(": heartbeat\n\n")
+    # a reconnect resumes after the skipped records
+    skipped = int(frame.split("\n")[0][len("id: "):])
+    assert all(record.run_id == "busy" for record in streamer.messages_since(0)[0] if record.seq <= skipped)
@@ -0,0 +1,66 @@
+import pytest
+from metrics import MetricsRegistry, timed, timed_step, STEP_SECONDS, STEP_ERRORS
+
+
+def test_counter_renders_labelled_series():
+    registry = MetricsRegistry()
+    requests = registry.counter("requests_total", "Requests.", ("route", "status"))
+    requests.inc(route="/rating", status=200)
+    requests.inc(2, route="/rating", status=200)
+    requests.inc(route='/a"b', status=500)
+
+    assert requests.value(route="/rating", status=200) == 3
+    text = registry.render()
+    assert "# TYPE requests_total counter" in text
+    assert 'requests_total{route="/rating",status="200"} 3' in text
+    assert 'requests_total{route="/a\\"b",status="500"} 1' in text
+
+def test_histogram_buckets_are_cumulative():
+    registry = MetricsRegistry()
+    histogram = registry.histogram("latency_seconds", "Latency.", buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value)
+
+    lines = registry.render().splitlines()
+    assert 'latency_seconds_bucket{le="0.1"} 2' in lines
+    assert 'latency_seconds_bucket{le="1"} 3' in lines
+    assert 'latency_seconds_bucket{le="+Inf"} 4' in lines
+    assert "latency_seconds_sum 3.65" in lines
+    assert "latency_seconds_count 4" in lines
+
+def test_registry_returns_existing_metric():
+    registry = MetricsRegistry()
+    assert registry.counter("a_total", "A.", ("x",)) is registry.counter("a_total", "A.", ("x",))
+    with pytest.raises(ValueError):
+        registry.histogram("a_total", "A.", ("x",))
+    with pytest.raises(ValueError):
+        registry.counter("a_total", "A.").inc(y=1)
+
+def test_timed_counts_errors():
+    registry = MetricsRegistry()
+    histogram, errors = registry.histogram(*STEP_SECONDS), registry.counter(*STEP_ERRORS)
+    with timed(histogram, errors, step="ok"):
+        pass
+    with pytest.raises(RuntimeError):
+        with timed(histogram, errors, step="failing"):
+            raise RuntimeError
+    assert histogram.count(step="ok") == 1
+    assert histogram.count(step="failing") == 1
+    assert errors.value(step="ok") == 0
+    assert errors.value(step="failing") == 1
+
+def test_timed_step_decorator():
+    class Steps:
+        def __init__(self, registry):
+            self.step_seconds = registry.histogram(*STEP_SECONDS)
+            self.step_errors = registry.counter(*STEP_ERRORS)
+
+        @timed_step("double")
+        def double(self, value):
+            return value * 2
+
+    registry = MetricsRegistry()
+    steps = Steps(registry)
+    assert steps.double(2) == 4
+    assert steps.double.__name__ == "double"
+    assert steps.step_seconds.count(step="double") == 1
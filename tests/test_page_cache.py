@@ -0,0 +1,28 @@
+from flask import Flask
+from page_cache import PageCache, StaticAssets
+
+
+def test_page_is_rendered_once_per_version():
+    cache = PageCache()
+    renders = []
+
+    def render():
+        renders.append(1)
+        return f"page {len(renders)}"
+
+    first = cache.get("home", 1, render)
+    assert cache.get("home", 1, render) is first
+    second = cache.get("home", 2, render)
+    assert second.body == "page 2" and second.etag != first.etag
+    assert cache.stats() == {"pages": 1, "hits": 1, "renders": 2}
+
+def test_static_version_follows_the_content(tmp_path):
+    (tmp_path / "app.js").write_text("one")
+    assets = StaticAssets(Flask(__name__, static_folder=str(tmp_path)))
+    version = assets.version("app.js")
+    assert version == assets.version("app.js") and len(version) == 12
+
+    (tmp_path / "app.js").write_text("two!")
+    assert assets.version("app.js") != version
+    assert assets.version("missing.js") is None
+    assert assets.version("../outside.js") is None
@@ -0,0 +1,66 @@
+import threading
+from unittest.mock import MagicMock
+from run_context import STAGE_FILTERING, STAGE_WAITING, STAGE_FINISHED, STAGE_TIMED_OUT
+from pipeline_jobs import PipelineJobs
+
+
+def make_controller(release: threading.Event, final_stage: str = STAGE_FINISHED):
+    controller = MagicMock()
+    controller.stage_listener = None
+
+    def start_market(mode, run_id):
+        controller.stage_listener(run_id, STAGE_FILTERING)
+        controller.stage_listener(run_id, STAGE_WAITING)
+        release.wait(5)
+        controller.stage_listener(run_id, final_stage)
+    controller.start_market.side_effect = start_market
+    return controller
+
+def wait_for_state(jobs, run_id, states, timeout=5):
+    done = threading.Event()
+    for _ in range(int(timeout / 0.01)):
+        if jobs.status(run_id)["state"] in states:
+            return
+        done.wait(0.01)
+    raise AssertionError(f"run {run_id} didn't reach {states}")
+
+def test_submit_returns_immediately_and_tracks_stages():
+    release = threading.Event()
+    jobs = PipelineJobs(make_controller(release))
+    run_id, started = jobs.submit(mode="manually")
+    assert started
+    wait_for_state(jobs, run_id, ("running",))
+
+    release.set()
+    wait_for_state(jobs, run_id, ("finished",))
+    status = jobs.status(run_id)
+    assert status["stage"] == STAGE_FINISHED
+    assert [stage["stage"] for stage in status["stages"]] == ["queued", STAGE_FILTERING, STAGE_WAITING, STAGE_FINISHED]
+    jobs.shutdown()
+
+def test_duplicate_trigger_joins_run_in_flight():
+    release = threading.Event()
+    controller = make_controller(release)
+    jobs = PipelineJobs(controller)
+    run_id, _ = jobs.submit(mode="manually")
+    joined_id, started = jobs.submit(mode="by scheduler")
+    assert joined_id == run_id and not started
+
+    release.set()
+    wait_for_state(jobs, run_id, ("finished",))
+    new_id, started = jobs.submit(mode="manually")
+    assert started and new_id != run_id
+    jobs.shutdown()
+    assert controller.start_market.call_count == 2
+
+def test_timed_out_run_fails_and_ignores_late_updates():
+    release = threading.Event()
+    release.set()
+    jobs = PipelineJobs(make_controller(release, final_stage=STAGE_TIMED_OUT))
+    run_id, _ = jobs.submit()
+    wait_for_state(jobs, run_id, ("failed",))
+
+    jobs.update_stage(run_id, STAGE_FINISHED)  # late `/rating` callback
+    assert jobs.status(run_id)["stage"] == STAGE_TIMED_OUT
+    assert jobs.status("unknown") is None
+    jobs.shutdown()
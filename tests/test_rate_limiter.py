@@ -0,0 +1,94 @@
+import pytest
+from rate_limiter import RateLimiter, RateLimitError, PRIORITY_PIPELINE, PRIORITY_SEARCH, parse_retry_after
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+def make_limiter(tmp_path, clock, **kwargs):
+    return RateLimiter(str(tmp_path / "rate_limit.sqlite3"), clock=clock, sleep=clock.sleep, **kwargs)
+
+def test_budget_is_shared_between_instances(tmp_path, clock):
+    first = make_limiter(tmp_path, clock, limits={"hour": (3, 3600)})
+    second = make_limiter(tmp_path, clock, limits={"hour": (3, 3600)})  # e.g. another worker process
+    first.acquire()
+    second.acquire()
+    first.acquire()
+    with pytest.raises(RateLimitError) as error:
+        second.acquire()
+    assert error.value.retry_after == pytest.approx(1200)
+    assert first.stats()["remaining"] == {"hour": 0}
+
+def test_pipeline_waits_for_refill(tmp_path, clock):
+    limiter = make_limiter(tmp_path, clock, limits={"hour": (2, 3600)})
+    limiter.acquire()
+    limiter.acquire()
+    started = clock.now
+    limiter.acquire(timeout=3600)
+    assert clock.now - started == pytest.approx(1800)
+
+def test_search_cannot_use_pipeline_reserve(tmp_path, clock):
+    limiter = make_limiter(tmp_path, clock, limits={"hour": (10, 3600)}, search_reserve=0.5)
+    for _ in range(5):
+        limiter.acquire(PRIORITY_SEARCH)
+    with pytest.raises(RateLimitError):
+        limiter.acquire(PRIORITY_SEARCH)
+    for _ in range(5):
+        limiter.acquire(PRIORITY_PIPELINE)
+    assert limiter.stats()["rejected"] == 1
+
+def test_all_limits_must_allow(tmp_path, clock):
+    limiter = make_limiter(tmp_path, clock, limits={"hour": (5, 3600), "day": (2, 86400)})
+    limiter.acquire()
+    limiter.acquire()
+    with pytest.raises(RateLimitError):
+        limiter.acquire()
+    assert limiter.stats()["remaining"] == {"hour": 3, "day": 0}
+
+def test_throttle_uses_retry_after_and_backoff(tmp_path, clock):
+    limiter = make_limiter(tmp_path, clock, limits={"hour": (100, 3600)}, backoff=2, max_backoff=5)
+    assert limiter.throttle(retry_after=30) == 30
+    with pytest.raises(RateLimitError) as error:
+        limiter.acquire(timeout=10)
+    assert error.value.retry_after == pytest.approx(30)
+    clock.sleep(30)
+    assert limiter.throttle() == 4  # the second 429 in a row
+    assert limiter.throttle() == 5  # capped
+    limiter.reset_backoff()
+    clock.sleep(10)
+    assert limiter.throttle() == 2
+    assert limiter.stats()["throttled"] == 4
+
+def test_reset_backoff_writes_only_after_429(tmp_path, clock):
+    limiter = make_limiter(tmp_path, clock, limits={"hour": (100, 3600)}, backoff=2)
+    other = make_limiter(tmp_path, clock, limits={"hour": (100, 3600)}, backoff=2)
+    statements = []
+    limiter._connection.set_trace_callback(statements.append)
+    limiter.acquire()
+    limiter.reset_backoff()
+    assert not any(statement.startswith("UPDATE") for statement in statements)
+
+    other.throttle()  # a 429 in another process
+    clock.sleep(2)
+    limiter.acquire()
+    limiter.reset_backoff()
+    assert sum(statement.startswith("UPDATE") for statement in statements) == 1
+    assert other.throttle() == 2  # the backoff starts over
+
+def test_parse_retry_after():
+    assert parse_retry_after("120") == 120
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("soon") is None
+    assert 0 <= parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") < 1
@@ -0,0 +1,53 @@
+import json
+import pytest
+from ratings import MalformedJSONError, RatingValidator, iter_json_array, iter_ratings
+
+
+def test_iter_json_array_yields_elements():
+    items = iter_json_array(' [ {"a": 1} , 2,"x" ,[3]] ')
+    assert next(items) == {"a": 1}
+    assert list(items) == [2, "x", [3]]
+    assert list(iter_json_array("[]")) == []
+
+def test_iter_json_array_errors():
+    with pytest.raises(MalformedJSONError):
+        iter_json_array('{"a": 1}')
+    with pytest.raises(MalformedJSONError):
+        iter_json_array("  ")
+    items = iter_json_array('[1, 2 3]')
+    assert next(items) == 1
+    with pytest.raises(MalformedJSONError):
+        list(items)
+    with pytest.raises(MalformedJSONError):
+        list(iter_json_array('[1, {"a": }]'))
+
+def test_iter_ratings_accepts_double_encoded_body():
+    stocks = [{"name": "AAPL", "date": 1, "rating": 3}]
+    assert list(iter_ratings(json.dumps(json.dumps(stocks)).encode())) == stocks
+    assert list(iter_ratings(json.dumps(stocks))) == stocks
+    with pytest.raises(ValueError):
+        iter_ratings(json.dumps(json.dumps({"name": "AAPL"})))
+    with pytest.raises(MalformedJSONError):
+        iter_ratings(b'"[{\\"name\\": ')
+
+def test_validator_processes_in_one_pass():
+    validator = RatingValidator(rating_min=-10, rating_max=10, rating_threshold=0)
+    stocks = [
+        {"name": "A", "date": 1, "rating": 5},
+        {"name": "B", "date": 1, "rating": -5},
+        {"name": "C", "date": 1, "rating": 11},
+        {"name": "D", "rating": 1},
+        {"name": "E", "date": 1, "rating": "1"},
+    ]
+    valid, invalid = validator.process(iter(stocks))
+    assert [(stock["name"], stock["sale"]) for stock in valid] == [("A", 1), ("B", 0)]
+    assert invalid == 3
+
+def test_validator_errors():
+    validator = RatingValidator(rating_min=-10, rating_max=10, rating_threshold=0)
+    with pytest.raises(ValueError, match="empty"):
+        validator.process([])
+    with pytest.raises(ValueError, match="after the validation"):
+        validator.process([{"name": "A"}])
+    with pytest.raises(TypeError):
+        validator.process([123])
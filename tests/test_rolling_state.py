@@ -0,0 +1,100 @@
+import numpy as np
+import pytest
+from datetime import date
+from filters import AndFilter, Filter, Filter3Days, Filter5Days, OrFilter
+from rolling_state import RollingCloses
+
+
+DAY = date(2025, 5, 2)
+
+
+class RisingFilter(Filter):
+    @staticmethod
+    def apply(prices):
+        return prices[-1] > prices[0]
+
+
+def test_append_keeps_last_closes():
+    state = RollingCloses(window=3)
+    for close in [1, 2, 3, 4]:
+        state.append("AAPL", close)
+    assert state.closes("AAPL") == [2.0, 3.0, 4.0]
+    assert state.closes("MSFT") == []
+    assert "AAPL" in state and len(state) == 1
+
+def test_rolling_filters_match_scalar_filters():
+    rng = np.random.default_rng(7)
+    state = RollingCloses(window=6)
+    histories = {}
+    for i in range(300):
+        # random walks of different lengths, including windows that aren't full yet
+        histories[f"T{i}"] = list(np.round(100 + np.cumsum(rng.normal(size=rng.integers(1, 12))), 2))
+    for ticker, closes in histories.items():
+        for close in closes:
+            state.append(ticker, close)
+    tickers = list(histories)
+    rows = state.rows(tickers)
+    for filter in [Filter3Days(), Filter5Days(), AndFilter(Filter3Days(), Filter5Days()),
+                   OrFilter(Filter3Days(), RisingFilter())]:
+        expected = [filter.apply(histories[ticker][-6:]) for ticker in tickers]
+        assert filter.apply_rolling(state, rows).tolist() == expected
+
+def test_matrix_is_padded_like_to_matrix():
+    state = RollingCloses(window=4)
+    for close in [1, 2]:
+        state.append("A", close)
+    for close in [1, 2, 3, 4, 5]:
+        state.append("B", close)
+    matrix = state.matrix(state.rows(["A", "B"]))
+    assert np.isnan(matrix[0, :2]).all() and matrix[0, 2:].tolist() == [1, 2]
+    assert matrix[1].tolist() == [2, 3, 4, 5]
+
+def test_update_appends_only_new_closes():
+    state = RollingCloses(window=4)
+    assert state.update("A", [1, 2, 3], DAY) == 3
+    assert state.update("A", [1, 2, 3, 4], DAY) == 1
+    assert state.update("A", [3, 4, 5, 6], DAY) == 2
+    assert state.update("A", [3, 4, 5, 6], DAY) == 0
+    assert state.closes("A") == [3, 4, 5, 6]
+    assert state.stats() == {"tickers": 1, "appended": 6, "resets": 0}
+
+def test_update_rebuilds_diverging_window():
+    state = RollingCloses(window=4)
+    state.update("A", [1, 2, 3, 4], DAY)
+    assert state.update("A", [9, 8, 7, 6], DAY) == 4
+    assert state.closes("A") == [9, 8, 7, 6]
+    assert state.declines(state.rows(["A"]), 3).tolist() == [3]
+    # a shorter window replaces the state
+    assert state.update("A", [5, 6], DAY) == 2
+    assert state.closes("A") == [5, 6]
+    assert state.declines(state.rows(["A"]), 3).tolist() == [0]
+    assert state.stats()["resets"] == 2
+
+def test_stale_tickers():
+    state = RollingCloses()
+    state.update("A", [1, 2], DAY)
+    state.update("B", [1, 2], date(2025, 5, 1))
+    assert state.stale(["A", "B", "C"], DAY) == ["B", "C"]
+
+def test_snapshot_survives_restart(tmp_path):
+    path = str(tmp_path / "rolling.npz")
+    state = RollingCloses(window=6, path=path)
+    for i in range(40):  # grows the arrays a few times
+        state.update(f"T{i}", [i, i + 1, i - 1], DAY)
+    state.save()
+
+    restored = RollingCloses(window=6, path=path)
+    assert len(restored) == 40
+    assert restored.closes("T5") == [5, 6, 4]
+    assert restored.stale(["T5", "T50"], DAY) == ["T50"]
+    rows = restored.rows(["T5"])
+    assert restored.declines(rows, 2).tolist() == [1]
+    restored.append("T5", 7)
+    assert restored.closes("T5") == [5, 6, 4, 7]
+
+    # a snapshot of another window is ignored
+    assert len(RollingCloses(window=5, path=path)) == 0
+
+def test_invalid_window():
+    with pytest.raises(ValueError):
+        RollingCloses(window=10)
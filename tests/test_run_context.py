@@ -0,0 +1,53 @@
+import time
+from run_context import RunContext, STAGE_FILTERING, STAGE_WAITING, STAGE_VALIDATING, STAGE_FINISHED, STAGE_TIMED_OUT
+
+
+def test_stage_timings_and_waiting_state():
+    run = RunContext("run-1", "manually")
+    assert not run.waiting_for_news and not run.finished
+
+    run.enter_stage(STAGE_FILTERING)
+    time.sleep(0.01)
+    run.enter_stage(STAGE_WAITING)
+    run.news_sent_at = time.monotonic()
+    assert run.waiting_for_news
+
+    run.news_received.set()
+    run.enter_stage(STAGE_FINISHED)
+    assert run.finished and not run.waiting_for_news
+    assert run.timings[STAGE_FILTERING] >= 0.01
+    assert STAGE_WAITING in run.timings
+    assert STAGE_FINISHED not in run.timings
+
+def test_ratings_of_chunks_are_merged():
+    run = RunContext("run-1", "manually")
+    run.tickers = ["A", "B", "C"]
+    run.chunks = 2
+    assert not run.add_ratings([{"name": "A"}], {"A"})
+    assert run.add_ratings([{"name": "B"}], {"B", "C"})
+    assert not run.add_ratings([], set())  # complete only once
+    assert [stock["name"] for stock in run.stocks] == ["A", "B"]
+
+def test_ratings_complete_when_all_tickers_rated():
+    run = RunContext("run-1", "manually")
+    run.tickers = ["A", "B"]
+    run.chunks = 2
+    assert run.add_ratings([{"name": "A"}, {"name": "B"}], {"A", "B"})  # News answered both chunks at once
+
+def test_final_stage_is_kept():
+    run = RunContext("run-1", "manually")
+    assert run.enter_stage(STAGE_WAITING)
+    assert run.enter_stage(STAGE_TIMED_OUT)
+    assert not run.enter_stage(STAGE_VALIDATING)  # a late callback
+    assert not run.enter_stage(STAGE_FINISHED)
+    assert run.stage == STAGE_TIMED_OUT
+    assert STAGE_VALIDATING not in run.timings
+
+def test_failed_chunks_complete_run_once():
+    run = RunContext("run-1", "manually")
+    run.tickers = ["A", "B", "C"]
+    run.chunks = 3
+    assert not run.chunk_failed()  # no callback yet, the run keeps waiting
+    assert not run.add_ratings([{"name": "A"}], {"A"})
+    assert run.chunk_failed()
+    assert not run.add_ratings([], set())
@@ -0,0 +1,48 @@
+import time
+from run_context import RunContext, STAGE_FILTERING, STAGE_FINISHED
+from run_history import RunHistory
+
+
+def make_history(tmp_path):
+    return RunHistory(str(tmp_path / "history.sqlite3"))
+
+def test_record_and_query_by_ticker(tmp_path):
+    history = make_history(tmp_path)
+    history.record_filtered("run-1", ["AAPL", "MSFT"])
+    history.record_ratings("run-1", [{"name": "AAPL", "rating": 5, "sale": 1}, {"name": "MSFT", "rating": -2, "sale": 0}])
+    history.record_ratings("run-2", [{"name": "AAPL", "rating": 1, "sale": 0}])
+
+    result = history.query(ticker="AAPL")
+    assert result["total"] == 3
+    assert result["items"][0]["run_id"] == "run-2"  # the newest first
+    assert history.query(kind=RunHistory.FILTERED)["total"] == 2
+
+    last_sale = history.last_sale_recommendation("AAPL")
+    assert last_sale["run_id"] == "run-1" and last_sale["rating"] == 5
+    assert history.last_sale_recommendation("MSFT") is None
+
+def test_paging_and_date_range(tmp_path):
+    history = make_history(tmp_path)
+    history.record_filtered("run-1", [f"T{i}" for i in range(25)])
+    now = time.time()
+
+    first = history.query(per_page=10)
+    third = history.query(page=3, per_page=10)
+    assert first["total"] == 25 and len(first["items"]) == 10
+    assert len(third["items"]) == 5
+    assert history.query(start=now + 60)["total"] == 0
+    assert history.query(end=now + 60)["total"] == 25
+
+def test_record_run_with_timings(tmp_path):
+    history = make_history(tmp_path)
+    run = RunContext("run-1", "manually")
+    run.enter_stage(STAGE_FILTERING)
+    run.enter_stage(STAGE_FINISHED)
+    history.record_run(run)
+
+    runs = history.runs()
+    assert runs["total"] == 1
+    item = runs["items"][0]
+    assert item["run_id"] == "run-1" and item["stage"] == STAGE_FINISHED
+    assert item["finished"] is not None
+    assert STAGE_FILTERING in item["timings"]
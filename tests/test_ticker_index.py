@@ -0,0 +1,67 @@
+import os
+import time
+from unittest.mock import MagicMock
+from ticker_index import TickerIndex
+
+CSV = """ticker,name,exchange
+TSLA,Tesla Inc.,NASDAQ
+AAPL,Apple Inc.,NASDAQ
+APLE,Apple Hospitality REIT Inc.,NYSE
+MSFT,Microsoft Corporation,NASDAQ
+T,AT&T Inc.,NYSE
+TSLA,Duplicate Tesla,NASDAQ
+BRK-B,,NYSE
+"""
+
+
+def write_index(tmp_path, content=CSV, **kwargs):
+    path = tmp_path / "tickers.csv"
+    path.write_text(content)
+    return TickerIndex(str(path), **kwargs)
+
+def test_load_skips_duplicates_and_names_missing_stocks(tmp_path):
+    index = write_index(tmp_path)
+    assert len(index) == 6
+    assert index.search("brk-b") == [("BRK-B", "BRK-B")]
+
+def test_ranking_of_the_matches(tmp_path):
+    index = write_index(tmp_path)
+    assert index.search("tsla")[0] == ("Tesla Inc.", "TSLA")  # exact ticker
+    assert index.search("  APPLE ")[:2] == [("Apple Inc.", "AAPL"), ("Apple Hospitality REIT Inc.", "APLE")]
+    assert index.search("t")[0] == ("AT&T Inc.", "T")  # exact ticker before the prefixes
+    assert index.search("hospitality") == [("Apple Hospitality REIT Inc.", "APLE")]  # prefix of a word
+    assert index.search("micrsoft") == [("Microsoft Corporation", "MSFT")]  # typo
+    assert index.search("xyzzy") == []
+    assert index.stats() == {"stocks": 6, "hits": 5, "misses": 1}
+
+def test_max_results(tmp_path):
+    index = write_index(tmp_path, max_results=2)
+    assert len(index.search("inc")) == 2
+
+def test_missing_file_is_empty(tmp_path):
+    index = TickerIndex(str(tmp_path / "missing.csv"))
+    assert len(index) == 0
+    assert index.search("tesla") == []
+
+def test_changed_file_is_reloaded(tmp_path):
+    now = [1000.0]
+    index = write_index(tmp_path, check_interval=60, clock=lambda: now[0])
+    path = tmp_path / "tickers.csv"
+    path.write_text("ticker,name\nNVDA,NVIDIA Corp\n")
+    os.utime(path, ns=(time.time_ns() + 10**9, time.time_ns() + 10**9))
+
+    assert index.search("nvidia") == []  # checked once a minute
+    now[0] += 60
+    assert index.search("nvidia") == [("NVIDIA Corp", "NVDA")]
+
+def test_refresh_downloads_stale_dump(tmp_path):
+    http_client = MagicMock()
+    http_client.get.return_value = MagicMock(status_code=200, content=b"ticker,name\nNVDA,NVIDIA Corp\n")
+    path = tmp_path / "tickers.csv"
+    index = TickerIndex(str(path), source_url="http://dump.local/tickers.csv", refresh_interval=3600,
+                        http_client=http_client)
+
+    assert index.refresh()
+    assert index.search("nvda") == [("NVIDIA Corp", "NVDA")]
+    assert not index.refresh()  # the dump is fresh
+    http_client.get.assert_called_once_with("http://dump.local/tickers.csv")
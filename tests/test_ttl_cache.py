@@ -0,0 +1,72 @@
+import threading
+import time
+import pytest
+from ttl_cache import TTLCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def test_hit_and_expiry():
+    clock = FakeClock()
+    cache = TTLCache(ttl=10, max_size=10, clock=clock)
+    loads = []
+
+    def loader():
+        loads.append(1)
+        return len(loads)
+
+    assert cache.get_or_load("tesla", loader) == 1
+    assert cache.get_or_load("tesla", loader) == 1
+    clock.now = 11
+    assert cache.get_or_load("tesla", loader) == 2
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 2
+
+def test_lru_eviction():
+    cache = TTLCache(ttl=100, max_size=2)
+    cache.get_or_load("a", lambda: "A")
+    cache.get_or_load("b", lambda: "B")
+    cache.get_or_load("a", lambda: "A")  # "a" becomes the most recently used
+    cache.get_or_load("c", lambda: "C")  # evicts "b"
+
+    assert cache.stats()["size"] == 2
+    assert cache.get_or_load("a", lambda: "new") == "A"
+    assert cache.get_or_load("b", lambda: "new") == "new"
+
+def test_errors_are_not_cached():
+    cache = TTLCache()
+    with pytest.raises(ValueError):
+        cache.get_or_load("x", lambda: (_ for _ in ()).throw(ValueError("failed")))
+    assert cache.get_or_load("x", lambda: "ok") == "ok"
+
+def test_concurrent_loads_are_coalesced():
+    cache = TTLCache()
+    started = threading.Event()
+    calls = []
+
+    def slow_loader():
+        calls.append(1)
+        started.set()
+        time.sleep(0.2)
+        return ["result"]
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(cache.get_or_load("q", slow_loader)))
+    leader.start()
+    started.wait()
+    followers = [threading.Thread(target=lambda: results.append(cache.get_or_load("q", slow_loader))) for _ in range(5)]
+    for thread in followers:
+        thread.start()
+    for thread in [leader, *followers]:
+        thread.join()
+
+    assert len(calls) == 1
+    assert results == [["result"]] * 6
+    stats = cache.stats()
+    assert stats["coalesced"] == 5
+    assert stats["hit_ratio"] == pytest.approx(5 / 6)
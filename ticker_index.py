@@ -0,0 +1,218 @@
+import bisect
+import csv
+import os
+import threading
+import time
+from typing import Tuple
+
+
+# scores of the kinds of matches, the best match of a stock ranks it
+SCORE_TICKER = 1000  # the query is the ticker
+SCORE_NAME = 900  # the query is the name
+SCORE_TICKER_PREFIX = 800  # the ticker starts with the query
+SCORE_NAME_PREFIX = 700  # the name starts with the query
+SCORE_WORD_PREFIX = 600  # a word of the name starts with the query
+SCORE_FUZZY = 500  # multiplied by the trigram similarity of the query and the name
+
+
+def normalize(text: str) -> str:
+    return " ".join(text.split()).lower()
+
+
+def trigrams(text: str) -> set[str]:
+    """
+    Returns the character trigrams of the normalized text, padded so that short words have trigrams too.
+    """
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class _Index:
+    """
+    Immutable index of one load of the symbol universe, swapped as a whole on a reload.
+    """
+
+    def __init__(self, stocks: list[Tuple[str, str]]):
+        self.stocks = stocks
+        self.names = [normalize(name) for name, _ in stocks]
+        # sorted keys for the prefix search, with the IDs of their stocks
+        tickers = sorted((ticker.lower(), i) for i, (_, ticker) in enumerate(stocks))
+        self.ticker_keys = [key for key, _ in tickers]
+        self.ticker_ids = [i for _, i in tickers]
+        names = sorted({(key, i) for i, name in enumerate(self.names) for key in (name, *name.split()[1:])})
+        self.name_keys = [key for key, _ in names]
+        self.name_ids = [i for _, i in names]
+        # trigram -> IDs of the stocks whose name contains it, for the fuzzy search
+        self.postings = {}
+        for i, name in enumerate(self.names):
+            for gram in trigrams(name):
+                self.postings.setdefault(gram, set()).add(i)
+
+
+class TickerIndex:
+    """
+    In-memory index of the symbol universe loaded from a CSV dump, searched locally instead of the Tiingo API.
+
+    This class provides methods to:
+    - Load the stocks from a CSV file with the `ticker` and `name` columns (other columns are ignored).
+    - Rank the stocks matching a query: exact ticker or name, ticker or name prefix, prefix of a word of the name,
+      and fuzzy matches by the trigram similarity of the names (typos, parts of words).
+    - Reload the file when it changes and download a fresh dump periodically (see `refresh`).
+
+    Searches read an immutable index without locking, a reload builds a new index and swaps it in.
+    """
+
+    MAX_CANDIDATES = 200  # prefix matches considered per kind
+    MIN_SIMILARITY = 0.5  # minimum part of the trigrams of the query found in the name of a fuzzy match
+
+    def __init__(self, path: str, max_results: int = 10, check_interval: float = 60.0, source_url: str = None,
+                 refresh_interval: float = 86400.0, http_client=None, clock=time.time):
+        """
+        Initializes the TickerIndex and loads the CSV file if it exists.
+
+        Args:
+            path (str): Path to the CSV dump of the symbol universe.
+            max_results (int): Maximum number of returned matches.
+            check_interval (float): Seconds between the checks whether the file changed.
+            source_url (str): URL the dump is downloaded from by `refresh`, no downloads if not provided.
+            refresh_interval (float): Age in seconds of the file when `refresh` downloads it again.
+            http_client (HttpClient): Client of the downloads.
+            clock (callable): Returns the current Unix time.
+        """
+        self.path = path
+        self.max_results = max_results
+        self.check_interval = check_interval
+        self.source_url = source_url
+        self.refresh_interval = refresh_interval
+        self.http_client = http_client
+        self._clock = clock
+        self._lock = threading.Lock()  # serializes the reloads, the searches don't lock
+        self._index = _Index([])
+        self._loaded_mtime = None
+        self._checked_at = None
+        self.hits = 0
+        self.misses = 0
+        self.reload()
+
+    def __len__(self) -> int:
+        return len(self._index.stocks)
+
+    def reload(self) -> bool:
+        """
+        Loads the CSV file if it changed since the last load.
+
+        Returns:
+            bool: True if the index was rebuilt.
+        """
+        with self._lock:
+            self._checked_at = self._clock()
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+            except OSError:
+                return False  # no dump yet, every search falls back to the API
+            if mtime == self._loaded_mtime:
+                return False
+            self._index = _Index(self._read())
+            self._loaded_mtime = mtime
+            return True
+
+    def _read(self) -> list[Tuple[str, str]]:
+        stocks, seen = [], set()
+        with open(self.path, newline="", encoding="utf-8") as file:
+            for row in csv.DictReader(file):
+                ticker = (row.get("ticker") or "").strip().upper()
+                if not ticker or ticker in seen:
+                    continue
+                seen.add(ticker)
+                stocks.append(((row.get("name") or "").strip() or ticker, ticker))
+        return stocks
+
+    def refresh(self) -> bool:
+        """
+        Downloads the dump from `source_url` if the file is older than `refresh_interval`, then reloads it.
+        The file is replaced atomically, a failed download keeps the current one.
+
+        Returns:
+            bool: True if the index was rebuilt.
+
+        Raises:
+            Exception: If the download fails.
+        """
+        if self.source_url and self.http_client is not None:
+            try:
+                age = self._clock() - os.stat(self.path).st_mtime
+            except OSError:
+                age = None
+            if age is None or age >= self.refresh_interval:
+                response = self.http_client.get(self.source_url)
+                if response.status_code != 200:
+                    raise Exception(f"Download of the symbol universe failed: {response.status_code}")
+                temporary = f"{self.path}.{os.getpid()}.tmp"
+                with open(temporary, "wb") as file:
+                    file.write(response.content)
+                os.replace(temporary, self.path)
+        return self.reload()
+
+    def _check(self):
+        if self._checked_at is None or self._clock() - self._checked_at >= self.check_interval:
+            self.reload()
+
+    @staticmethod
+    def _prefix(keys: list[str], ids: list[int], query: str, limit: int):
+        start = bisect.bisect_left(keys, query)
+        for i in range(start, min(start + limit, len(keys))):
+            if not keys[i].startswith(query):
+                break
+            yield keys[i], ids[i]
+
+    def search(self, query: str) -> list[Tuple[str, str]]:
+        """
+        Searches the stocks matching the query, best matches first.
+
+        Args:
+            query (str): The search term, a ticker or (a part of) a company name.
+
+        Returns:
+            list: Tuples of stock names and tickers, empty if nothing matches.
+        """
+        self._check()
+        index = self._index
+        query = normalize(query)
+        if not query or not index.stocks:
+            return []
+
+        scores = {}
+
+        def score(i: int, value: float):
+            if value > scores.get(i, 0):
+                scores[i] = value
+
+        for key, i in self._prefix(index.ticker_keys, index.ticker_ids, query, self.MAX_CANDIDATES):
+            score(i, SCORE_TICKER if key == query else SCORE_TICKER_PREFIX - len(key) + len(query))
+        for key, i in self._prefix(index.name_keys, index.name_ids, query, self.MAX_CANDIDATES):
+            if key == index.names[i]:
+                score(i, SCORE_NAME if key == query else SCORE_NAME_PREFIX - len(key) + len(query))
+            else:
+                score(i, SCORE_WORD_PREFIX - len(key) + len(query))
+
+        if len(scores) < self.max_results:
+            # a match shares at least `needed` trigrams with the query, so it contains at least one
+            # of the rarest len(grams) - needed + 1 trigrams, only those are scanned for the candidates
+            postings = sorted((index.postings.get(gram, ()) for gram in trigrams(query)), key=len)
+            needed = max(1, int(self.MIN_SIMILARITY * len(postings) + 0.999))
+            candidates = set().union(*postings[:len(postings) - needed + 1])
+            for i in candidates:
+                shared = sum(1 for posting in postings if i in posting)
+                if shared >= needed:
+                    score(i, SCORE_FUZZY * shared / len(postings))
+
+        best = sorted(scores, key=lambda i: (-scores[i], len(index.names[i]), index.stocks[i][1]))
+        results = [index.stocks[i] for i in best[:self.max_results]]
+        if results:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return results
+
+    def stats(self) -> dict:
+        return {"stocks": len(self), "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,124 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+
+class _Flight:
+    """
+    A load in progress that concurrent callers of the same key wait for.
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class TTLCache:
+    """
+    Thread-safe in-process cache with a time-to-live and a size limit (least recently used entries are evicted).
+
+    This class provides:
+    - `get_or_load` that returns a cached value or loads it with single-flight coalescing,
+      so concurrent callers of the same key share one load.
+    - Hit, miss and coalescing counters to tune the limits.
+    """
+
+    def __init__(self, ttl: float = 300, max_size: int = 1024, clock: Callable[[], float] = time.monotonic):
+        """
+        Initializes the TTLCache.
+
+        Args:
+            ttl (float): Seconds a loaded value stays valid.
+            max_size (int): Maximum number of cached entries.
+            clock (Callable[[], float]): Time source, replaceable in tests.
+        """
+        self.ttl = ttl
+        self.max_size = max_size
+        self._clock = clock
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._flights = {}  # key -> _Flight
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """
+        Returns the cached value of the key. On a miss the value is loaded by `loader` and cached.
+        If the same key is already being loaded by another thread, waits for that load instead.
+        Errors of the loader are not cached, they are raised to all callers waiting for the load.
+
+        Args:
+            key (Hashable): The cache key.
+            loader (Callable[[], Any]): Function loading the value on a miss.
+
+        Returns:
+            Any: The cached or loaded value.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > self._clock():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]  # expired
+
+            flight = self._flights.get(key)
+            if flight is not None:
+                self.coalesced += 1
+                leader = False
+            else:
+                self.misses += 1
+                flight = self._flights[key] = _Flight()
+                leader = True
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = loader()
+        except Exception as e:
+            flight.error = e
+            raise
+        else:
+            with self._lock:
+                self._entries[key] = (self._clock() + self.ttl, flight.value)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)  # evict the least recently used entry
+            return flight.value
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    def clear(self):
+        """
+        Removes all cached entries.
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """
+        Returns the cache statistics.
+
+        Returns:
+            dict: `size` of the cache, `hits`, `misses` (loads), `coalesced` callers that waited
+            for a load of another caller and the `hit_ratio` (hits and coalesced calls over all calls).
+        """
+        with self._lock:
+            total = self.hits + self.misses + self.coalesced
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "hit_ratio": (self.hits + self.coalesced) / total if total else 0.0,
+            }